@@ -1,127 +1,356 @@
+import asyncio
+import heapq
 import json
 import os
-import redis
+import redis.asyncio as redis_async
 import time
-from backend.ai.llm_client import LLMClient
-from backend.common import database, models
+from backend.ai.batch_scheduler import BatchScheduler
+from backend.ai.context_window import ContextWindow
+from backend.ai.llm_client import REALTIME_LLM_BACKEND, get_llm_client
+from backend.ai.llm_usage import attribute
+from backend.ai.prefilter import QuestionPrefilter
+from backend.common.settings_cache import aget_setting_value
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
-def main():
-    print("🤖 Starting AI Analysis Service (Timestamp-based Silence)...")
-    
+# Configurable Silence Threshold (Seconds)
+SILENCE_THRESHOLD = 3.0
+# Start generating a question this long into a pause, before the threshold is reached.
+# The answer is only spoken if the pause lasts until SILENCE_THRESHOLD.
+SPECULATION_DELAY = float(os.getenv("ANALYSIS_SPECULATION_DELAY", "0.8"))
+# Global cap on in-flight LLM calls across all meetings (each meeting has at most one)
+MAX_CONCURRENT_LLM_CALLS = int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "4"))
+
+DEFAULT_QUESTION_PROMPT = (
+    "You are a helpful Project Manager Assistant. "
+    "The speaker has paused. If there is an ambiguity or missing detail in the recent text, ask a short clarification question. "
+    "If everything is clear, say NO_QUESTION."
+)
+
+class MeetingSession:
+    """Live analysis state for a single meeting."""
+    def __init__(self, meeting_id):
+        self.meeting_id = meeting_id
+        # Token-budgeted window; older lines are folded into a rolling summary
+        self.context = ContextWindow()
+        self.last_speech_time = 0.0
+
+    @property
+    def deadline(self) -> float:
+        return self.last_speech_time + SILENCE_THRESHOLD
+
+    @property
+    def speculation_time(self) -> float:
+        return self.last_speech_time + min(SPECULATION_DELAY, SILENCE_THRESHOLD)
+
+    def add_line(self, speaker: str, text: str, now: float):
+        # Sliding Window: Keep context within budget, but DON'T trigger analysis
+        self.context.append(f"{speaker}: {text}")
+        self.last_speech_time = now
+
+class StreamedQuestion:
+    """
+    Sentences of one generated question, readable while the LLM is still producing them.
+    follow() yields what is already buffered, then each new sentence until close().
+    """
+    def __init__(self):
+        self.sentences = []
+        self.closed = False
+        self._changed = asyncio.Event()
+
+    def push(self, sentence: str):
+        self.sentences.append(sentence)
+        self._changed.set()
+
+    def close(self):
+        self.closed = True
+        self._changed.set()
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.sentences)
+
+    async def follow(self):
+        i = 0
+        while True:
+            while i < len(self.sentences):
+                yield self.sentences[i]
+                i += 1
+            if self.closed:
+                return
+            self._changed.clear()
+            await self._changed.wait()
+
+# Scheduler event kinds
+SPECULATE = "speculate"
+COMMIT = "commit"
+
+class SilenceScheduler:
+    """
+    Min-heap of per-meeting timers, keyed by (meeting_id, kind).
+    Re-scheduling a key leaves its old entry in the heap; stale entries
+    are skipped when popped (lazy deletion), so every operation is O(log n).
+    """
+    def __init__(self):
+        self._heap = []
+        self._deadlines = {}
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def schedule(self, key, deadline: float):
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, key))
+
+    def cancel(self, key):
+        self._deadlines.pop(key, None)
+
+    def _drop_stale(self):
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def next_deadline(self):
+        """Earliest live deadline, or None when nothing is scheduled."""
+        self._drop_stale()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: float) -> list:
+        """Removes and returns the keys whose deadline has passed, earliest first."""
+        due = []
+        while self.next_deadline() is not None and self._heap[0][0] <= now:
+            _, key = heapq.heappop(self._heap)
+            del self._deadlines[key]
+            due.append(key)
+        return due
+
+class AnalysisService:
+    """
+    Keeps one MeetingSession per live meeting and asks the LLM whether a
+    clarifying question is needed when that meeting pauses.
+
+    Generation is speculative: it starts SPECULATION_DELAY into a pause and
+    is cancelled if anyone speaks again. Once the pause reaches
+    SILENCE_THRESHOLD the result is committed and spoken as soon as it is
+    ready, which is usually immediately. Questions are streamed: each sentence
+    goes to TTS as soon as the LLM finishes it, followed by an end-of-utterance
+    marker once the whole question has been queued.
+
+    LLM calls run as asyncio tasks, so reading the queue never waits on them.
+    At most MAX_CONCURRENT_LLM_CALLS run at once, and each meeting has at most
+    one in flight. A meeting's epoch changes whenever it receives new speech or
+    is cleared; a result whose epoch is out of date is discarded.
+
+    With a `batcher` (local inference server), admission goes through its
+    deadline-ordered batches instead of the plain concurrency cap.
+    """
+    def __init__(self, redis_client, llm_client, max_concurrency: int = MAX_CONCURRENT_LLM_CALLS, prefilter=None,
+                 batcher: BatchScheduler = None):
+        self.redis_client = redis_client
+        self.llm_client = llm_client
+        self.prefilter = prefilter or QuestionPrefilter()
+        self.sessions = {}
+        self.scheduler = SilenceScheduler()
+        self.epochs = {}
+        self.inflight = {}      # meeting_id -> (task, epoch, question), speculative or not yet committed
+        self.committed = {}     # meeting_id -> task whose answer will be spoken when ready
+        self.releases = set()
+        self.llm_slots = asyncio.Semaphore(max_concurrency)
+        self.batcher = batcher
+
+    def _bump_epoch(self, meeting_id):
+        self.epochs[meeting_id] = self.epochs.get(meeting_id, 0) + 1
+
+    def _cancel_inflight(self, meeting_id):
+        task, _, _ = self.inflight.pop(meeting_id, (None, None, None))
+        for t in (task, self.committed.pop(meeting_id, None)):
+            if t and not t.done():
+                t.cancel()
+
+    def handle_message(self, data: dict, now: float):
+        meeting_id = data.get("meeting_id")
+        text = data.get("text")
+        if not meeting_id or not text:
+            return
+
+        # Any new input makes an in-flight (speculative) answer for this meeting stale
+        self._bump_epoch(meeting_id)
+        self._cancel_inflight(meeting_id)
+
+        # Handle Clear Signal
+        if text == "CLEAR_BUFFER_SIGNAL":
+            print(f"🧹 Clearing buffer for Meeting {meeting_id}")
+            self.sessions.pop(meeting_id, None)
+            self.scheduler.cancel((meeting_id, SPECULATE))
+            self.scheduler.cancel((meeting_id, COMMIT))
+            return
+
+        session = self.sessions.get(meeting_id)
+        if session is None:
+            session = self.sessions[meeting_id] = MeetingSession(meeting_id)
+
+        # Speech only resets this meeting's silence clock
+        session.add_line(data.get("speaker"), text, now)
+        self.scheduler.schedule((meeting_id, SPECULATE), session.speculation_time)
+        self.scheduler.schedule((meeting_id, COMMIT), session.deadline)
+
+    def next_timeout(self, now: float):
+        """How long the queue read may block: until the next scheduled timer, or forever (0)."""
+        deadline = self.scheduler.next_deadline()
+        if deadline is None:
+            return 0
+        # blpop treats 0 as "block forever", so never hand it a non-positive value
+        return max(0.01, deadline - now)
+
+    def run_due(self, now: float):
+        for meeting_id, kind in self.scheduler.pop_due(now):
+            if kind == SPECULATE:
+                session = self.sessions.get(meeting_id)
+                if session and session.context:
+                    self.start_analysis(session)
+                continue
+
+            session = self.sessions.pop(meeting_id, None)
+            if not session or not session.context:
+                continue
+            print(f"⏳ Silence detected in Meeting {meeting_id} ({now - session.last_speech_time:.1f}s). Committing analysis...")
+            epoch = self.epochs.get(meeting_id, 0)
+            task, task_epoch, question = self.inflight.get(meeting_id, (None, None, None))
+            if task is None or task_epoch != epoch:
+                task, question = self.start_analysis(session)
+            # The meeting's slot is handed over to the release
+            self.inflight.pop(meeting_id, None)
+            self.committed[meeting_id] = task
+            release = asyncio.create_task(self.release(meeting_id, task, question, epoch))
+            self.releases.add(release)
+            release.add_done_callback(self.releases.discard)
+
+    def start_analysis(self, session: MeetingSession):
+        meeting_id = session.meeting_id
+        # It was started on older context; its answer could only be dropped
+        self._cancel_inflight(meeting_id)
+        epoch = self.epochs.get(meeting_id, 0)
+        question = StreamedQuestion()
+        task = asyncio.create_task(self.analyze(session, epoch, question))
+        # Kept after completion so the commit can pick up a finished speculative answer
+        self.inflight[meeting_id] = (task, epoch, question)
+        task.add_done_callback(lambda t: self._finished(meeting_id, t))
+        return task, question
+
+    def _finished(self, meeting_id, task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            print(f"⚠️ Analysis failed for Meeting {meeting_id}: {task.exception()}")
+
+    def is_stale(self, meeting_id, epoch: int) -> bool:
+        return self.epochs.get(meeting_id, 0) != epoch
+
+    async def analyze(self, session: MeetingSession, epoch: int, question: StreamedQuestion) -> str:
+        """Generates (but does not speak) a question for the session's current context, sentence by sentence."""
+        try:
+            full_context = session.context.render()
+
+            # Most pauses need no question; don't pay for an LLM round trip to find that out
+            decision = self.prefilter.evaluate(full_context)
+            if not decision:
+                print(f"⏭️ Prefilter skipped Meeting {session.meeting_id} (score {decision.score:.2f}).")
+                return ""
+
+            prompt = await aget_setting_value("question_prompt", DEFAULT_QUESTION_PROMPT)
+
+            async with self._llm_slot(session):
+                if self.is_stale(session.meeting_id, epoch):
+                    return ""
+                print(f"🤔 Asking AI...")
+                with attribute(meeting_id=session.meeting_id):
+                    async for sentence in self.llm_client.astream_clarifying_question(full_context, prompt):
+                        question.push(sentence)
+        finally:
+            # Also on cancellation, so a release following this question never waits forever
+            question.close()
+
+        self.prefilter.record_outcome(decision, bool(question.sentences))
+        return question.text
+
+    def _llm_slot(self, session: MeetingSession):
+        if self.batcher:
+            # Meetings closest to their silence deadline go first
+            return self.batcher.slot(session.deadline)
+        return self.llm_slots
+
+    async def release(self, meeting_id, task: asyncio.Task, question: StreamedQuestion, epoch: int):
+        """Speaks a committed question sentence by sentence, stopping as soon as the meeting moves on."""
+        spoken = 0
+        try:
+            async for sentence in question.follow():
+                if self.is_stale(meeting_id, epoch):
+                    print(f"🗑️ Dropping stale answer for Meeting {meeting_id} (conversation moved on).")
+                    break
+                print(f"💡 AI Decided to Speak: {sentence}")
+                speak_msg = {
+                    "meeting_id": meeting_id,
+                    "text": sentence,
+                    "final": False
+                }
+                await self.redis_client.rpush("speak_request_queue", json.dumps(speak_msg))
+                spoken += 1
+        finally:
+            if self.committed.get(meeting_id) is task:
+                del self.committed[meeting_id]
+
+        # Either way the session was popped, so the same text is never re-analyzed
+        # ("Silence Loop") and the meeting starts fresh on its next utterance.
+        if spoken:
+            # End of utterance: the bot mutes again and clears this meeting's context
+            await self.redis_client.rpush("speak_request_queue", json.dumps({"meeting_id": meeting_id, "final": True}))
+        elif not task.cancelled() and not self.is_stale(meeting_id, epoch):
+            print(f"🤐 AI stayed silent.")
+
+    async def drain(self):
+        """Waits for every in-flight analysis and pending release (used in tests and shutdown)."""
+        pending = [task for task, _, _ in self.inflight.values()] + list(self.releases)
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def run(self):
+        while True:
+            try:
+                # Block until either a new segment arrives or the earliest silence deadline passes
+                item = await self.redis_client.blpop("conversation_analysis_queue", timeout=self.next_timeout(time.time()))
+
+                if item:
+                    _, data_str = item
+                    self.handle_message(json.loads(data_str), time.time())
+
+                self.run_due(time.time())
+
+            except Exception as e:
+                print(f"⚠️ Analysis Service Error: {e}")
+                await asyncio.sleep(1)
+
+async def serve():
+    print("🤖 Starting AI Analysis Service (Per-meeting Silence Deadlines)...")
+
     try:
-        redis_client = redis.from_url(REDIS_URL)
-        redis_client.ping()
+        redis_client = redis_async.from_url(REDIS_URL)
+        await redis_client.ping()
         print(f"✅ Connected to Redis at {REDIS_URL}")
     except Exception as e:
         print(f"❌ Redis Connection Error: {e}")
         return
 
-    llm_client = LLMClient()
-    db = database.SessionLocal()
-
-    context_buffer = []
-    MAX_BUFFER = 15 
-    
-    # 1. Configurable Silence Threshold (Seconds)
-    SILENCE_THRESHOLD = 3.0 
-    last_speech_time = time.time()
-    
-    current_meeting_id = None
+    # May be a local server (REALTIME_LLM_BACKEND=local) to keep WAN latency off the spoken path
+    llm_client = get_llm_client(REALTIME_LLM_BACKEND)
+    # A local server is shared by every live meeting: feed it batches instead of a trickle
+    batcher = BatchScheduler() if REALTIME_LLM_BACKEND == "local" else None
+    service = AnalysisService(redis_client, llm_client, batcher=batcher)
 
-    print(f"📡 Listening... (Will speak after {SILENCE_THRESHOLD}s of silence)")
+    if batcher:
+        limit = f"local batches of up to {batcher.max_batch} within {batcher.window * 1000:.0f}ms"
+    else:
+        limit = f"up to {MAX_CONCURRENT_LLM_CALLS} concurrent LLM calls"
+    print(f"📡 Listening... (Will speak after {SILENCE_THRESHOLD}s of silence per meeting, {limit})")
+    await service.run()
 
-    while True:
-        try:
-            # 2. Short timeout (0.5s) to check the clock frequently
-            # This prevents blocking for too long if we need to trigger logic
-            item = redis_client.blpop("conversation_analysis_queue", timeout=0.5)
-            
-            should_analyze = False
-            current_time = time.time()
-            
-            if item:
-                # --- SPEECH RECEIVED ---
-                # Reset the silence clock
-                last_speech_time = current_time
-                
-                _, data_str = item
-                data = json.loads(data_str)
-                text = data.get("text")
-                new_id = data.get("meeting_id")
-                speaker = data.get("speaker")
-
-                if new_id:
-                    current_meeting_id = new_id
-
-                # Handle Clear Signal
-                if text == "CLEAR_BUFFER_SIGNAL":
-                    print(f"🧹 Clearing buffer for Meeting {current_meeting_id}")
-                    context_buffer = []
-                    continue 
-
-                context_buffer.append(f"{speaker}: {text}")
-                
-                # Sliding Window: Keep buffer manageable, but DON'T trigger analysis
-                if len(context_buffer) > MAX_BUFFER:
-                    context_buffer.pop(0)
-
-            else:
-                # --- IDLE / POLLING ---
-                # Calculate how long it has been since the last word
-                time_since_speech = current_time - last_speech_time
-                
-                # Trigger ONLY if we have context AND sufficient silence has passed
-                if (len(context_buffer) > 0 and 
-                    current_meeting_id and 
-                    time_since_speech > SILENCE_THRESHOLD):
-                    
-                    print(f"⏳ Silence detected ({time_since_speech:.1f}s). Triggering Analysis...")
-                    should_analyze = True
-
-            # --- ANALYSIS LOGIC ---
-            if should_analyze and context_buffer and current_meeting_id:
-                full_context = "\n".join(context_buffer)
-                
-                # Reset DB session safely
-                db.close()
-                db = database.SessionLocal()
-                q_setting = db.query(models.Setting).filter(models.Setting.key == "question_prompt").first()
-                
-                default_prompt = (
-                    "You are a helpful Project Manager Assistant. "
-                    "The speaker has paused. If there is an ambiguity or missing detail in the recent text, ask a short clarification question. "
-                    "If everything is clear, say NO_QUESTION."
-                )
-                prompt = q_setting.value if q_setting else default_prompt
-                
-                print(f"🤔 Asking AI...")
-                question = llm_client.generate_clarifying_question(full_context, prompt)
-                
-                if question and len(question) > 5 and "NO_QUESTION" not in question:
-                    print(f"💡 AI Decided to Speak: {question}")
-                    
-                    speak_msg = {
-                        "meeting_id": current_meeting_id,
-                        "text": question
-                    }
-                    redis_client.rpush("speak_request_queue", json.dumps(speak_msg))
-                    
-                    # Clear buffer to reset context state
-                    context_buffer = []
-                    # Reset clock so we don't trigger again immediately for empty buffer
-                    last_speech_time = time.time()
-                else:
-                    print(f"🤐 AI stayed silent.")
-                    # If AI had nothing to say, clear buffer to prevent "Silence Loop"
-                    # analyzing the same text repeatedly.
-                    context_buffer = []
-                    last_speech_time = time.time()
-
-        except Exception as e:
-            print(f"⚠️ Analysis Service Error: {e}")
-            time.sleep(1)
+def main():
+    asyncio.run(serve())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,162 @@
+import asyncio
+import bisect
+import heapq
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+
+# Sequences the local server decodes together (vLLM max_num_seqs, llama.cpp --parallel, ...)
+LOCAL_LLM_MAX_BATCH = int(os.getenv("LOCAL_LLM_MAX_BATCH", "8"))
+# How long the first waiting request may be held so others can join its batch
+LOCAL_LLM_BATCH_WINDOW = float(os.getenv("LOCAL_LLM_BATCH_WINDOW_MS", "20")) / 1000
+REPORT_EVERY = 50
+
+class Histogram:
+    """Fixed-bucket histogram; bucket i counts values <= bounds[i], the last bucket everything above."""
+    def __init__(self, bounds: list):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (inf if it is the overflow bucket)."""
+        if not self.total:
+            return 0.0
+        rank = q * self.total
+        seen = 0
+        for bound, count in zip(self.bounds + [float("inf")], self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> dict:
+        labels = [f"<={b:g}" for b in self.bounds] + [f">{self.bounds[-1]:g}"]
+        return {
+            "count": self.total,
+            "mean": self.sum / self.total if self.total else 0.0,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+class BatchScheduler:
+    """
+    Admission scheduler for a local inference server shared by all live meetings.
+
+    Requests wait in a queue ordered by their meeting's silence deadline
+    (earliest first). Whenever the server has free sequence slots, the
+    scheduler holds the first waiter for up to `window` seconds so requests
+    from other meetings can join, then admits a whole batch at once, so the
+    server's continuous batcher decodes them together instead of one after
+    another. As soon as a slot frees up the next batch can form, without
+    waiting for the rest of the previous one. A request whose deadline is
+    closer than the window is admitted immediately.
+
+    Queue-wait and batch-size histograms are logged every REPORT_EVERY batches.
+    """
+    def __init__(self, max_batch: int = LOCAL_LLM_MAX_BATCH, window: float = LOCAL_LLM_BATCH_WINDOW):
+        self.max_batch = max_batch
+        self.window = window
+        self.inflight = 0
+        self._waiting = []          # heap of (deadline, seq, enqueued_at, future)
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._dispatcher = None
+        self.queue_wait = Histogram([0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5])
+        self.batch_size = Histogram(list(range(1, max(max_batch, 1) + 1)))
+
+    @asynccontextmanager
+    async def slot(self, deadline: float):
+        """Waits until this request is admitted in a batch; the slot is held for the body of the block."""
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (deadline, next(self._seq), time.monotonic(), future))
+        self._wake.set()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Admitted in the same tick we were cancelled: hand the slot back
+            if future.done() and not future.cancelled():
+                self._release()
+            else:
+                future.cancel()
+            raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        self.inflight -= 1
+        self._wake.set()
+
+    def _drop_cancelled(self):
+        while self._waiting and self._waiting[0][3].done():
+            heapq.heappop(self._waiting)
+
+    async def _sleep_until_woken(self, timeout: float = None):
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        while True:
+            self._drop_cancelled()
+            free = self.max_batch - self.inflight
+            if not self._waiting or free <= 0:
+                await self._sleep_until_woken()
+                continue
+
+            # Give other meetings a moment to join, unless the batch is already full or someone is urgent
+            oldest = min(entry[2] for entry in self._waiting)
+            hold_until = oldest + self.window
+            urgent = self._waiting[0][0] - time.time() <= self.window
+            now = time.monotonic()
+            if len(self._waiting) < free and not urgent and now < hold_until:
+                await self._sleep_until_woken(hold_until - now)
+                continue
+
+            self._admit(free)
+
+    def _admit(self, free: int):
+        now = time.monotonic()
+        admitted = 0
+        while self._waiting and admitted < free:
+            _, _, enqueued, future = heapq.heappop(self._waiting)
+            if future.done():
+                continue
+            future.set_result(None)
+            self.queue_wait.observe(now - enqueued)
+            admitted += 1
+        if not admitted:
+            return
+
+        self.inflight += admitted
+        self.batch_size.observe(admitted)
+        if self.batch_size.total % REPORT_EVERY == 0:
+            print(self.report())
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "waiting": sum(1 for entry in self._waiting if not entry[3].done()),
+            "queue_wait_seconds": self.queue_wait.snapshot(),
+            "batch_size": self.batch_size.snapshot(),
+        }
+
+    def report(self) -> str:
+        return (
+            f"📦 Local LLM batches: {self.batch_size.total} batches, mean size {self.batch_size.snapshot()['mean']:.1f}, "
+            f"queue wait p50 <= {self.queue_wait.quantile(0.5) * 1000:.0f}ms, "
+            f"p95 <= {self.queue_wait.quantile(0.95) * 1000:.0f}ms"
+        )
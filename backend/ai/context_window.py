@@ -0,0 +1,84 @@
+import os
+from collections import deque
+
+# Approximate prompt budget for the live transcript sent with each clarifying-question call
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "600"))
+# Budget for the rolling summary of lines that have slid out of the window
+SUMMARY_TOKEN_BUDGET = int(os.getenv("CONTEXT_SUMMARY_TOKEN_BUDGET", "120"))
+GIST_WORDS = 12
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English), no tokenizer needed."""
+    return max(1, (len(text) + 3) // 4)
+
+class ContextWindow:
+    """
+    Recent transcript lines bounded by an approximate token budget.
+
+    Lines live in a deque with their token counts, and the running total is
+    updated as lines enter and leave, so appends are O(1) amortized. Lines
+    pushed out of the window are folded into a compact rolling summary (a
+    short gist per line, itself bounded by SUMMARY_TOKEN_BUDGET) so older
+    context is condensed rather than lost outright.
+    """
+    def __init__(self, token_budget: int = CONTEXT_TOKEN_BUDGET, summary_budget: int = SUMMARY_TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self._lines = deque()      # (line, tokens)
+        self._tokens = 0
+        self._summary = deque()    # (gist, tokens)
+        self._summary_tokens = 0
+
+    def __len__(self):
+        return len(self._lines)
+
+    @property
+    def tokens(self) -> int:
+        return self._tokens + self._summary_tokens
+
+    def append(self, line: str):
+        tokens = estimate_tokens(line)
+        if tokens > self.token_budget:
+            # A single monologue longer than the whole budget: keep the speaker and its most recent part
+            speaker, sep, text = line.partition(": ") if ": " in line[:64] else ("", "", line)
+            prefix = f"{speaker}{sep}…"
+            line = prefix + text[-(self.token_budget * 4 - len(prefix)):]
+            tokens = estimate_tokens(line)
+
+        self._lines.append((line, tokens))
+        self._tokens += tokens
+
+        while self._tokens > self.token_budget and len(self._lines) > 1:
+            old, old_tokens = self._lines.popleft()
+            self._tokens -= old_tokens
+            self._fold(old)
+
+    def _fold(self, line: str):
+        speaker, sep, text = line.partition(": ")
+        if not sep:
+            speaker, text = "", line
+        words = text.split()
+        gist = " ".join(words[:GIST_WORDS]) + ("…" if len(words) > GIST_WORDS else "")
+        if speaker:
+            gist = f"{speaker}: {gist}"
+
+        tokens = estimate_tokens(gist)
+        self._summary.append((gist, tokens))
+        self._summary_tokens += tokens
+        while self._summary_tokens > self.summary_budget and len(self._summary) > 1:
+            _, dropped = self._summary.popleft()
+            self._summary_tokens -= dropped
+
+    def clear(self):
+        self._lines.clear()
+        self._summary.clear()
+        self._tokens = 0
+        self._summary_tokens = 0
+
+    def render(self) -> str:
+        """Prompt text: the rolling summary (if any) followed by the recent lines verbatim."""
+        parts = []
+        if self._summary:
+            parts.append("[Earlier in the meeting] " + "; ".join(g for g, _ in self._summary))
+        parts.extend(line for line, _ in self._lines)
+        return "\n".join(parts)
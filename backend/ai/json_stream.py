@@ -0,0 +1,69 @@
+import json
+
+class TaskStreamParser:
+    """
+    Incremental parser for streamed task-extraction output.
+
+    feed() takes the next piece of generated text and returns the task
+    objects that closed in it, so each task can be shown while the rest is
+    still being generated. Tasks are the objects directly inside the first
+    JSON array ({"tasks": [{...}, ...]} or a bare [{...}, ...]). Text outside
+    the JSON (code fences, a preamble) is ignored, and an object that does not
+    parse is skipped instead of failing the whole extraction.
+    """
+    def __init__(self):
+        self._buffer = []       # characters of the object being read
+        self._stack = []        # open containers: "{" or "["
+        self._array_depth = None
+        self._in_string = False
+        self._escape = False
+        self.skipped = 0
+
+    def feed(self, text: str) -> list:
+        tasks = []
+        for ch in text:
+            reading = bool(self._buffer)
+            if reading:
+                self._buffer.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                # Quotes in prose before the JSON starts are not strings
+                self._in_string = bool(self._stack)
+            elif ch in "{[":
+                if ch == "[" and self._array_depth is None:
+                    self._array_depth = len(self._stack) + 1
+                elif ch == "{" and not reading and len(self._stack) == self._array_depth:
+                    self._buffer.append(ch)
+                self._stack.append(ch)
+            elif ch in "}]" and self._stack:
+                self._stack.pop()
+                if reading and len(self._stack) == self._array_depth:
+                    task = self._finish("".join(self._buffer))
+                    self._buffer = []
+                    if task:
+                        tasks.append(task)
+        return tasks
+
+    def _finish(self, raw: str):
+        try:
+            task = json.loads(raw)
+        except ValueError:
+            self.skipped += 1
+            return None
+        if not isinstance(task, dict) or not task.get("title"):
+            self.skipped += 1
+            return None
+        return {"title": str(task["title"]), "description": str(task.get("description") or "")}
+
+def parse_tasks(text: str) -> list:
+    """Every well-formed task in a complete (or truncated) task-extraction response."""
+    return TaskStreamParser().feed(text)
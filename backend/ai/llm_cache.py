@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from backend.common.redis_client import get_redis_client
+
+# Opt-out for the whole process (e.g. when comparing models or debugging prompts)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+
+KEY_PREFIX = "llm_cache:"
+LRU_KEY = "llm_cache_lru"        # sorted set: cache key -> last access time
+STATS_KEY = "llm_cache_stats"    # hash: "<method>:hits" / "<method>:misses", shared by all processes
+REPORT_EVERY = 50
+
+class LLMResponseCache:
+    """
+    Content-addressed cache for deterministic LLM calls, stored in Redis.
+
+    Entries are keyed by a hash of (model, messages, params), so the same
+    prompt on the same input is answered once, by whichever process asks
+    first. Every entry expires LLM_CACHE_TTL after its last use, and an LRU index keeps
+    the cache to LLM_CACHE_MAX_ENTRIES. Redis problems are treated as a
+    miss: the cache can make a call cheaper but never makes it fail.
+    """
+    def __init__(self, redis_client=None, ttl: int = LLM_CACHE_TTL, max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 enabled: bool = LLM_CACHE_ENABLED):
+        self._redis = redis_client
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._lookups = 0
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            self._redis = get_redis_client()
+        return self._redis
+
+    @staticmethod
+    def key(model: str, messages: list, params: dict) -> str:
+        payload = json.dumps({"model": model, "messages": messages, "params": params},
+                             sort_keys=True, separators=(",", ":"))
+        return KEY_PREFIX + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, method: str, key: str):
+        """Cached response for `key`, or None on a miss."""
+        if not self.enabled:
+            return None
+        try:
+            value = self.redis.get(key)
+            if value is not None:
+                # A hit keeps the entry for another TTL, so its LRU score never outlives the value
+                pipe = self.redis.pipeline()
+                pipe.expire(key, self.ttl)
+                pipe.zadd(LRU_KEY, {key: time.time()})
+                pipe.execute()
+            self._record(method, value is not None)
+        except Exception as e:
+            print(f"⚠️ LLM cache read failed ({method}): {e}")
+            return None
+
+        if value is None:
+            return None
+        print(f"♻️ LLM cache hit ({method})")
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def set(self, key: str, value: str):
+        if not self.enabled:
+            return
+        now = time.time()
+        try:
+            pipe = self.redis.pipeline()
+            pipe.set(key, value, ex=self.ttl)
+            pipe.zadd(LRU_KEY, {key: now})
+            # Forget index entries whose values have already expired
+            pipe.zremrangebyscore(LRU_KEY, 0, now - self.ttl)
+            pipe.zcard(LRU_KEY)
+            size = pipe.execute()[-1]
+
+            if size > self.max_entries:
+                evicted = [member for member, _ in self.redis.zpopmin(LRU_KEY, size - self.max_entries)]
+                if evicted:
+                    self.redis.delete(*evicted)
+        except Exception as e:
+            print(f"⚠️ LLM cache write failed: {e}")
+
+    def _record(self, method: str, hit: bool):
+        self.redis.hincrby(STATS_KEY, f"{method}:{'hits' if hit else 'misses'}", 1)
+        with self._lock:
+            self._lookups += 1
+            report = self._lookups % REPORT_EVERY == 0
+        if report:
+            print(self.report())
+
+    def stats(self) -> dict:
+        """Hits, misses and hit rate per LLMClient method, across every process sharing the Redis."""
+        raw = self.redis.hgetall(STATS_KEY)
+        stats = {}
+        for field, count in raw.items():
+            field = field.decode("utf-8") if isinstance(field, bytes) else field
+            method, _, kind = field.rpartition(":")
+            stats.setdefault(method, {"hits": 0, "misses": 0})[kind] = int(count)
+        for s in stats.values():
+            total = s["hits"] + s["misses"]
+            s["hit_rate"] = s["hits"] / total if total else 0.0
+        return stats
+
+    def report(self) -> str:
+        parts = [f"{method} {s['hit_rate']:.0%} of {s['hits'] + s['misses']}" for method, s in sorted(self.stats().items())]
+        return "📦 LLM cache hit rates: " + (", ".join(parts) or "no lookups yet")
+
+llm_cache = LLMResponseCache()
@@ -1,36 +1,283 @@
+import asyncio
 import os
-from huggingface_hub import InferenceClient
+import random
+import threading
+import time
+from huggingface_hub import AsyncInferenceClient, InferenceClient
+from backend.ai.json_stream import TaskStreamParser
+from backend.ai.llm_cache import llm_cache
+from backend.ai.llm_metrics import llm_metrics
+from backend.ai.llm_usage import current_attribution, llm_usage
+from backend.ai.sentence_splitter import SentenceSplitter
+from backend.ai.summarizer import SUMMARY_CHUNK_TOKENS, MapReduceSummarizer
+from backend.ai.context_window import estimate_tokens
 
-class LLMClient:
-    def __init__(self):
+SUMMARY_PROMPT = "You are a Technical Project Manager. Summarize the following meeting transcript into clear bullet points, focusing on requirements, decisions, and action items."
+FOLD_PROMPT = (
+    "You are a Technical Project Manager keeping running notes of a meeting that is still in progress. "
+    "You get the current notes and the next part of the transcript. Return the complete updated notes as clear bullet points, "
+    "focusing on requirements, decisions, and action items. Keep everything still relevant from the current notes, "
+    "and where the new part changes an earlier decision keep only the new one."
+)
+REVISE_PROMPT = (
+    "You are a Senior Software Architect maintaining a Project Specification in Markdown. "
+    "You get the current specification and the part of the meeting transcript recorded since it was written. "
+    "Return the complete revised specification: add new requirements, decisions and action items, update anything "
+    "the new discussion changed, and keep everything else (including its wording and structure) as it is. "
+    "If nothing in the new part affects the specification, return it unchanged."
+)
+
+# Retries for rate limits (429) and server errors (5xx): full-jitter exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8.0"))
+
+def _status_code(exc: Exception):
+    # HfHubHTTPError carries the requests/httpx response; aiohttp errors carry .status
+    code = getattr(getattr(exc, "response", None), "status_code", None)
+    if not isinstance(code, int):
+        code = getattr(exc, "status", None)
+    return code if isinstance(code, int) else None
+
+def retry_delay(exc: Exception, attempt: int):
+    """Seconds to wait before retrying after `exc`, or None if it should not be retried."""
+    status = _status_code(exc)
+    if status is None or not (status == 429 or 500 <= status < 600) or attempt >= LLM_MAX_RETRIES:
+        return None
+    retry_after = getattr(getattr(exc, "response", None), "headers", {}) or {}
+    try:
+        return min(LLM_BACKOFF_MAX, float(retry_after.get("Retry-After")))
+    except (TypeError, ValueError):
+        return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+# Which backend serves completions: "huggingface" (serverless API) or "local" (OpenAI-compatible server)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "huggingface").lower()
+# Lets the real-time question path run on a local server while summaries/specs stay on the hosted model
+REALTIME_LLM_BACKEND = os.getenv("REALTIME_LLM_BACKEND", LLM_BACKEND).lower()
+LOCAL_LLM_URL = os.getenv("LOCAL_LLM_URL", "http://localhost:8080/v1")
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "llama-3.2-3b-instruct")
+LOCAL_LLM_TIMEOUT = float(os.getenv("LOCAL_LLM_TIMEOUT", "60"))
+
+class LLMBackend:
+    """
+    Where LLMClient sends chat completions.
+
+    A backend provides `model` plus a sync `client` and an `async_client`
+    whose chat_completion(model=..., messages=..., max_tokens=..., stream=...)
+    behave like huggingface_hub's InferenceClient (same response objects and
+    HTTP errors), so retries, caching and metrics work the same for all of them.
+    """
+    name = "base"
+    model = None
+    client = None
+    async_client = None
+
+    def json_format(self, schema: dict):
+        """response_format constraining generation to `schema`, or None if the backend can't."""
+        return None
+
+class HuggingFaceBackend(LLMBackend):
+    """Hugging Face serverless inference (the default)."""
+    name = "huggingface"
+
+    def __init__(self, model: str = "meta-llama/Llama-3.2-3B-Instruct"):
         # Prefer HUGGING_FACE_KEY, fallback to OPENAI_API_KEY (if user reused it), or warn.
         self.api_key = os.getenv("HUGGING_FACE_KEY") or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             print("⚠️ WARNING: HUGGING_FACE_KEY is not set.")
-        
+
         self.client = InferenceClient(token=self.api_key)
+        # Used by the real-time analyser so a slow completion never blocks its event loop
+        self.async_client = AsyncInferenceClient(token=self.api_key)
         # Using Llama 3.2 3B as it is widely supported on serverless
-        self.model = "meta-llama/Llama-3.2-3B-Instruct"
+        self.model = model
 
-    def summarize_meeting(self, transcript: str) -> str:
-        """Summarizes the raw transcript into key points."""
-        system_prompt = "You are a Technical Project Manager. Summarize the following meeting transcript into clear bullet points, focusing on requirements, decisions, and action items."
-        
+    def json_format(self, schema: dict):
+        # TGI grammar-constrained decoding
+        return {"type": "json", "value": schema}
+
+class LocalOpenAIBackend(LLMBackend):
+    """
+    A self-hosted OpenAI-compatible server (vLLM, llama.cpp server, Ollama, TGI, ...)
+    or backend.ai.stub_llm_server. No WAN round trip and no shared rate limits.
+    """
+    name = "local"
+
+    def __init__(self, base_url: str = LOCAL_LLM_URL, model: str = LOCAL_LLM_MODEL, api_key: str = None,
+                 timeout: float = LOCAL_LLM_TIMEOUT):
+        # Most local servers ignore the key, but the OpenAI protocol expects one
+        api_key = api_key or os.getenv("LOCAL_LLM_API_KEY") or "local"
+        self.base_url = base_url
+        self.client = InferenceClient(base_url=base_url, api_key=api_key, timeout=timeout)
+        self.async_client = AsyncInferenceClient(base_url=base_url, api_key=api_key, timeout=timeout)
+        self.model = model
+
+    def json_format(self, schema: dict):
+        # OpenAI structured outputs (vLLM, llama.cpp server, ...)
+        return {"type": "json_schema", "json_schema": {"name": "response", "schema": schema}}
+
+BACKENDS = {
+    HuggingFaceBackend.name: HuggingFaceBackend,
+    LocalOpenAIBackend.name: LocalOpenAIBackend,
+}
+
+def make_backend(name: str = LLM_BACKEND) -> LLMBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{name}' (expected one of: {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
+
+TASKS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "tasks": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"title": {"type": "string"}, "description": {"type": "string"}},
+                "required": ["title", "description"],
+            },
+        },
+    },
+    "required": ["tasks"],
+}
+
+TASKS_PROMPT = """
+        You are a Technical Project Manager. Given a Project Specification, extract actionable tasks.
+        Return ONLY a raw JSON object (no markdown formatting, no backticks).
+        Format:
+        {
+            "tasks": [
+                {
+                    "title": "Short title of the task",
+                    "description": "Detailed description suitable for a GitHub Issue body"
+                }
+            ]
+        }
+        """
+
+def _usage(response) -> tuple:
+    usage = getattr(response, "usage", None)
+    prompt = getattr(usage, "prompt_tokens", 0)
+    completion = getattr(usage, "completion_tokens", 0)
+    return (prompt if isinstance(prompt, int) else 0, completion if isinstance(completion, int) else 0)
+
+class LLMClient:
+    def __init__(self, cache=None, metrics=None, backend: LLMBackend = None, usage=None):
+        self.backend = backend or make_backend()
+        self.client = self.backend.client
+        self.async_client = self.backend.async_client
+        self.model = self.backend.model
+        # Shared Redis-backed cache for the deterministic methods (summary, spec, tasks)
+        self.cache = cache or llm_cache
+        self.metrics = metrics or llm_metrics
+        # Per-call log charged to the current meeting/project (see llm_usage.attribute)
+        self.usage = usage or llm_usage
+
+    def _record(self, method: str, latency: float, prompt_tokens: int = 0, completion_tokens: int = 0,
+                error: bool = False, retries: int = 0, cache_hit: bool = False, attribution: dict = None):
+        if not cache_hit:
+            self.metrics.record(method, latency, prompt_tokens, completion_tokens, error=error, retries=retries)
+        self.usage.record(method, self.model, latency, prompt_tokens, completion_tokens,
+                          cache_hit=cache_hit, error=error, attribution=attribution)
+
+    def _chat(self, method: str, record: bool = True, attribution: dict = None, **kwargs):
+        """
+        chat_completion with retries on 429/5xx, recorded in the per-method metrics.
+        With record=False (streams) the caller records the call once it has been consumed.
+        """
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                response = self.client.chat_completion(model=self.model, **kwargs)
+                break
+            except Exception as e:
+                delay = retry_delay(e, attempt)
+                if delay is None:
+                    self._record(method, time.perf_counter() - start, error=True, retries=attempt, attribution=attribution)
+                    raise
+                print(f"⏳ LLM {method} failed with HTTP {_status_code(e)}, retrying in {delay:.1f}s...")
+                time.sleep(delay)
+                attempt += 1
+
+        if record:
+            self._record(method, time.perf_counter() - start, *_usage(response), retries=attempt, attribution=attribution)
+        return response
+
+    async def _achat(self, method: str, record: bool = True, **kwargs):
+        """Async _chat. With record=False (streams) the caller records the call once it has been consumed."""
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            try:
+                response = await self.async_client.chat_completion(model=self.model, **kwargs)
+                break
+            except Exception as e:
+                delay = retry_delay(e, attempt)
+                if delay is None:
+                    self._record(method, time.perf_counter() - start, error=True, retries=attempt)
+                    raise
+                print(f"⏳ LLM {method} failed with HTTP {_status_code(e)}, retrying in {delay:.1f}s...")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+        if record:
+            self._record(method, time.perf_counter() - start, *_usage(response), retries=attempt)
+        return response
+
+    def _complete(self, method: str, messages: list, max_tokens: int, use_cache: bool = True, **params) -> str:
+        """
+        Chat completion served from the response cache when the same request was answered before.
+        With use_cache=False (a refresh) the cached answer is skipped, and the new one replaces it.
+        """
+        key = self.cache.key(self.model, messages, {"max_tokens": max_tokens, **params})
+        if use_cache:
+            start = time.perf_counter()
+            cached = self.cache.get(method, key)
+            if cached is not None:
+                self._record(method, time.perf_counter() - start, cache_hit=True)
+                return cached
+
+        response = self._chat(method, messages=messages, max_tokens=max_tokens, **params)
+        content = response.choices[0].message.content
+        # Only successful completions get here, so error fallbacks are never cached
+        self.cache.set(key, content)
+        return content
+
+    def _summarize(self, transcript: str, use_cache: bool = True) -> str:
+        def complete(prompt: str, text: str, max_tokens: int) -> str:
+            return self._complete("summarize_meeting", [
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": text}
+            ], max_tokens=max_tokens, use_cache=use_cache)
+
+        return MapReduceSummarizer(complete).summarize(transcript, SUMMARY_PROMPT)
+
+    def summarize_meeting(self, transcript: str, use_cache: bool = True) -> str:
+        """Summarizes the raw transcript into key points (map-reduce over chunks for long meetings)."""
         try:
-            response = self.client.chat_completion(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": transcript}
-                ],
-                max_tokens=2000
-            )
-            return response.choices[0].message.content
+            return self._summarize(transcript, use_cache=use_cache)
         except Exception as e:
             print(f"HF Error (Summarize): {e}")
             return "Error generating summary."
 
-    def generate_specification(self, summary: str, custom_prompt: str = None) -> str:
+    def fold_summary(self, previous_summary: str, new_transcript: str, use_cache: bool = True) -> str:
+        """
+        Folds the next block of a live meeting's transcript into its running summary.
+        Unlike summarize_meeting this raises on failure, so the caller keeps the block for the next fold.
+        """
+        if not previous_summary:
+            return self._summarize(new_transcript, use_cache=use_cache)
+        if estimate_tokens(new_transcript) > SUMMARY_CHUNK_TOKENS:
+            # A long backlog (e.g. a missed fold): condense it first so the fold request stays small
+            new_transcript = self._summarize(new_transcript, use_cache=use_cache)
+
+        return self._complete("fold_summary", [
+            {"role": "system", "content": FOLD_PROMPT},
+            {"role": "user", "content": f"Current notes:\n{previous_summary}\n\nNext part of the transcript:\n{new_transcript}"}
+        ], max_tokens=2000, use_cache=use_cache)
+
+    def generate_specification(self, summary: str, custom_prompt: str = None, use_cache: bool = True) -> str:
         """
         Converts the summary into a Markdown Specification.
         Uses custom_prompt from Settings if provided.
@@ -54,48 +301,53 @@ class LLMClient:
             """
         
         try:
-            response = self.client.chat_completion(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": summary}
-                ],
-                max_tokens=3000
-            )
-            return response.choices[0].message.content
+            return self._complete("generate_specification", [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": summary}
+            ], max_tokens=3000, use_cache=use_cache)
         except Exception as e:
             print(f"HF Error (Spec Gen): {e}")
             return "# Error\nCould not generate specification."
 
-    def extract_tasks(self, spec_content: str) -> str:
+    def revise_specification(self, current_spec: str, new_transcript: str, custom_prompt: str = None,
+                             use_cache: bool = True) -> str:
         """
-        Extracts tasks from the specification content as a JSON string.
-        Expected format: {"tasks": [{"title": "...", "description": "..."}]}
+        Updates an existing specification with only the transcript recorded since it was generated.
+        Raises on failure, so the caller keeps the current version instead of storing an error.
         """
-        system_prompt = """
-        You are a Technical Project Manager. Given a Project Specification, extract actionable tasks.
-        Return ONLY a raw JSON object (no markdown formatting, no backticks).
-        Format:
-        {
-            "tasks": [
-                {
-                    "title": "Short title of the task",
-                    "description": "Detailed description suitable for a GitHub Issue body"
-                }
-            ]
+        if estimate_tokens(new_transcript) > SUMMARY_CHUNK_TOKENS:
+            # A long follow-up discussion: condense it first so the revision request stays small
+            new_transcript = self._summarize(new_transcript, use_cache=use_cache)
+
+        system_prompt = REVISE_PROMPT
+        if custom_prompt:
+            system_prompt += f"\n\nThe specification follows these instructions:\n{custom_prompt}"
+
+        return self._complete("revise_specification", [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": f"Current specification:\n{current_spec}\n\nNew discussion:\n{new_transcript}"}
+        ], max_tokens=3000, use_cache=use_cache)
+
+    def _tasks_request(self, spec_content: str) -> dict:
+        params = {
+            "messages": [
+                {"role": "system", "content": TASKS_PROMPT},
+                {"role": "user", "content": spec_content}
+            ],
+            "max_tokens": 2000,
         }
+        response_format = self.backend.json_format(TASKS_SCHEMA)
+        if response_format:
+            params["response_format"] = response_format
+        return params
+
+    def extract_tasks(self, spec_content: str, use_cache: bool = True) -> str:
+        """
+        Extracts tasks from the specification content as a JSON string.
+        Expected format: {"tasks": [{"title": "...", "description": "..."}]}
         """
-        
         try:
-            response = self.client.chat_completion(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": spec_content}
-                ],
-                max_tokens=2000
-            )
-            content = response.choices[0].message.content
+            content = self._complete("extract_tasks", use_cache=use_cache, **self._tasks_request(spec_content))
             # Clean up potential markdown code blocks if the model captures them
             content = content.replace("```json", "").replace("```", "").strip()
             return content
@@ -103,11 +355,53 @@ class LLMClient:
             print(f"HF Error (Task Extraction): {e}")
             return '{"tasks": []}'
 
-    def generate_clarifying_question(self, transcript_segment: str, custom_prompt: str = None) -> str:
+    def stream_tasks(self, spec_content: str, use_cache: bool = True):
         """
-        Analyzes a segment of the meeting to check for ambiguities.
-        Uses custom_prompt from Settings if provided.
+        Yields each extracted task ({"title", "description"}) as soon as its JSON object closes.
+        Shares extract_tasks' cache entry: a cached extraction is replayed at once, and a
+        stream that runs to completion is stored for both.
         """
+        # Captured now: the generator may be consumed from another thread or context
+        return self._stream_tasks(spec_content, use_cache, current_attribution())
+
+    def _stream_tasks(self, spec_content: str, use_cache: bool, attribution: dict):
+        request = self._tasks_request(spec_content)
+        params = {k: v for k, v in request.items() if k != "messages"}
+        key = self.cache.key(self.model, request["messages"], params)
+        parser = TaskStreamParser()
+
+        start = time.perf_counter()
+        cached = self.cache.get("extract_tasks", key) if use_cache else None
+        if cached is not None:
+            self._record("stream_tasks", time.perf_counter() - start, cache_hit=True, attribution=attribution)
+            yield from parser.feed(cached)
+            return
+
+        text = []
+        stream = None
+        failed = False
+        try:
+            stream = self._chat("stream_tasks", record=False, stream=True, attribution=attribution, **request)
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    text.append(delta)
+                    yield from parser.feed(delta)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            # Failures to open the stream were already recorded by _chat
+            if stream is not None:
+                self._record("stream_tasks", time.perf_counter() - start, completion_tokens=len(text), error=failed,
+                             attribution=attribution)
+            if parser.skipped:
+                print(f"⚠️ Skipped {parser.skipped} malformed task(s) in the extraction stream")
+
+        if text:
+            self.cache.set(key, "".join(text))
+
+    def _question_messages(self, transcript_segment: str, custom_prompt: str = None) -> list:
         if custom_prompt:
             system_prompt = custom_prompt
         else:
@@ -116,24 +410,116 @@ class LLMClient:
             Analyze the transcript. If there is ANY opportunity to clarify a requirement, tech stack choice, or deadline, ask a short question (1 sentence).
             Do NOT stay silent unless the text is empty or nonsense.
             """
-        
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": transcript_segment}
+        ]
+
+    @staticmethod
+    def _clean_question(content: str) -> str:
+        content = content.strip()
+        if "NO_QUESTION" in content or len(content) < 5:
+            return ""
+        # Clean up any accidental quotes
+        return content.replace('"', '')
+
+    def generate_clarifying_question(self, transcript_segment: str, custom_prompt: str = None) -> str:
+        """
+        Analyzes a segment of the meeting to check for ambiguities.
+        Uses custom_prompt from Settings if provided.
+        """
         try:
-            response = self.client.chat_completion(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": transcript_segment}
-                ],
+            response = self._chat(
+                "generate_clarifying_question",
+                messages=self._question_messages(transcript_segment, custom_prompt),
                 max_tokens=60
             )
-            content = response.choices[0].message.content.strip()
-            
-            if "NO_QUESTION" in content or len(content) < 5:
-                return ""
-            
-            # Clean up any accidental quotes
-            return content.replace('"', '')
+            return self._clean_question(response.choices[0].message.content)
             
         except Exception as e:
             print(f"HF Error (Question Gen): {e}")
-            return ""
\ No newline at end of file
+            return ""
+
+    async def agenerate_clarifying_question(self, transcript_segment: str, custom_prompt: str = None) -> str:
+        """Async variant of generate_clarifying_question for event-loop callers."""
+        try:
+            response = await self._achat(
+                "generate_clarifying_question",
+                messages=self._question_messages(transcript_segment, custom_prompt),
+                max_tokens=60
+            )
+            return self._clean_question(response.choices[0].message.content)
+
+        except Exception as e:
+            print(f"HF Error (Question Gen): {e}")
+            return ""
+
+    async def astream_clarifying_question(self, transcript_segment: str, custom_prompt: str = None):
+        """
+        Streams the clarifying question one sentence at a time, as soon as each is complete,
+        so speech synthesis can start before the whole completion has been generated.
+        Yields nothing if the model decides there is no question.
+        """
+        splitter = SentenceSplitter()
+        spoken = 0
+        start = time.perf_counter()
+        stream = None
+        chunks = 0
+        failed = False
+        try:
+            # Only opening the stream is retried; a stream that breaks halfway is not replayed
+            stream = await self._achat(
+                "stream_clarifying_question",
+                record=False,
+                messages=self._question_messages(transcript_segment, custom_prompt),
+                max_tokens=60,
+                stream=True
+            )
+            async for chunk in stream:
+                chunks += 1
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                for sentence in splitter.feed(delta or ""):
+                    if not self._speakable(sentence, spoken):
+                        return
+                    spoken += 1
+                    yield sentence.replace('"', '')
+
+            for sentence in splitter.flush():
+                if self._speakable(sentence, spoken):
+                    yield sentence.replace('"', '')
+
+        except Exception as e:
+            print(f"HF Error (Question Stream): {e}")
+            failed = True
+        finally:
+            # Failures to open the stream were already recorded by _achat
+            if stream is not None:
+                # Streamed chunks carry no usage; each one is roughly one token
+                self._record("stream_clarifying_question", time.perf_counter() - start,
+                             completion_tokens=chunks, error=failed)
+
+    @staticmethod
+    def _speakable(sentence: str, spoken: int) -> bool:
+        # Same rules as _clean_question, applied before the rest of the answer exists
+        return "NO_QUESTION" not in sentence and (spoken > 0 or len(sentence) >= 5)
+
+_shared_clients = {}
+_shared_pid = None
+_shared_lock = threading.Lock()
+
+def get_llm_client(backend: str = None) -> LLMClient:
+    """
+    The process-wide LLMClient for `backend` (default LLM_BACKEND). Its HTTP
+    clients keep their connection pools between calls and all callers share
+    one set of metrics. A forked child (e.g. a Celery prefork worker) builds its own.
+    """
+    global _shared_pid
+    backend = backend or LLM_BACKEND
+    if _shared_pid != os.getpid() or backend not in _shared_clients:
+        with _shared_lock:
+            if _shared_pid != os.getpid():
+                _shared_clients.clear()
+                _shared_pid = os.getpid()
+            if backend not in _shared_clients:
+                _shared_clients[backend] = LLMClient(backend=make_backend(backend))
+    return _shared_clients[backend]
@@ -0,0 +1,50 @@
+import threading
+
+REPORT_EVERY = 50
+
+class LLMMetrics:
+    """
+    In-process counters per LLMClient method: calls, errors, retries,
+    latency and token usage. Shared by every LLMClient in the process.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._methods = {}
+        self._calls = 0
+
+    def record(self, method: str, latency: float, prompt_tokens: int = 0, completion_tokens: int = 0,
+               error: bool = False, retries: int = 0):
+        with self._lock:
+            m = self._methods.setdefault(method, {
+                "calls": 0, "errors": 0, "retries": 0, "latency_total": 0.0, "latency_max": 0.0,
+                "prompt_tokens": 0, "completion_tokens": 0,
+            })
+            m["calls"] += 1
+            m["errors"] += int(error)
+            m["retries"] += retries
+            m["latency_total"] += latency
+            m["latency_max"] = max(m["latency_max"], latency)
+            m["prompt_tokens"] += prompt_tokens
+            m["completion_tokens"] += completion_tokens
+            self._calls += 1
+            report = self._calls % REPORT_EVERY == 0
+        if report:
+            print(self.report())
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {}
+            for method, m in self._methods.items():
+                stats[method] = dict(m, latency_avg=m["latency_total"] / m["calls"] if m["calls"] else 0.0)
+            return stats
+
+    def report(self) -> str:
+        parts = [
+            f"{method} {s['calls']} calls ({s['errors']} errors, {s['retries']} retries) "
+            f"avg {s['latency_avg']:.2f}s max {s['latency_max']:.2f}s, "
+            f"{s['prompt_tokens']}+{s['completion_tokens']} tokens"
+            for method, s in sorted(self.stats().items())
+        ]
+        return "📈 LLM calls: " + ("; ".join(parts) or "none yet")
+
+llm_metrics = LLMMetrics()
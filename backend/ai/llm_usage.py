@@ -0,0 +1,223 @@
+import atexit
+import json
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from sqlalchemy import func, case
+from backend.common import database, models
+
+LLM_USAGE_ENABLED = os.getenv("LLM_USAGE_ENABLED", "true").lower() == "true"
+# Buffered rows are written in one INSERT every interval, or sooner once this many are waiting
+LLM_USAGE_FLUSH_ROWS = int(os.getenv("LLM_USAGE_FLUSH_ROWS", "100"))
+LLM_USAGE_FLUSH_SECONDS = float(os.getenv("LLM_USAGE_FLUSH_SECONDS", "5"))
+# USD per million tokens: {"model": [prompt, completion]}; unlisted models cost 0
+LLM_PRICES = json.loads(os.getenv("LLM_PRICES", "{}") or "{}")
+
+_attribution = ContextVar("llm_attribution", default={})
+
+@contextmanager
+def attribute(meeting_id: int = None, project_id: int = None):
+    """LLM calls made inside the block (including from its asyncio tasks) are charged to this meeting/project."""
+    token = _attribution.set({"meeting_id": meeting_id, "project_id": project_id})
+    try:
+        yield
+    finally:
+        _attribution.reset(token)
+
+def current_attribution() -> dict:
+    return _attribution.get()
+
+class LLMUsageRecorder:
+    """
+    Per-call LLM usage log. record() only appends to an in-memory buffer; a
+    background thread writes the buffer to llm_calls in one bulk insert, so
+    the LLM call path never waits on the database. Rows that cannot be
+    written are dropped with a warning: accounting must never fail a call.
+    """
+    def __init__(self, session_factory=None, flush_rows: int = LLM_USAGE_FLUSH_ROWS,
+                 flush_interval: float = LLM_USAGE_FLUSH_SECONDS, enabled: bool = LLM_USAGE_ENABLED):
+        self.session_factory = session_factory or database.SessionLocal
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._wake = threading.Event()
+        self._flusher = None
+        self._pid = None
+
+    def record(self, method: str, model: str, latency: float, prompt_tokens: int = 0, completion_tokens: int = 0,
+               cache_hit: bool = False, error: bool = False, attribution: dict = None):
+        if not self.enabled:
+            return
+        attribution = attribution if attribution is not None else current_attribution()
+        row = {
+            "created_at": datetime.now(timezone.utc),
+            "meeting_id": attribution.get("meeting_id"),
+            "project_id": attribution.get("project_id"),
+            "method": method,
+            "model": model,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "latency_ms": int(latency * 1000),
+            "cache_hit": cache_hit,
+            "error": error,
+        }
+        with self._lock:
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.flush_rows
+        self._ensure_flusher()
+        if full:
+            self._wake.set()
+
+    def _ensure_flusher(self):
+        # Threads don't survive a fork (Celery prefork), so each process starts its own
+        if self._pid == os.getpid() and self._flusher and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._pid != os.getpid() or not (self._flusher and self._flusher.is_alive()):
+                self._pid = os.getpid()
+                self._flusher = threading.Thread(target=self._run, daemon=True, name="llm-usage-flusher")
+                self._flusher.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return 0
+        db = self.session_factory()
+        try:
+            db.bulk_insert_mappings(models.LLMCall, rows)
+            db.commit()
+            return len(rows)
+        except Exception as e:
+            print(f"⚠️ Dropped {len(rows)} LLM usage rows: {str(e).splitlines()[0]}")
+            db.rollback()
+            return 0
+        finally:
+            db.close()
+
+llm_usage = LLMUsageRecorder()
+atexit.register(llm_usage.flush)
+
+def _hour(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+def rollup_llm_usage(db, before: datetime = None) -> int:
+    """
+    Folds raw llm_calls rows older than `before` (default: the start of the
+    current hour) into hourly llm_usage_rollups rows and deletes them.
+    Returns the number of raw rows rolled up.
+    """
+    before = before or _hour(datetime.now(timezone.utc))
+    calls = db.query(models.LLMCall).filter(models.LLMCall.created_at < before).all()
+    if not calls:
+        return 0
+
+    buckets = {}
+    for call in calls:
+        key = (_hour(call.created_at), call.meeting_id, call.project_id, call.method, call.model)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = db.query(models.LLMUsageRollup).filter_by(
+                period_start=key[0], meeting_id=key[1], project_id=key[2], method=key[3], model=key[4]
+            ).first()
+            if bucket is None:
+                bucket = models.LLMUsageRollup(
+                    period_start=key[0], meeting_id=key[1], project_id=key[2], method=key[3], model=key[4],
+                    calls=0, cache_hits=0, errors=0, prompt_tokens=0, completion_tokens=0,
+                    latency_ms_total=0, latency_ms_max=0,
+                )
+                db.add(bucket)
+            buckets[key] = bucket
+        bucket.calls += 1
+        bucket.cache_hits += int(bool(call.cache_hit))
+        bucket.errors += int(bool(call.error))
+        bucket.prompt_tokens += call.prompt_tokens or 0
+        bucket.completion_tokens += call.completion_tokens or 0
+        bucket.latency_ms_total += call.latency_ms or 0
+        bucket.latency_ms_max = max(bucket.latency_ms_max, call.latency_ms or 0)
+
+    db.query(models.LLMCall).filter(models.LLMCall.id.in_([c.id for c in calls])).delete(synchronize_session=False)
+    db.commit()
+    return len(calls)
+
+def cost_usd(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = LLM_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+def _empty() -> dict:
+    return {"calls": 0, "cache_hits": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            "latency_ms_total": 0, "latency_ms_max": 0, "cost_usd": 0.0}
+
+def _add(totals: dict, row, model: str):
+    totals["calls"] += row.calls or 0
+    totals["cache_hits"] += row.cache_hits or 0
+    totals["errors"] += row.errors or 0
+    totals["prompt_tokens"] += row.prompt_tokens or 0
+    totals["completion_tokens"] += row.completion_tokens or 0
+    totals["latency_ms_total"] += row.latency_ms_total or 0
+    totals["latency_ms_max"] = max(totals["latency_ms_max"], row.latency_ms_max or 0)
+    totals["cost_usd"] += cost_usd(model, row.prompt_tokens or 0, row.completion_tokens or 0)
+
+def _finish(totals: dict) -> dict:
+    totals["latency_ms_avg"] = totals["latency_ms_total"] / totals["calls"] if totals["calls"] else 0.0
+    totals["cost_usd"] = round(totals["cost_usd"], 6)
+    return totals
+
+def usage_report(db, meeting_ids: list, project_id: int = None) -> dict:
+    """
+    LLM calls, cache hits, tokens, latency and cost for the given meetings
+    (plus calls charged directly to `project_id`), totalled and broken down
+    by method and by meeting. Reads the hourly rollups plus the raw rows
+    not rolled up yet.
+    """
+    Call, Rollup = models.LLMCall, models.LLMUsageRollup
+
+    def scope(table):
+        condition = table.meeting_id.in_(meeting_ids or [-1])
+        if project_id is not None:
+            condition = condition | (table.project_id == project_id)
+        return condition
+
+    raw = db.query(
+        Call.meeting_id, Call.method, Call.model,
+        func.count(Call.id).label("calls"),
+        func.sum(case((Call.cache_hit, 1), else_=0)).label("cache_hits"),
+        func.sum(case((Call.error, 1), else_=0)).label("errors"),
+        func.sum(Call.prompt_tokens).label("prompt_tokens"),
+        func.sum(Call.completion_tokens).label("completion_tokens"),
+        func.sum(Call.latency_ms).label("latency_ms_total"),
+        func.max(Call.latency_ms).label("latency_ms_max"),
+    ).filter(scope(Call)).group_by(Call.meeting_id, Call.method, Call.model)
+
+    rolled = db.query(
+        Rollup.meeting_id, Rollup.method, Rollup.model,
+        func.sum(Rollup.calls).label("calls"),
+        func.sum(Rollup.cache_hits).label("cache_hits"),
+        func.sum(Rollup.errors).label("errors"),
+        func.sum(Rollup.prompt_tokens).label("prompt_tokens"),
+        func.sum(Rollup.completion_tokens).label("completion_tokens"),
+        func.sum(Rollup.latency_ms_total).label("latency_ms_total"),
+        func.max(Rollup.latency_ms_max).label("latency_ms_max"),
+    ).filter(scope(Rollup)).group_by(Rollup.meeting_id, Rollup.method, Rollup.model)
+
+    totals, by_method, by_meeting = _empty(), {}, {}
+    for row in list(rolled) + list(raw):
+        _add(totals, row, row.model)
+        _add(by_method.setdefault(row.method, _empty()), row, row.model)
+        if row.meeting_id is not None:
+            _add(by_meeting.setdefault(row.meeting_id, _empty()), row, row.model)
+
+    report = _finish(totals)
+    report["by_method"] = {method: _finish(t) for method, t in sorted(by_method.items())}
+    report["by_meeting"] = {meeting_id: _finish(t) for meeting_id, t in sorted(by_meeting.items())}
+    return report
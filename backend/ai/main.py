@@ -4,8 +4,11 @@ import os
 import redis
 import threading
 from sqlalchemy.orm import Session
-from backend.common import database, models
-from backend.ai.llm_client import LLMClient
+from backend.common import database, spec_versions
+from backend.ai.llm_client import LLMClient, get_llm_client
+from backend.ai.prefilter import QuestionPrefilter
+from backend.common.settings_cache import get_setting_value
+from backend.common.transcript_document import load_document
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
@@ -15,7 +18,7 @@ def main():
     # Initialize Clients
     try:
         redis_client = redis.from_url(REDIS_URL)
-        llm_client = LLMClient()
+        llm_client = get_llm_client()
     except Exception as e:
         print(f"❌ Initialization Failed: {e}")
         return
@@ -53,21 +56,20 @@ def main():
 def process_meeting(meeting_id: int, project_id: int, llm_client: LLMClient):
     db = database.SessionLocal()
     try:
-        # 1. Fetch Transcripts
-        transcripts = db.query(models.Transcript)\
-            .filter(models.Transcript.meeting_id == meeting_id)\
-            .order_by(models.Transcript.timestamp).all()
+        # 1. Fetch Transcript (one row, kept current as lines are saved)
+        document = load_document(db, meeting_id)
         
-        if not transcripts:
+        if document is None:
             print("❌ No transcripts found. Skipping.")
             return
 
-        # Combine into one text block
-        full_text = "\n".join([f"{t.speaker}: {t.text}" for t in transcripts])
+        full_text = document.content
+        # What the spec is built from, so later jobs can revise it with only what follows
+        source = (document.content_hash, document.last_transcript_id, len(full_text))
+        full_text = full_text.rstrip("\n")
         
-        # 2. Fetch Custom Spec Prompt from Settings
-        spec_setting = db.query(models.Setting).filter(models.Setting.key == "spec_prompt").first()
-        custom_prompt = spec_setting.value if spec_setting else None
+        # 2. Fetch Custom Spec Prompt from Settings (in-memory cache)
+        custom_prompt = get_setting_value("spec_prompt")
 
         # 3. Generate Summary & Spec (Chain of Thought)
         print("   ... Summarizing ...")
@@ -76,16 +78,13 @@ def process_meeting(meeting_id: int, project_id: int, llm_client: LLMClient):
         print(f"   ... Generating Spec {'(Custom Prompt)' if custom_prompt else ''} ...")
         spec_content = llm_client.generate_specification(summary, custom_prompt=custom_prompt)
         
-        # 4. Save to DB
-        spec = models.Specification(
-            project_id=project_id,
-            meeting_id=meeting_id,
-            content=spec_content,
-            version="1.0.0"
+        # 4. Save to DB as the meeting's next version (with its history revision)
+        content_hash, last_transcript_id, document_offset = source
+        spec = spec_versions.save_version(
+            db, meeting_id, project_id, spec_content, parent=spec_versions.latest_specification(db, meeting_id),
+            transcript_hash=content_hash, last_transcript_id=last_transcript_id, document_offset=document_offset
         )
-        db.add(spec)
-        db.commit()
-        print("✅ Specification Saved!")
+        print(f"✅ Specification version {spec.version} saved!")
 
     except Exception as e:
         print(f"❌ Processing Failed: {e}")
@@ -99,6 +98,7 @@ def run_realtime_analysis(redis_client, llm_client):
     Uses the passed redis_client instance.
     """
     print("🧠 AI Analyst listening on 'conversation_analysis_queue'...")
+    prefilter = QuestionPrefilter()
     
     while True:
         try:
@@ -111,17 +111,20 @@ def run_realtime_analysis(redis_client, llm_client):
                 text = data.get("text")
                 speaker = data.get("speaker")
                 
+                # Skip the LLM for segments that clearly need no question
+                decision = prefilter.evaluate(text or "")
+                if not decision:
+                    continue
+
                 print(f"   🔍 Analyzing segment from {speaker}...")
                 
                 # Fetch Question Prompt from Settings
-                # (We open a short-lived session here to get dynamic updates)
-                db = database.SessionLocal()
-                q_setting = db.query(models.Setting).filter(models.Setting.key == "question_prompt").first()
-                custom_q_prompt = q_setting.value if q_setting else None
-                db.close()
+                # (Served from memory; updates arrive via Redis invalidation)
+                custom_q_prompt = get_setting_value("question_prompt")
 
                 # Ask LLM if we should intervene
                 question = llm_client.generate_clarifying_question(text, custom_prompt=custom_q_prompt)
+                prefilter.record_outcome(decision, bool(question and question != "NO_QUESTION"))
                 
                 if question and question != "NO_QUESTION":
                     print(f"💡 Generated Question: {question}")
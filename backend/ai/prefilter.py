@@ -0,0 +1,169 @@
+import json
+import math
+import os
+import random
+import re
+import threading
+
+# Decision threshold on the estimated probability that the LLM would ask something.
+PREFILTER_THRESHOLD = float(os.getenv("PREFILTER_THRESHOLD", "0.4"))
+# Fraction of would-be-skipped contexts still sent to the LLM, to estimate how many questions we miss.
+PREFILTER_AUDIT_RATE = float(os.getenv("PREFILTER_AUDIT_RATE", "0.05"))
+# Optional JSON file {"bias": float, "weights": {"ngram": float}} overriding the built-in model.
+PREFILTER_WEIGHTS_PATH = os.getenv("PREFILTER_WEIGHTS_PATH")
+REPORT_EVERY = 50
+MIN_WORDS = 4
+
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+NUMBER_RE = re.compile(r"\d")
+
+FILLER_WORDS = {
+    "um", "uh", "hmm", "mm", "yeah", "yes", "ok", "okay", "right", "so", "like",
+    "hi", "hello", "hey", "thanks", "thank", "you", "bye", "cool", "great", "nice",
+}
+
+# Log-odds contributions of unigrams/bigrams/trigrams. Positive = ambiguity, open
+# decisions or requirement talk; negative = small talk and call logistics.
+DEFAULT_BIAS = -1.2
+DEFAULT_WEIGHTS = {
+    "maybe": 0.9, "probably": 0.7, "not sure": 1.2, "i think": 0.5, "i guess": 0.7,
+    "should": 0.5, "need": 0.5, "needs to": 0.5, "must": 0.4, "have to": 0.4,
+    "deadline": 0.9, "by next": 0.6, "next week": 0.5, "end of": 0.4, "soon": 0.6, "later": 0.4,
+    "or": 0.3, "either": 0.5, "tbd": 1.2, "somehow": 0.8, "some kind of": 0.9,
+    "something like": 0.8, "etc": 0.6, "depends": 0.8, "figure out": 0.9, "what if": 0.7,
+    "we could": 0.6, "requirement": 0.7, "requirements": 0.7, "feature": 0.4, "users": 0.4,
+    "database": 0.6, "api": 0.6, "integrate": 0.6, "integration": 0.6, "budget": 0.6,
+    "thanks": -0.6, "bye": -0.8, "hello": -0.4, "sounds good": -0.7, "makes sense": -0.6,
+    "agreed": -0.4, "can you hear me": -1.5, "on mute": -1.5, "share my screen": -1.0,
+}
+
+def _sigmoid(x: float) -> float:
+    return 1.0 / (1.0 + math.exp(-x))
+
+class PrefilterDecision:
+    __slots__ = ("score", "ask", "audited")
+
+    def __init__(self, score: float, ask: bool, audited: bool = False):
+        self.score = score
+        self.ask = ask
+        # True when the context scored below threshold but was sampled for auditing
+        self.audited = audited
+
+    def __bool__(self):
+        return self.ask
+
+class QuestionPrefilter:
+    """
+    Cheap local gate in front of generate_clarifying_question.
+
+    Scores the context with a few heuristics plus a tiny linear model over word
+    n-grams (pure CPU, ~100 µs for a full context window) and only lets it through to the LLM
+    when the estimated chance of a useful question clears the threshold.
+    Tracks skip rate, LLM hit rate (calls that produced a question) and, from a
+    small audit sample of skipped contexts, the estimated miss rate.
+    """
+    def __init__(self, threshold: float = PREFILTER_THRESHOLD, audit_rate: float = PREFILTER_AUDIT_RATE,
+                 weights_path: str = PREFILTER_WEIGHTS_PATH):
+        self.threshold = threshold
+        self.audit_rate = audit_rate
+        self.bias = DEFAULT_BIAS
+        self.weights = dict(DEFAULT_WEIGHTS)
+        if weights_path:
+            self._load_weights(weights_path)
+        # Multi-word n-grams indexed by their first word, so scoring is a single pass
+        self._phrases = {}
+        for ngram, w in self.weights.items():
+            words = tuple(ngram.split())
+            if len(words) > 1:
+                self._phrases.setdefault(words[0], []).append((words, w))
+
+        self._lock = threading.Lock()
+        self.evaluated = 0
+        self.skipped = 0
+        self.llm_calls = 0
+        self.llm_hits = 0
+        self.audits = 0
+        self.audit_hits = 0
+
+    def _load_weights(self, path: str):
+        try:
+            with open(path) as f:
+                model = json.load(f)
+            self.bias = float(model.get("bias", self.bias))
+            self.weights = {k.lower(): float(v) for k, v in model["weights"].items()}
+            print(f"✅ Loaded prefilter weights from {path} ({len(self.weights)} n-grams)")
+        except Exception as e:
+            print(f"⚠️ Could not load prefilter weights from {path}, using defaults: {e}")
+
+    def score(self, context: str) -> float:
+        """Estimated probability (0..1) that the LLM would ask a question about `context`."""
+        # Drop "Speaker N:" prefixes so names and speaker numbers don't count as content
+        lines = [line.split(": ", 1)[-1] for line in context.splitlines()]
+        text = " ".join(lines).lower()
+        tokens = TOKEN_RE.findall(text)
+
+        if len(tokens) < MIN_WORDS and "?" not in text:
+            return 0.0
+
+        logit = self.bias
+        filler = sum(1 for t in tokens if t in FILLER_WORDS)
+        # No Latin-script words (e.g. "Что?"): nothing to judge filler by
+        if tokens and filler / len(tokens) > 0.7:
+            logit -= 2.0
+        if NUMBER_RE.search(text):
+            logit += 0.6
+        if "?" in text:
+            logit += 0.8
+
+        weights = self.weights
+        phrases = self._phrases
+        for i, token in enumerate(tokens):
+            logit += weights.get(token, 0.0)
+            for words, w in phrases.get(token, ()):
+                if tuple(tokens[i:i + len(words)]) == words:
+                    logit += w
+        return _sigmoid(logit)
+
+    def evaluate(self, context: str) -> PrefilterDecision:
+        score = self.score(context)
+        ask = score >= self.threshold
+        audited = not ask and random.random() < self.audit_rate
+        with self._lock:
+            self.evaluated += 1
+            if not ask and not audited:
+                self.skipped += 1
+            report = self.evaluated % REPORT_EVERY == 0
+        if report:
+            print(self.report())
+        return PrefilterDecision(score, ask or audited, audited)
+
+    def record_outcome(self, decision: PrefilterDecision, asked_question: bool):
+        """Feeds back whether the LLM call this decision allowed produced a question."""
+        with self._lock:
+            if decision.audited:
+                self.audits += 1
+                self.audit_hits += int(asked_question)
+            else:
+                self.llm_calls += 1
+                self.llm_hits += int(asked_question)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "threshold": self.threshold,
+                "evaluated": self.evaluated,
+                "skipped": self.skipped,
+                "skip_rate": self.skipped / self.evaluated if self.evaluated else 0.0,
+                "llm_calls": self.llm_calls,
+                "hit_rate": self.llm_hits / self.llm_calls if self.llm_calls else 0.0,
+                "audits": self.audits,
+                "est_miss_rate": self.audit_hits / self.audits if self.audits else 0.0,
+            }
+
+    def report(self) -> str:
+        s = self.stats()
+        return (
+            f"📉 Prefilter (threshold {s['threshold']:.2f}): {s['evaluated']} evaluated, "
+            f"{s['skip_rate']:.0%} skipped, LLM hit rate {s['hit_rate']:.0%} of {s['llm_calls']} calls, "
+            f"est. miss rate {s['est_miss_rate']:.0%} of {s['audits']} audits"
+        )
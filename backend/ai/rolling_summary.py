@@ -0,0 +1,66 @@
+import os
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from backend.common import models
+from backend.common.database import release_connection
+from backend.common.transcript_document import load_document
+from backend.ai.context_window import estimate_tokens
+
+# New transcript (approximate tokens) that triggers a background fold while the meeting runs
+ROLLING_SUMMARY_BLOCK_TOKENS = int(os.getenv("ROLLING_SUMMARY_BLOCK_TOKENS", "1500"))
+FOLD_ATTEMPTS = 3
+
+def fold_transcripts(db: Session, llm_client, meeting_id: int, min_tokens: int = 0):
+    """
+    Folds the transcript saved since the last fold into the meeting's rolling summary.
+
+    Reads only the unfolded tail of the meeting's transcript document.
+    Does nothing if fewer than `min_tokens` of new transcript have arrived.
+    The watermark (document_offset) is advanced with a compare-and-set, so
+    when two folds race only one of them is kept and the loser retries on top
+    of it. Returns the MeetingSummary, or None if the meeting has no transcripts.
+    """
+    Document = models.MeetingTranscript
+    for _ in range(FOLD_ATTEMPTS):
+        state = db.get(models.MeetingSummary, meeting_id)
+        offset = state.document_offset if state else 0
+
+        if load_document(db, meeting_id) is None:
+            return state
+        tail, length, last_transcript_id = db.query(
+            func.substr(Document.content, offset + 1), func.length(Document.content), Document.last_transcript_id
+        ).filter(Document.meeting_id == meeting_id).one()
+
+        text = (tail or "").rstrip("\n")
+        if not text or estimate_tokens(text) < min_tokens:
+            return state
+
+        print(f"   ... Folding {text.count(chr(10)) + 1} transcript lines into Meeting {meeting_id}'s rolling summary ...")
+        previous = state.content if state else ""
+        # Nothing is held across the LLM call; the compare-and-set below catches anything that changed meanwhile
+        release_connection(db)
+        content = llm_client.fold_summary(previous, text)
+        watermark = {"content": content, "document_offset": length, "last_transcript_id": last_transcript_id}
+
+        if state is None:
+            db.add(models.MeetingSummary(meeting_id=meeting_id, **watermark))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker created it first
+                db.rollback()
+                continue
+        else:
+            updated = db.query(models.MeetingSummary)\
+                .filter(models.MeetingSummary.meeting_id == meeting_id,
+                        models.MeetingSummary.document_offset == offset)\
+                .update(watermark, synchronize_session=False)
+            db.commit()
+            if not updated:
+                continue
+
+        return db.get(models.MeetingSummary, meeting_id)
+
+    print(f"⚠️ Rolling summary for Meeting {meeting_id} kept changing under us; using the latest version.")
+    return db.get(models.MeetingSummary, meeting_id)
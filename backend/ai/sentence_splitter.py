@@ -0,0 +1,36 @@
+import re
+
+# End of a sentence: terminal punctuation (optionally closed by a quote/bracket) followed by whitespace
+SENTENCE_END_RE = re.compile(r"[.!?…]+[\"')\]]*\s+")
+# Don't hand TTS fragments like "Okay." on their own; they sound clipped
+MIN_SENTENCE_CHARS = 12
+
+class SentenceSplitter:
+    """
+    Cuts a stream of LLM tokens into whole sentences.
+
+    feed() takes the next chunk of text and returns the sentences it
+    completed; flush() returns whatever is left once the stream ends.
+    A boundary is only recognised once the whitespace after it arrives, so
+    "3.5" or a token that ends on "." never splits a sentence early.
+    """
+    def __init__(self, min_chars: int = MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> list:
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_END_RE.finditer(self._buffer):
+            if match.end() - start < self.min_chars:
+                continue
+            sentences.append(self._buffer[start:match.end()].strip())
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> list:
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return [rest] if rest else []
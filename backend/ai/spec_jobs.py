@@ -0,0 +1,155 @@
+import os
+import time
+import uuid
+from backend.celery_app import SPEC_FULL_PRIORITY, SPEC_REVISION_PRIORITY
+from backend.common import models
+from backend.common.redis_client import publish_meeting_update
+from backend.common.transcript_document import document_state
+
+# A lease outlives the slowest expected spec generation; a crashed worker's lease simply expires
+SPEC_JOB_LEASE_SECONDS = int(os.getenv("SPEC_JOB_LEASE_SECONDS", "900"))
+# Jobs can be looked up as long as Celery keeps their results (result_expires, one day by default)
+SPEC_JOB_RECORD_SECONDS = int(os.getenv("SPEC_JOB_RECORD_SECONDS", "86400"))
+
+# New generation jobs one user may start per hour (0: unlimited). Attaching to a running job is free.
+SPEC_JOBS_PER_USER_PER_HOUR = int(os.getenv("SPEC_JOBS_PER_USER_PER_HOUR", "30"))
+RATE_WINDOW_SECONDS = 3600
+
+# Progress a running job reports, in order
+STAGES = ("summarizing", "generating", "saving")
+
+def transcript_hash(db, meeting_id: int):
+    """(hash of the meeting's transcript, highest transcript id, document length), or (None, 0, 0)."""
+    return document_state(db, meeting_id) or (None, 0, 0)
+
+def latest_source_hash(db, meeting_id: int):
+    """Transcript hash the meeting's latest generated specification was built from."""
+    source = db.query(models.SpecificationSource)\
+        .filter(models.SpecificationSource.meeting_id == meeting_id)\
+        .order_by(models.SpecificationSource.version.desc())\
+        .first()
+    return source.transcript_hash if source else None
+
+def _text(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+def lease_key(meeting_id: int, content_hash: str, full: bool = False) -> str:
+    # A rebuild is a different job from a revision of the same transcript
+    return f"spec_job:{meeting_id}:{content_hash}" + (":full" if full else "")
+
+def job_key(job_id: str) -> str:
+    return f"spec_job_meeting:{job_id}"
+
+def job_meeting(redis_client, job_id: str):
+    """Meeting a spec job was queued for, or None for unknown (or expired) jobs."""
+    value = _text(redis_client.get(job_key(job_id)))
+    return int(value) if value is not None else None
+
+def take_rate_slot(redis_client, user_id: int):
+    """
+    Counts a new job against the user's hourly budget (fixed window). Returns
+    None if allowed, else the seconds until the window resets.
+    """
+    if not SPEC_JOBS_PER_USER_PER_HOUR:
+        return None
+    now = time.time()
+    window = int(now // RATE_WINDOW_SECONDS)
+    key = f"spec_jobs_user:{user_id}:{window}"
+    count = redis_client.incr(key)
+    if count == 1:
+        redis_client.expire(key, RATE_WINDOW_SECONDS)
+    if count > SPEC_JOBS_PER_USER_PER_HOUR:
+        return int((window + 1) * RATE_WINDOW_SECONDS - now) + 1
+    return None
+
+def submit_specification_job(redis_client, db, meeting, task, full: bool = False) -> dict:
+    """
+    Queues `task` for the meeting unless an identical job already exists.
+
+    - the latest spec was built from this exact transcript and no rebuild was asked for: nothing to do ("up_to_date")
+    - a job for this transcript is queued or running: its id is returned ("attached")
+    - the project owner has used up their hourly job budget ("rate_limited", with retry_after)
+    - otherwise a lease is taken for (meeting, transcript hash) and a new job queued ("queued")
+    `full` asks for a rebuild from the whole transcript instead of revising the latest version;
+    rebuilds queue behind revisions, which are much shorter.
+    """
+    content_hash, _, _ = transcript_hash(db, meeting.id)
+    if content_hash is None:
+        return {"status": "no_transcripts", "job_id": None}
+    source_hash = latest_source_hash(db, meeting.id)
+    # A rebuild is wanted even for an unchanged transcript (e.g. after the spec prompt changed)
+    if source_hash == content_hash and not full:
+        return {"status": "up_to_date", "job_id": None}
+
+    job_id = str(uuid.uuid4())
+    key = lease_key(meeting.id, content_hash, full)
+    if not redis_client.set(key, job_id, nx=True, ex=SPEC_JOB_LEASE_SECONDS):
+        existing = _text(redis_client.get(key))
+        if existing is not None:
+            print(f"🔗 Meeting {meeting.id}: attaching to in-flight spec job {existing}")
+            return {"status": "attached", "job_id": existing}
+        # Lease expired between SET and GET: take it now
+        redis_client.set(key, job_id, ex=SPEC_JOB_LEASE_SECONDS)
+
+    retry_after = take_rate_slot(redis_client, meeting.project.owner_id)
+    if retry_after is not None:
+        release_lease(redis_client, meeting.id, content_hash, job_id, full)
+        print(f"🚦 Meeting {meeting.id}: spec job rate limit reached for user {meeting.project.owner_id}")
+        return {"status": "rate_limited", "job_id": None, "retry_after": retry_after}
+
+    # Without a version built from a known transcript position there is nothing to revise
+    revision = source_hash is not None and not full
+    redis_client.set(job_key(job_id), meeting.id, ex=SPEC_JOB_RECORD_SECONDS)
+    try:
+        task.apply_async(args=(meeting.id, meeting.project_id), kwargs={"transcript_hash": content_hash, "full": full},
+                         task_id=job_id, priority=SPEC_REVISION_PRIORITY if revision else SPEC_FULL_PRIORITY)
+    except Exception:
+        # Never queued (e.g. broker down): don't let retries attach to it
+        release_lease(redis_client, meeting.id, content_hash, job_id, full)
+        redis_client.delete(job_key(job_id))
+        raise
+    return {"status": "queued", "job_id": job_id}
+
+def report_stage(task, meeting_id: int, stage: str):
+    """Records a running job's stage in its Celery state and pushes it to the meeting's clients."""
+    job_id = task.request.id
+    if not job_id:
+        # Called directly rather than as a queued job
+        return
+    try:
+        task.update_state(state="PROGRESS", meta={"stage": stage, "meeting_id": meeting_id})
+    except Exception as e:
+        # Progress is informational; the job itself carries on
+        print(f"⚠️ Could not record stage '{stage}' for job {job_id}: {e}")
+    publish_meeting_update(meeting_id, {"type": "spec_job", "job_id": job_id, "meeting_id": meeting_id,
+                                        "state": "PROGRESS", "stage": stage})
+
+def report_finished(job_id: str, meeting_id: int, result: str = None, error: str = None):
+    if not job_id:
+        return
+    publish_meeting_update(meeting_id, {"type": "spec_job", "job_id": job_id, "meeting_id": meeting_id,
+                                        "state": "FAILURE" if error else "SUCCESS",
+                                        "stage": "failed" if error else "done", "result": result, "error": error})
+
+def job_status(async_result, meeting_id: int) -> dict:
+    """What a client needs to know about a job from its Celery AsyncResult."""
+    state = async_result.state
+    status = {"job_id": async_result.id, "meeting_id": meeting_id, "state": state,
+              "stage": None, "result": None, "error": None}
+    if state == "PENDING":
+        status["stage"] = "queued"
+    elif state == "STARTED":
+        status["stage"] = "started"
+    elif state == "PROGRESS":
+        status["stage"] = (async_result.info or {}).get("stage")
+    elif state == "SUCCESS":
+        status["stage"], status["result"] = "done", async_result.result
+    elif state == "FAILURE":
+        status["stage"], status["error"] = "failed", str(async_result.info)
+    return status
+
+def release_lease(redis_client, meeting_id: int, content_hash: str, job_id: str, full: bool = False):
+    """Drops the lease if it still belongs to `job_id` (it may have expired and been retaken)."""
+    key = lease_key(meeting_id, content_hash, full)
+    if _text(redis_client.get(key)) == job_id:
+        redis_client.delete(key)
@@ -0,0 +1,129 @@
+"""
+Deterministic OpenAI-compatible chat completion server for tests and offline development.
+
+Serves POST /v1/chat/completions (plain and `stream: true` server-sent events)
+and GET /v1/models. Replies are a pure function of the request, so the same
+prompt always gets the same answer:
+
+- task extraction prompts get a {"tasks": [...]} object, one task per bullet or line
+- clarifying-question prompts get a question when the transcript sounds
+  undecided (maybe, not sure, tbd, "?") and NO_QUESTION otherwise
+- everything else (summaries, specs) gets bullet points made from the input's lines
+
+Run it with:  python -m backend.ai.stub_llm_server --port 8089
+and point the app at it with LLM_BACKEND=local LOCAL_LLM_URL=http://localhost:8089/v1
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_MODEL = "stub-llm"
+UNDECIDED_MARKERS = ("maybe", "not sure", "tbd", "?", "or something")
+
+def _tokens(text: str) -> int:
+    return max(1, (len(text) + 3) // 4)
+
+def stub_reply(messages: list) -> str:
+    system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system")
+    user = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    lines = [l.strip(" -*#\t") for l in user.splitlines() if l.strip(" -*#\t")]
+
+    if '"tasks"' in system:
+        tasks = [{"title": line[:60], "description": line} for line in lines[:5]]
+        return json.dumps({"tasks": tasks})
+
+    if "NO_QUESTION" in system or "question" in system.lower():
+        if any(marker in user.lower() for marker in UNDECIDED_MARKERS):
+            return "Could you clarify what was decided there? Who owns the next step?"
+        return "NO_QUESTION"
+
+    return "\n".join(f"- {' '.join(line.split()[:12])}" for line in lines[:20]) or "- Nothing to summarize."
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send_json(200, {"object": "list", "data": [{"id": STUB_MODEL, "object": "model"}]})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        messages = request.get("messages", [])
+        model = request.get("model") or STUB_MODEL
+        reply = stub_reply(messages)
+        created = int(time.time())
+
+        if not request.get("stream"):
+            prompt_tokens = sum(_tokens(m.get("content", "")) for m in messages)
+            self._send_json(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": _tokens(reply),
+                          "total_tokens": prompt_tokens + _tokens(reply)},
+            })
+            return
+
+        # One event per word, like a real server emitting tokens
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        words = reply.split(" ")
+        for i, word in enumerate(words):
+            delta = {"role": "assistant", "content": word if i == 0 else " " + word}
+            self._send_event({"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": created,
+                              "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+        self._send_event({"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": created,
+                          "model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _send_event(self, payload: dict):
+        self.wfile.write(b"data: " + json.dumps(payload).encode("utf-8") + b"\n\n")
+        self.wfile.flush()
+
+def start_stub_server(host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Starts the server on a background thread; `server.server_address[1]` is the bound port."""
+    server = ThreadingHTTPServer((host, port), StubLLMHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), StubLLMHandler)
+    print(f"🧪 Stub LLM server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
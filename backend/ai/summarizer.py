@@ -0,0 +1,130 @@
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from backend.ai.context_window import estimate_tokens
+
+# Input budget per summarization request (approximate tokens)
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "6000"))
+SUMMARY_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", "4"))
+# Output budget for partial summaries; small enough that several fit in one reduce request
+PARTIAL_SUMMARY_MAX_TOKENS = 800
+FINAL_SUMMARY_MAX_TOKENS = 2000
+
+CHUNK_PROMPT = (
+    "You are a Technical Project Manager. Below is one consecutive part of a longer meeting transcript. "
+    "Summarize it into concise bullet points, keeping every requirement, decision, deadline, number and action item "
+    "(with owners). Do not add an introduction or conclusion."
+)
+MERGE_PROMPT = (
+    "You are a Technical Project Manager. Below are summaries of consecutive parts of one meeting, in order. "
+    "Merge them into a single set of concise bullet points. Keep every requirement, decision, deadline and action item; "
+    "drop duplicates, and where a later part revises an earlier decision keep only the final one."
+)
+
+def split_turns(transcript: str) -> list:
+    """One entry per speaker turn ("Speaker: text" line); continuation lines stay with their turn."""
+    turns = []
+    for line in transcript.splitlines():
+        if not line.strip():
+            continue
+        if turns and ": " not in line[:64]:
+            turns[-1] += "\n" + line
+        else:
+            turns.append(line)
+    return turns
+
+def _split_turn(turn: str, budget: int) -> list:
+    # A single monologue bigger than a whole chunk: cut it between words, keeping the speaker on each piece
+    speaker, sep, text = turn.partition(": ") if ": " in turn[:64] else ("", "", turn)
+    prefix = f"{speaker}{sep}"
+    pieces, words, tokens = [], [], estimate_tokens(prefix)
+    for word in text.split():
+        t = estimate_tokens(word + " ")
+        if words and tokens + t > budget:
+            pieces.append(prefix + " ".join(words))
+            words, tokens = [], estimate_tokens(prefix)
+        words.append(word)
+        tokens += t
+    if words:
+        pieces.append(prefix + " ".join(words))
+    return pieces
+
+def pack(turns: list, budget: int) -> list:
+    """Greedily groups consecutive turns into chunks of at most ~`budget` tokens, never splitting a turn that fits."""
+    chunks, current, tokens = [], [], 0
+    for turn in turns:
+        t = estimate_tokens(turn)
+        if current and tokens + t > budget:
+            chunks.append("\n".join(current))
+            current, tokens = [], 0
+        if t > budget:
+            chunks.extend(_split_turn(turn, budget))
+            continue
+        current.append(turn)
+        tokens += t
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+class MapReduceSummarizer:
+    """
+    Summarizes transcripts of any length.
+
+    Short transcripts are summarized in one request. Longer ones are split at
+    speaker-turn boundaries into chunks that fit SUMMARY_CHUNK_TOKENS, the
+    chunks are summarized in parallel (at most SUMMARY_MAX_CONCURRENCY
+    requests at once), and the partial summaries are merged level by level
+    until one request can combine them. The number of levels grows with
+    log(length), so a multi-hour meeting costs a few extra rounds instead of
+    an oversized request.
+
+    `complete(system_prompt, text, max_tokens)` performs one LLM request.
+    """
+    def __init__(self, complete, chunk_tokens: int = SUMMARY_CHUNK_TOKENS, max_concurrency: int = SUMMARY_MAX_CONCURRENCY):
+        self.complete = complete
+        self.chunk_tokens = chunk_tokens
+        self.max_concurrency = max_concurrency
+
+    def summarize(self, transcript: str, system_prompt: str) -> str:
+        chunks = pack(split_turns(transcript), self.chunk_tokens)
+        if len(chunks) <= 1:
+            return self.complete(system_prompt, transcript, FINAL_SUMMARY_MAX_TOKENS)
+
+        print(f"🧩 Transcript too long for one request: summarizing {len(chunks)} chunks...")
+        partials = self._map(CHUNK_PROMPT, chunks)
+
+        level = 1
+        while True:
+            groups = self._group(partials)
+            if len(groups) == 1:
+                return self.complete(system_prompt, self._label(partials), FINAL_SUMMARY_MAX_TOKENS)
+            level += 1
+            print(f"🧩 Merging {len(partials)} partial summaries in {len(groups)} groups (level {level})...")
+            partials = self._map(MERGE_PROMPT, [self._label(g) for g in groups])
+
+    def _map(self, prompt: str, texts: list) -> list:
+        # Pool threads don't inherit context variables (e.g. the meeting the LLM calls are charged to)
+        contexts = [contextvars.copy_context() for _ in texts]
+        with ThreadPoolExecutor(max_workers=min(len(texts), self.max_concurrency)) as pool:
+            return list(pool.map(
+                lambda ctx, text: ctx.run(self.complete, prompt, text, PARTIAL_SUMMARY_MAX_TOKENS), contexts, texts
+            ))
+
+    def _group(self, partials: list) -> list:
+        groups, current, tokens = [], [], 0
+        for partial in partials:
+            t = estimate_tokens(partial)
+            if current and tokens + t > self.chunk_tokens:
+                groups.append(current)
+                current, tokens = [], 0
+            current.append(partial)
+            tokens += t
+        groups.append(current)
+        # Every level must shrink, even if partial summaries came back larger than expected
+        if len(groups) == len(partials):
+            groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+        return groups
+
+    @staticmethod
+    def _label(partials: list) -> str:
+        return "\n\n".join(f"Part {i}:\n{p}" for i, p in enumerate(partials, 1))
@@ -1,55 +1,167 @@
-from backend.celery_app import celery_app
-from backend.common import database, models
-from backend.ai.llm_client import LLMClient
+import redis
+from contextlib import nullcontext
+from celery.exceptions import SoftTimeLimitExceeded
+from backend.celery_app import (
+    INTERACTIVE_SOFT_TIME_LIMIT, INTERACTIVE_TIME_LIMIT, REDIS_URL, SPEC_SOFT_TIME_LIMIT, SPEC_TIME_LIMIT, celery_app,
+    gevent_pool
+)
+from backend.common import database
+from backend.ai import spec_jobs
+from backend.ai.llm_client import get_llm_client
+from backend.ai.llm_usage import attribute, rollup_llm_usage
+from backend.ai.rolling_summary import ROLLING_SUMMARY_BLOCK_TOKENS, fold_transcripts
+from backend.common import spec_versions
+from backend.common.settings_cache import get_setting_value
+from backend.common.transcript_document import document_slice
 from sqlalchemy.orm import Session
 
-@celery_app.task(name="generate_specification_task")
-def generate_specification_task(meeting_id: int, project_id: int):
+# Acknowledged only once finished: a job whose worker dies is redelivered (and
+# the transcript hash check makes a rerun of a finished job a no-op)
+@celery_app.task(name="generate_specification_task", bind=True, acks_late=True, reject_on_worker_lost=True,
+                 soft_time_limit=SPEC_SOFT_TIME_LIMIT, time_limit=SPEC_TIME_LIMIT)
+def generate_specification_task(self, meeting_id: int, project_id: int, transcript_hash: str = None, full: bool = False):
     """
-    Celery task to generate a specification from meeting transcripts.
+    Celery task to generate the next version of a meeting's specification.
+
+    If the meeting already has a generated version, only the transcript
+    recorded since then is sent to the LLM together with that version
+    (a delta revision); otherwise, or with `full`, the spec is built from
+    the whole meeting. `transcript_hash` is the single-flight lease this job
+    holds (see spec_jobs); it is released when done.
     """
     print(f"🚀 Celery Worker starting Spec Gen for Meeting {meeting_id}...")
     
     db = database.SessionLocal()
     try:
-        # 1. Fetch Data
-        transcripts = db.query(models.Transcript)\
-            .filter(models.Transcript.meeting_id == meeting_id)\
-            .order_by(models.Transcript.timestamp).all()
-        
-        if not transcripts:
-            print("❌ No transcripts found. Aborting.")
-            return "No transcripts"
-
-        full_text = "\n".join([f"{t.speaker}: {t.text}" for t in transcripts])
-        
-        # 2. Get Settings
-        spec_setting = db.query(models.Setting).filter(models.Setting.key == "spec_prompt").first()
-        custom_prompt = spec_setting.value if spec_setting else None
-
-        # 3. AI Processing
-        llm_client = LLMClient()
-        print("   ... Summarizing ...")
-        summary = llm_client.summarize_meeting(full_text)
-        
-        print("   ... Generating Specification ...")
-        spec_content = llm_client.generate_specification(summary, custom_prompt=custom_prompt)
-        
-        # 4. Save Result
-        spec = models.Specification(
-            project_id=project_id,
-            meeting_id=meeting_id,
-            content=spec_content,
-            version="1.0.0"
-        )
-        db.add(spec)
-        db.commit()
-        print(f"✅ Specification created for Meeting {meeting_id}")
-        return "Success"
+        with _soft_time_limit(SPEC_SOFT_TIME_LIMIT):
+            outcome = _build_specification(self, db, meeting_id, project_id, full)
+        spec_jobs.report_finished(self.request.id, meeting_id, result=outcome)
+        return outcome
 
+    except SoftTimeLimitExceeded:
+        print(f"⏱️ Spec generation for Meeting {meeting_id} hit the {SPEC_SOFT_TIME_LIMIT}s time limit")
+        db.rollback()
+        spec_jobs.report_finished(self.request.id, meeting_id, error=f"Timed out after {SPEC_SOFT_TIME_LIMIT}s")
+        raise
     except Exception as e:
         print(f"❌ Task Failed: {e}")
         db.rollback()
+        spec_jobs.report_finished(self.request.id, meeting_id, error=str(e))
         raise e
+    except BaseException as e:
+        # The gevent pool's hard time limit (gevent.Timeout) or a worker shutdown
+        print(f"🛑 Spec generation for Meeting {meeting_id} was stopped: {type(e).__name__}")
+        db.rollback()
+        spec_jobs.report_finished(self.request.id, meeting_id, error=f"Stopped ({type(e).__name__})")
+        raise
+    finally:
+        db.close()
+        if transcript_hash:
+            _release_lease(meeting_id, transcript_hash, self.request.id, full)
+
+def _soft_time_limit(seconds: int):
+    """
+    The gevent pool only enforces a task's hard time limit, so under it the
+    soft limit is raised here instead (prefork delivers it as a signal).
+    """
+    if not gevent_pool():
+        return nullcontext()
+    from gevent import Timeout
+    return Timeout(seconds, SoftTimeLimitExceeded)
+
+def _build_specification(task, db: Session, meeting_id: int, project_id: int, full: bool) -> str:
+    # The transcript may have grown since the job was queued; what gets summarized is what's recorded
+    content_hash, last_transcript_id, document_length = spec_jobs.transcript_hash(db, meeting_id)
+    if content_hash is not None and not full and spec_jobs.latest_source_hash(db, meeting_id) == content_hash:
+        print(f"⏭️ Specification for Meeting {meeting_id} is already up to date.")
+        return "Up to date"
+
+    parent = spec_versions.latest_specification(db, meeting_id)
+    # Legacy versions don't record how much of the transcript they cover
+    revisable = parent is not None and parent.source is not None and not full
+
+    with attribute(meeting_id=meeting_id, project_id=project_id):
+        llm_client = get_llm_client()
+        # Get Settings (in-memory cache)
+        custom_prompt = get_setting_value("spec_prompt")
+
+        if revisable:
+            # Delta: the latest version plus only what was said since
+            new_text = document_slice(db, meeting_id, parent.source.document_offset, document_length).rstrip("\n")
+            print(f"   ... Revising version {parent.version} with {new_text.count(chr(10)) + 1} new transcript lines ...")
+            spec_jobs.report_stage(task, meeting_id, "generating")
+            current_spec = parent.content
+            database.release_connection(db)
+            # Raises on failure: the job fails and the current version is kept
+            spec_content = llm_client.revise_specification(current_spec, new_text, custom_prompt=custom_prompt)
+        else:
+            # Full: most of the meeting was already folded in while it ran,
+            # so only the transcript since the last fold is summarized here
+            print("   ... Summarizing final block ...")
+            spec_jobs.report_stage(task, meeting_id, "summarizing")
+            rolling = fold_transcripts(db, llm_client, meeting_id)
+
+            if rolling is None:
+                print("❌ No transcripts found. Aborting.")
+                return "No transcripts"
+
+            print("   ... Generating Specification ...")
+            spec_jobs.report_stage(task, meeting_id, "generating")
+            summary = rolling.content
+            database.release_connection(db)
+            spec_content = llm_client.generate_specification(summary, custom_prompt=custom_prompt)
+
+    # Save Result as the next version
+    spec_jobs.report_stage(task, meeting_id, "saving")
+    spec = spec_versions.save_version(
+        db, meeting_id, project_id, spec_content, parent=parent,
+        transcript_hash=content_hash, last_transcript_id=last_transcript_id, document_offset=document_length
+    )
+    print(f"✅ Specification version {spec.version} created for Meeting {meeting_id}")
+    return "Success"
+
+def _release_lease(meeting_id: int, transcript_hash: str, job_id: str, full: bool = False):
+    try:
+        spec_jobs.release_lease(redis.from_url(REDIS_URL), meeting_id, transcript_hash, job_id, full)
+    except Exception as e:
+        # The lease expires on its own
+        print(f"⚠️ Could not release spec job lease for Meeting {meeting_id}: {e}")
+
+@celery_app.task(name="update_rolling_summary_task",
+                 soft_time_limit=INTERACTIVE_SOFT_TIME_LIMIT, time_limit=INTERACTIVE_TIME_LIMIT)
+def update_rolling_summary_task(meeting_id: int):
+    """
+    Celery task folding the latest block of a live meeting's transcript into its rolling summary.
+    Queued by the transcription service every ROLLING_SUMMARY_BLOCK_TOKENS of new speech.
+    """
+    db = database.SessionLocal()
+    try:
+        with attribute(meeting_id=meeting_id):
+            fold_transcripts(db, get_llm_client(), meeting_id, min_tokens=ROLLING_SUMMARY_BLOCK_TOKENS)
+        return "Success"
+    except Exception as e:
+        # The block stays unfolded and is picked up by the next fold
+        print(f"⚠️ Rolling summary update failed for Meeting {meeting_id}: {e}")
+        db.rollback()
+        return "Failed"
+    finally:
+        db.close()
+
+@celery_app.task(name="rollup_llm_usage_task")
+def rollup_llm_usage_task():
+    """
+    Periodic Celery task (beat schedule in celery_app) folding the previous
+    hours' per-call LLM usage rows into hourly rollups.
+    """
+    db = database.SessionLocal()
+    try:
+        rolled = rollup_llm_usage(db)
+        if rolled:
+            print(f"📊 Rolled up {rolled} LLM usage rows")
+        return rolled
+    except Exception as e:
+        print(f"⚠️ LLM usage rollup failed: {e}")
+        db.rollback()
+        return 0
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -1,7 +1,8 @@
 from sqlalchemy.orm import Session
 from datetime import datetime
-from backend.common import models
+from backend.common import models, spec_history, spec_versions, text_delta
 from backend.common.security import encrypt_value
+from backend.common.settings_cache import publish_settings_changed
 from . import schemas
 
 # --- Project Operations ---
@@ -94,17 +95,59 @@ def get_meeting_transcripts(db: Session, meeting_id: int):
     return db.query(models.Transcript).filter(models.Transcript.meeting_id == meeting_id).order_by(models.Transcript.timestamp).all()
 
 def get_meeting_specification(db: Session, meeting_id: int):
-    return db.query(models.Specification).filter(models.Specification.meeting_id == meeting_id).order_by(models.Specification.created_at.desc()).first()
+    return spec_versions.latest_specification(db, meeting_id)
 
 def update_specification(db: Session, meeting_id: int, content: str):
     spec = get_meeting_specification(db, meeting_id)
     if spec:
+        # The old text stays in the history as the revision before this one
+        previous = spec.content
         spec.content = content
-        spec.created_at = datetime.utcnow()
+        spec_history.record_revision(db, meeting_id, spec.id, content, "edit", previous=previous)
         db.commit()
         db.refresh(spec)
     return spec
 
+SPEC_PATCH_ATTEMPTS = 3
+
+def patch_specification(db: Session, meeting_id: int, base_revision: int, ops: list):
+    """
+    Applies text operations made against `base_revision` (0: a specification
+    from before history was kept) to the meeting's specification. Edits based on an older revision are moved past what changed
+    since (text_delta.Conflict if they touch it). Returns the new revision and
+    the operations as applied to the revision before it, or None without a spec.
+    """
+    for _ in range(SPEC_PATCH_ATTEMPTS):
+        current = spec_history.ensure_head(db, meeting_id)
+        if current is None:
+            return None
+        # Serializes editors of this document (a no-op lock on SQLite; the unique revision number still catches races)
+        spec = db.query(models.Specification).filter(models.Specification.id == current.specification_id)\
+            .with_for_update().one()
+        current = spec_history.head(db, meeting_id)
+        if current.specification_id == spec.id:
+            break
+        # A generation job saved a new version before we got the lock: edit that one instead
+    else:
+        raise text_delta.Conflict("Specification kept changing while saving")
+    if base_revision == 0 and spec_history.started_from_legacy(db, meeting_id):
+        # Read before the history was started: that text is its first revision
+        base_revision = 1
+    if base_revision > current.revision or base_revision < 1:
+        raise ValueError(f"Unknown base revision {base_revision}")
+    text_delta.validate(ops)
+    if base_revision != current.revision:
+        base = spec_history.revision_content(db, meeting_id, base_revision)
+        if base is None:
+            raise ValueError(f"Unknown base revision {base_revision}")
+        ops = text_delta.rebase(ops, base, spec.content)
+
+    previous = spec.content
+    spec.content = text_delta.apply(previous, ops)
+    row = spec_history.record_revision(db, meeting_id, spec.id, spec.content, "edit", previous=previous, delta=ops)
+    db.commit()
+    return {"revision": row.revision, "base_revision": current.revision, "specification_id": spec.id, "ops": ops}
+
 def create_task(db: Session, task: schemas.TaskCreate):
     db_task = models.Task(**task.model_dump())
     db.add(db_task)
@@ -124,15 +167,14 @@ def update_setting(db: Session, setting: schemas.SettingCreate):
     db_setting = db.query(models.Setting).filter(models.Setting.key == setting.key).first()
     if db_setting:
         db_setting.value = setting.value
-        db.commit()
-        db.refresh(db_setting)
-        return db_setting
     else:
         db_setting = models.Setting(**setting.model_dump())
         db.add(db_setting)
-        db.commit()
-        db.refresh(db_setting)
-        return db_setting
+    db.commit()
+    db.refresh(db_setting)
+    # Workers serve settings from memory; tell them to reload
+    publish_settings_changed(setting.key)
+    return db_setting
 
 def create_audio_file(db: Session, audio_file: schemas.AudioFileCreate):
     db_audio = models.AudioFile(**audio_file.model_dump())
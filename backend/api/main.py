@@ -7,7 +7,8 @@ import redis
 import requests
 import uuid
 from fastapi import FastAPI, Depends, HTTPException, Body, Query, status
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List
 from dotenv import load_dotenv
@@ -15,16 +16,20 @@ from pydantic import BaseModel
 
 load_dotenv()
 
-from backend.common import models, database
+from backend.common import models, database, spec_history, text_delta
+from backend.common.redis_client import publish_meeting_update
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import WebSocket, WebSocketDisconnect
 from datetime import datetime
 
 from backend.api import schemas, crud
-from backend.ai.llm_client import LLMClient
+from backend.ai.llm_client import get_llm_client
+from backend.ai.json_stream import parse_tasks
+from backend.ai.llm_usage import attribute, usage_report
 from backend.common.security import decrypt_value
 from backend.celery_app import celery_app
 from backend.ai.tasks import generate_specification_task
+from backend.ai.spec_jobs import job_meeting, job_status, submit_specification_job
 # Added validate_token
 from backend.api.auth import create_access_token, get_current_user, validate_token
 
@@ -255,6 +260,7 @@ def read_meeting_transcripts(
 @app.post("/meetings/{meeting_id}/generate")
 def generate_specification(
     meeting_id: int, 
+    full: bool = False,
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
@@ -265,9 +271,45 @@ def generate_specification(
     if meeting.project.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    generate_specification_task.delay(meeting.id, meeting.project_id)
-
-    return {"status": "queued", "message": "Specification generation started"}
+    # Double clicks and /end + /generate share one job per transcript version.
+    # By default the latest version is revised with the new transcript; full=true rebuilds from scratch.
+    redis_client = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    job = submit_specification_job(redis_client, db, meeting, generate_specification_task, full=full)
+
+    return {**job, "message": spec_job_message(job)}
+
+SPEC_JOB_MESSAGES = {
+    "queued": "Specification generation started",
+    "attached": "Specification generation already in progress",
+    "up_to_date": "Specification is already up to date",
+    "no_transcripts": "No transcripts to generate a specification from",
+}
+
+def spec_job_message(job: dict, prefix: str = "") -> str:
+    """What to tell the user about a submit_specification_job result; 429 when rate limited."""
+    if job["status"] == "rate_limited":
+        raise HTTPException(status_code=429, detail=f"{prefix}Too many specification jobs; try again later",
+                            headers={"Retry-After": str(job["retry_after"])})
+    return prefix + SPEC_JOB_MESSAGES[job["status"]]
+
+@app.get("/jobs/{job_id}", response_model=schemas.JobStatus)
+def read_job(
+    job_id: str,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    State of a spec generation job from /generate or /end. The same changes are
+    pushed as {"type": "spec_job", ...} messages on the meeting's WebSocket.
+    """
+    redis_client = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+    meeting_id = job_meeting(redis_client, job_id)
+    if meeting_id is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    meeting = crud.get_meeting(db, meeting_id=meeting_id)
+    if not meeting or meeting.project.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return job_status(celery_app.AsyncResult(job_id), meeting_id)
 
 @app.post("/meetings/{meeting_id}/join")
 def join_meeting(
@@ -308,7 +350,62 @@ def read_meeting_specification(
     spec = crud.get_meeting_specification(db, meeting_id=meeting_id)
     if not spec:
         raise HTTPException(status_code=404, detail="Specification not found")
-    return spec
+    return _with_revision(db, spec)
+
+def _with_revision(db: Session, spec: models.Specification) -> schemas.Specification:
+    # Read-only: a spec saved before history was kept is revision 0 until its first edit
+    current = spec_history.head(db, spec.meeting_id)
+    return schemas.Specification.model_validate(spec).model_copy(update={"revision": current.revision if current else 0})
+
+@app.get("/meetings/{meeting_id}/specification/revisions", response_model=List[schemas.SpecificationRevision])
+def read_specification_revisions(
+    meeting_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """History of the meeting's specification (generated versions and edits), oldest first."""
+    meeting = crud.get_meeting(db, meeting_id=meeting_id)
+    if not meeting or meeting.project.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return db.query(models.SpecificationRevision)\
+        .filter(models.SpecificationRevision.meeting_id == meeting_id)\
+        .order_by(models.SpecificationRevision.revision).all()
+
+@app.get("/meetings/{meeting_id}/specification/revisions/{revision}", response_model=schemas.SpecificationRevisionContent)
+def read_specification_revision(
+    meeting_id: int,
+    revision: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    meeting = crud.get_meeting(db, meeting_id=meeting_id)
+    if not meeting or meeting.project.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    content = spec_history.revision_content(db, meeting_id, revision)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return {"revision": revision, "content": content}
+
+@app.get("/meetings/{meeting_id}/specification/diff", response_model=schemas.SpecificationDiff)
+def diff_specification_revisions(
+    meeting_id: int,
+    from_revision: int,
+    to_revision: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Unified diff between two revisions of the meeting's specification."""
+    meeting = crud.get_meeting(db, meeting_id=meeting_id)
+    if not meeting or meeting.project.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    contents = spec_history.revision_contents(db, meeting_id, [from_revision, to_revision])
+    if from_revision not in contents or to_revision not in contents:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    diff = spec_history.unified_diff(contents[from_revision], contents[to_revision],
+                                     f"revision {from_revision}", f"revision {to_revision}")
+    return {"from_revision": from_revision, "to_revision": to_revision, "diff": diff}
 
 @app.put("/meetings/{meeting_id}/specification", response_model=schemas.Specification)
 def update_meeting_specification(
@@ -326,11 +423,49 @@ def update_meeting_specification(
         raise HTTPException(status_code=404, detail="Specification not found")
         
     updated_spec = crud.update_specification(db, meeting_id, spec_update.content)
-    return updated_spec
+    return _with_revision(db, updated_spec)
+
+@app.patch("/meetings/{meeting_id}/specification", response_model=schemas.SpecificationPatchResult)
+def patch_meeting_specification(
+    meeting_id: int,
+    patch: schemas.SpecificationPatch,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Applies text operations made against `base_revision`. Edits from concurrent
+    editors are merged when they touch different parts of the document; overlapping
+    ones get 409 with the current revision to rebase onto. The applied operations
+    are pushed to everyone watching the meeting.
+    """
+    meeting = crud.get_meeting(db, meeting_id=meeting_id)
+    if not meeting or meeting.project.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    try:
+        result = crud.patch_specification(db, meeting_id, patch.base_revision, patch.ops)
+    except text_delta.Conflict as e:
+        db.rollback()
+        current = spec_history.head(db, meeting_id)
+        raise HTTPException(status_code=409, detail={"message": str(e), "revision": current.revision if current else None})
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=422, detail=str(e))
+    except IntegrityError:
+        # Another edit took this revision number between our read and commit
+        db.rollback()
+        raise HTTPException(status_code=409, detail={"message": "Specification changed while saving", "revision": None})
+    if result is None:
+        raise HTTPException(status_code=404, detail="Specification not found")
+
+    if result["revision"] != result["base_revision"]:
+        publish_meeting_update(meeting_id, {"type": "spec_patch", "meeting_id": meeting_id, **result})
+    return result
 
 @app.get("/meetings/{meeting_id}/tasks/preview")
 def preview_tasks(
     meeting_id: int, 
+    refresh: bool = False,
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(get_current_user)
 ):
@@ -343,13 +478,69 @@ def preview_tasks(
         raise HTTPException(status_code=404, detail="Specification not found")
 
     try:
-        llm = LLMClient()
-        tasks_json = llm.extract_tasks(spec.content)
-        tasks_data = json.loads(tasks_json).get("tasks", [])
-        return tasks_data
+        llm = get_llm_client()
+        # Same spec -> same tasks: served from the LLM cache unless a refresh is requested
+        with attribute(meeting_id=meeting_id, project_id=meeting.project_id):
+            tasks_json = llm.extract_tasks(spec.content, use_cache=not refresh)
+        # Tolerant parse: one malformed task doesn't throw away the rest
+        return parse_tasks(tasks_json)
     except Exception as e:
          raise HTTPException(status_code=500, detail=f"AI Task Extraction failed: {str(e)}")
 
+@app.get("/meetings/{meeting_id}/tasks/preview/stream")
+def stream_preview_tasks(
+    meeting_id: int,
+    refresh: bool = False,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Same as /tasks/preview, but as NDJSON: one task per line as soon as the model finishes it."""
+    meeting = crud.get_meeting(db, meeting_id=meeting_id)
+    if not meeting or meeting.project.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    spec = crud.get_meeting_specification(db, meeting_id)
+    if not spec:
+        raise HTTPException(status_code=404, detail="Specification not found")
+    with attribute(meeting_id=meeting_id, project_id=meeting.project_id):
+        tasks = get_llm_client().stream_tasks(spec.content, use_cache=not refresh)
+
+    def lines():
+        try:
+            for task in tasks:
+                yield json.dumps(task) + "\n"
+        except Exception as e:
+            # Headers are already sent; report the failure in-band
+            yield json.dumps({"error": f"AI Task Extraction failed: {str(e)}"}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.get("/meetings/{meeting_id}/llm-usage")
+def read_meeting_llm_usage(
+    meeting_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """LLM calls, cache hits, tokens, latency and cost spent on this meeting."""
+    meeting = crud.get_meeting(db, meeting_id=meeting_id)
+    if not meeting or meeting.project.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return usage_report(db, [meeting_id])
+
+@app.get("/projects/{project_id}/llm-usage")
+def read_project_llm_usage(
+    project_id: int,
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """LLM usage across all of the project's meetings, with a per-meeting breakdown."""
+    db_project = crud.get_project(db, project_id=project_id)
+    if db_project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if db_project.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized to view this project")
+    return usage_report(db, [m.id for m in db_project.meetings], project_id=project_id)
+
 @app.post("/meetings/{meeting_id}/tasks/sync")
 async def sync_tasks_to_github(
     meeting_id: int, 
@@ -524,9 +715,10 @@ def end_meeting(
     redis_client = redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
     redis_client.set(f"stop_meeting_{meeting_id}", "true")
     
-    generate_specification_task.delay(meeting.id, meeting.project_id)
+    job = submit_specification_job(redis_client, db, meeting, generate_specification_task)
+    message = spec_job_message(job, prefix="Meeting ended, bot stopped. ")
 
-    return {"status": "success", "message": "Meeting ended, bot stopped, spec generation started."}
+    return {"status": "success", "message": message, "job_status": job["status"], "job_id": job["job_id"]}
 
 @app.get("/settings/", response_model=List[schemas.Setting])
 def read_settings(
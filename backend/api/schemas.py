@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional, List
+from pydantic import BaseModel, ConfigDict, StrictInt, StrictStr
+from typing import Optional, List, Union
 from datetime import datetime
 
 class MeetingBase(BaseModel):
@@ -78,11 +78,24 @@ class SpecificationCreate(SpecificationBase):
 class SpecificationUpdate(BaseModel):
     content: str
 
+class SpecificationPatch(BaseModel):
+    # Text operations (see common/text_delta.py): keep n, delete -n, insert "text"
+    base_revision: int
+    ops: List[Union[StrictInt, StrictStr]]
+
+class SpecificationPatchResult(BaseModel):
+    revision: int
+    base_revision: int
+    specification_id: int
+    ops: List[Union[StrictInt, StrictStr]]
+
 class Specification(SpecificationBase):
     id: int
     project_id: int
     meeting_id: int
     created_at: datetime
+    # Head of the edit history; the base for PATCH edits (0: no history yet)
+    revision: int = 0
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -101,6 +114,33 @@ class Task(TaskBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+class JobStatus(BaseModel):
+    job_id: str
+    meeting_id: int
+    state: str
+    # queued, started, summarizing, generating, saving, done or failed
+    stage: Optional[str] = None
+    result: Optional[str] = None
+    error: Optional[str] = None
+
+class SpecificationRevision(BaseModel):
+    revision: int
+    specification_id: int
+    kind: str
+    origin: str
+    created_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class SpecificationRevisionContent(BaseModel):
+    revision: int
+    content: str
+
+class SpecificationDiff(BaseModel):
+    from_revision: int
+    to_revision: int
+    diff: str
+
 class SettingBase(BaseModel):
     key: str
     value: str
@@ -0,0 +1,416 @@
+"""
+Audio pipeline replay benchmark.
+
+Replays WAV fixtures into 'meeting_audio_queue' for N simulated meetings and
+drives the real transcription, real-time analysis and TTS workers in-process,
+with their STT / LLM / TTS providers swapped for stubs whose latency follows
+a configurable distribution. Needs a local Redis; the database is a throwaway
+SQLite file. No network access is required.
+
+Usage:
+    python -m backend.benchmarks.pipeline_replay --meetings 4 --speed 4 \
+        --wav fixtures/standup.wav --stt-latency lognormal:0.8,0.3
+
+Latency specs: "fixed:S", "uniform:LO,HI", "normal:MEAN,STD" or
+"lognormal:MEDIAN,SIGMA" (all in seconds).
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import wave
+from collections import defaultdict
+from types import SimpleNamespace
+
+SAMPLE_RATE = 44100
+SAMPLE_WIDTH = 2
+CHUNK_FRAMES = 1024  # Matches AudioRecorder.chunk_size
+# Transcript text the stub STT cycles through: a mix of requirement talk and small talk
+STUB_SENTENCES = [
+    "we need a login page maybe with google auth or something like that",
+    "yeah okay sounds good",
+    "the api should integrate with the billing database by next friday",
+    "can you hear me now i think you are on mute",
+    "not sure about the deadline we have to figure out the budget first",
+    "thanks everyone that makes sense",
+]
+# Sentences of the stub's streamed clarifying question
+STUB_QUESTION = ["Could you clarify the deadline for that?", "Is it a hard launch date or a target?"]
+PIPELINE_KEYS = [
+    "meeting_audio_queue",
+    "conversation_analysis_queue",
+    "speak_request_queue",
+    "audio_playback_queue",
+]
+
+# --- Latency models ---
+
+class LatencyModel:
+    def __init__(self, kind: str, params: list):
+        self.kind = kind
+        self.params = params
+
+    @classmethod
+    def parse(cls, spec: str) -> "LatencyModel":
+        kind, _, raw = spec.partition(":")
+        params = [float(p) for p in raw.split(",") if p]
+        expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if kind not in expected or len(params) != expected[kind]:
+            raise argparse.ArgumentTypeError(f"Invalid latency spec: {spec!r}")
+        return cls(kind, params)
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return random.uniform(*self.params)
+        if self.kind == "normal":
+            return max(0.0, random.gauss(*self.params))
+        median, sigma = self.params
+        return random.lognormvariate(math.log(median), sigma)
+
+    def __str__(self):
+        return f"{self.kind}:{','.join(str(p) for p in self.params)}"
+
+# --- Recorder shared by stubs and monitors ---
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations = defaultdict(list)     # stage -> [seconds]
+        self.events = defaultdict(list)        # (kind, meeting_id) -> [t]
+
+    def duration(self, stage: str, seconds: float):
+        with self._lock:
+            self.durations[stage].append(seconds)
+
+    def event(self, kind: str, meeting_id, t: float = None):
+        with self._lock:
+            self.events[(kind, int(meeting_id))].append(t or time.perf_counter())
+
+# --- Stub providers ---
+
+def make_stubs(recorder: Recorder, stt: LatencyModel, llm: LatencyModel, tts: LatencyModel, question_rate: float):
+    class StubSTTClient:
+        WORDS_PER_SECOND = 2.5
+
+        def transcribe_stream(self, audio_bytes):
+            start = time.perf_counter()
+            seconds = len(audio_bytes) / (SAMPLE_RATE * SAMPLE_WIDTH)
+            time.sleep(stt.sample())
+            corpus = " ".join(STUB_SENTENCES).split()
+            offset = random.randrange(len(corpus))
+            words = [
+                SimpleNamespace(text=corpus[(offset + i) % len(corpus)], speaker_id="speaker_0")
+                for i in range(max(1, int(seconds * self.WORDS_PER_SECOND)))
+            ]
+            recorder.duration("stt", time.perf_counter() - start)
+            return SimpleNamespace(words=words, text=" ".join(w.text for w in words))
+
+    class StubLLMClient:
+        def _call(self, stage, result):
+            start = time.perf_counter()
+            time.sleep(llm.sample())
+            recorder.duration(stage, time.perf_counter() - start)
+            return result
+
+        def generate_clarifying_question(self, transcript_segment: str, custom_prompt: str = None) -> str:
+            ask = random.random() < question_rate
+            return self._call("llm", "Could you clarify the deadline for that?" if ask else "")
+
+        async def agenerate_clarifying_question(self, transcript_segment: str, custom_prompt: str = None) -> str:
+            start = time.perf_counter()
+            await asyncio.sleep(llm.sample())
+            recorder.duration("llm", time.perf_counter() - start)
+            return "Could you clarify the deadline for that?" if random.random() < question_rate else ""
+
+        async def astream_clarifying_question(self, transcript_segment: str, custom_prompt: str = None):
+            # The sampled latency covers the whole completion; sentences arrive as it progresses
+            start = time.perf_counter()
+            total = llm.sample()
+            ask = random.random() < question_rate
+            for sentence in STUB_QUESTION:
+                await asyncio.sleep(total / len(STUB_QUESTION))
+                if ask:
+                    yield sentence
+            recorder.duration("llm", time.perf_counter() - start)
+
+        def summarize_meeting(self, transcript: str) -> str:
+            return self._call("llm_summary", "- stub summary")
+
+        def generate_specification(self, summary: str, custom_prompt: str = None) -> str:
+            return self._call("llm_spec", "# Stub Spec")
+
+        def extract_tasks(self, spec_content: str) -> str:
+            return self._call("llm_tasks", '{"tasks": []}')
+
+    class StubTTSClient:
+        def synthesize_speech(self, text: str, output_file: str = "output.mp3") -> str:
+            start = time.perf_counter()
+            time.sleep(tts.sample())
+            recorder.duration("tts", time.perf_counter() - start)
+            return output_file
+
+    return StubSTTClient, StubLLMClient, StubTTSClient
+
+# --- Fixtures ---
+
+def load_fixture(path: str) -> bytes:
+    with wave.open(path, "rb") as wf:
+        if (wf.getframerate(), wf.getnchannels(), wf.getsampwidth()) != (SAMPLE_RATE, 1, SAMPLE_WIDTH):
+            print(f"⚠️ {path} is not 44.1kHz mono 16-bit; replaying raw frames anyway.")
+        return wf.readframes(wf.getnframes())
+
+def synthetic_fixture(seconds: float) -> bytes:
+    """A quiet 220 Hz tone, used when no WAV fixtures are given."""
+    n = int(seconds * SAMPLE_RATE)
+    return b"".join(
+        int(3000 * math.sin(2 * math.pi * 220 * i / SAMPLE_RATE)).to_bytes(2, "little", signed=True)
+        for i in range(n)
+    )
+
+# --- Drivers ---
+
+def replay_meeting(redis_url: str, meeting_id: int, fixtures: list, speed: float, gap: float,
+                   utterance_ends: list, stop: threading.Event):
+    """Plays each fixture as one utterance followed by `gap` seconds of silence."""
+    import base64
+    import redis
+
+    r = redis.from_url(redis_url)
+    chunk_bytes = CHUNK_FRAMES * SAMPLE_WIDTH
+    chunk_interval = CHUNK_FRAMES / SAMPLE_RATE / speed
+    for pcm in fixtures:
+        next_send = time.perf_counter()
+        for offset in range(0, len(pcm), chunk_bytes):
+            if stop.is_set():
+                return
+            r.rpush("meeting_audio_queue", json.dumps({
+                "meeting_id": meeting_id,
+                "audio_data": base64.b64encode(pcm[offset:offset + chunk_bytes]).decode("utf-8"),
+                "timestamp": time.time(),
+            }))
+            next_send += chunk_interval
+            time.sleep(max(0.0, next_send - time.perf_counter()))
+        utterance_ends.append(time.perf_counter())
+        stop.wait(gap)
+
+def monitor_transcripts(redis_url: str, recorder: Recorder, stop: threading.Event):
+    import redis
+
+    pubsub = redis.from_url(redis_url).pubsub(ignore_subscribe_messages=True)
+    pubsub.psubscribe("meeting_*_updates")
+    while not stop.is_set():
+        message = pubsub.get_message(timeout=0.2)
+        if not message:
+            continue
+        try:
+            data = json.loads(message["data"])
+        except (TypeError, ValueError):
+            continue
+        if data.get("meeting_id") is not None and "text" in data:
+            recorder.event("transcript", data["meeting_id"])
+    pubsub.close()
+
+def fake_bot_playback(redis_url: str, recorder: Recorder, stop: threading.Event):
+    """Stands in for the bot: drains playback requests and timestamps them."""
+    import redis
+
+    r = redis.from_url(redis_url)
+    while not stop.is_set():
+        item = r.blpop("audio_playback_queue", timeout=0.2)
+        if item:
+            msg = json.loads(item[1])
+            # End-of-utterance markers carry no audio
+            if msg.get("file_path"):
+                recorder.event("playback", msg["meeting_id"])
+
+# --- Reporting ---
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+    return {
+        "count": len(ordered),
+        "p50": pct(50), "p90": pct(90), "p95": pct(95), "p99": pct(99),
+        "max": ordered[-1],
+    }
+
+def first_after(times: list, start: float, end: float):
+    return next((t for t in times if start < t <= end), None)
+
+def milestone_latencies(recorder: Recorder, utterance_ends: dict) -> dict:
+    """Speech-end relative latencies for the first transcript and first playback."""
+    out = defaultdict(list)
+    for meeting_id, ends in utterance_ends.items():
+        transcripts = sorted(recorder.events[("transcript", meeting_id)])
+        playbacks = sorted(recorder.events[("playback", meeting_id)])
+        for i, end in enumerate(ends):
+            window_end = ends[i + 1] if i + 1 < len(ends) else math.inf
+            t = first_after(transcripts, end, window_end)
+            if t is not None:
+                out["speech_end_to_transcript"].append(t - end)
+            p = first_after(playbacks, end, window_end)
+            if p is not None:
+                out["end_to_end"].append(p - end)
+    return out
+
+def redis_command_stats(client) -> dict:
+    try:
+        stats = client.info("commandstats")
+    except Exception:
+        return {}
+    return {k.replace("cmdstat_", ""): v.get("calls", 0) for k, v in stats.items()}
+
+def print_report(report: dict):
+    print("\n📊 Pipeline replay results")
+    print(f"   meetings={report['config']['meetings']} speed={report['config']['speed']}x "
+          f"wall={report['wall_seconds']:.1f}s audio={report['audio_seconds']:.1f}s")
+    print(f"\n   {'stage':<26}{'n':>6}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for stage, p in report["latency"].items():
+        if not p["count"]:
+            print(f"   {stage:<26}{0:>6}")
+            continue
+        print(f"   {stage:<26}{p['count']:>6}" + "".join(
+            f"{p[k]:>9.3f}" for k in ("p50", "p90", "p95", "p99", "max")))
+    ops = report["redis_ops"]
+    if ops:
+        total = sum(ops.values())
+        top = ", ".join(f"{k}={v}" for k, v in sorted(ops.items(), key=lambda kv: -kv[1])[:6])
+        print(f"\n   redis ops: {total} ({total / report['wall_seconds']:.0f}/s) — {top}")
+    else:
+        print("\n   redis ops: unavailable (INFO commandstats not supported)")
+    print(f"   cpu: {report['cpu_seconds']:.2f}s ({100 * report['cpu_seconds'] / report['wall_seconds']:.0f}% of one core)")
+    print(f"   peak rss: {report['peak_rss_mb']:.1f} MB")
+
+# --- Entry point ---
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Replay WAV fixtures through the audio pipeline with stub providers.")
+    parser.add_argument("--meetings", type=int, default=2, help="Number of simulated concurrent meetings")
+    parser.add_argument("--wav", nargs="*", default=[], help="WAV fixtures (44.1kHz mono 16-bit), one utterance each")
+    parser.add_argument("--utterances", type=int, default=3, help="Utterances per meeting (fixtures are cycled)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay rate; 1.0 is real time")
+    parser.add_argument("--gap", type=float, default=5.0, help="Silence after each utterance, in wall seconds")
+    parser.add_argument("--stt-latency", type=LatencyModel.parse, default=LatencyModel.parse("lognormal:0.8,0.3"))
+    parser.add_argument("--llm-latency", type=LatencyModel.parse, default=LatencyModel.parse("lognormal:1.2,0.4"))
+    parser.add_argument("--tts-latency", type=LatencyModel.parse, default=LatencyModel.parse("lognormal:0.9,0.3"))
+    parser.add_argument("--question-rate", type=float, default=1.0, help="Fraction of LLM calls that return a question")
+    parser.add_argument("--prefilter-threshold", type=float, help="Override PREFILTER_THRESHOLD (0 disables skipping)")
+    parser.add_argument("--drain", type=float, default=15.0, help="Seconds to wait for in-flight work after replay")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="Also write the report as JSON to this path")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    random.seed(args.seed)
+    json_path = os.path.abspath(args.json_path) if args.json_path else None
+
+    workdir = tempfile.mkdtemp(prefix="pipeline_bench_")
+    # Services read these at import time
+    os.environ["REDIS_URL"] = args.redis_url
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["TRANSCRIPTION_PROVIDER"] = "elevenlabs"
+    if args.prefilter_threshold is not None:
+        os.environ["PREFILTER_THRESHOLD"] = str(args.prefilter_threshold)
+    os.environ.setdefault("ENCRYPTION_KEY", "Trq2q8y5W7u7Q0p4R1v9S3x6Y8z2A4b6C8d0E2f4G6h=")
+
+    import redis
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from backend.common import database, models
+    from backend.transcription import main as transcription_service
+    from backend.ai import analysis_service
+    from backend.tts import main as tts_service
+
+    # SQLite connections are shared between worker threads here
+    database.engine = create_engine(os.environ["DATABASE_URL"], connect_args={"check_same_thread": False})
+    database.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=database.engine)
+    models.Base.metadata.create_all(bind=database.engine)
+
+    r = redis.from_url(args.redis_url)
+    try:
+        r.ping()
+    except Exception as e:
+        print(f"❌ Redis not reachable at {args.redis_url}: {e}")
+        return 1
+    r.delete(*PIPELINE_KEYS)
+
+    recorder = Recorder()
+    stt_cls, llm_cls, tts_cls = make_stubs(recorder, args.stt_latency, args.llm_latency, args.tts_latency, args.question_rate)
+    transcription_service.ElevenLabsClient = stt_cls
+    analysis_service.get_llm_client = lambda backend=None: llm_cls()
+    tts_service.ElevenLabsTTSClient = tts_cls
+
+    fixtures = [load_fixture(p) for p in args.wav] or [synthetic_fixture(4.0)]
+    plan = [fixtures[i % len(fixtures)] for i in range(args.utterances)]
+    audio_seconds = args.meetings * sum(len(p) for p in plan) / (SAMPLE_RATE * SAMPLE_WIDTH)
+
+    # TTS writes next to the cwd; keep it inside the scratch dir
+    os.chdir(workdir)
+    stop = threading.Event()
+    for target in (transcription_service.main, analysis_service.main, tts_service.main):
+        threading.Thread(target=target, daemon=True).start()
+    for target in (monitor_transcripts, fake_bot_playback):
+        threading.Thread(target=target, args=(args.redis_url, recorder, stop), daemon=True).start()
+    time.sleep(1.0)
+
+    ops_before = redis_command_stats(r)
+    cpu_before = resource.getrusage(resource.RUSAGE_SELF)
+    started = time.perf_counter()
+
+    utterance_ends = {m: [] for m in range(1, args.meetings + 1)}
+    replayers = [
+        threading.Thread(target=replay_meeting,
+                         args=(args.redis_url, m, plan, args.speed, args.gap, utterance_ends[m], stop))
+        for m in utterance_ends
+    ]
+    for t in replayers:
+        t.start()
+    for t in replayers:
+        t.join()
+    time.sleep(args.drain)
+
+    wall = time.perf_counter() - started
+    cpu_after = resource.getrusage(resource.RUSAGE_SELF)
+    ops_after = redis_command_stats(r)
+    stop.set()
+
+    latency = {stage: percentiles(v) for stage, v in sorted(recorder.durations.items())}
+    latency.update({k: percentiles(v) for k, v in milestone_latencies(recorder, utterance_ends).items()})
+    report = {
+        "config": {
+            "meetings": args.meetings, "utterances": args.utterances, "speed": args.speed, "gap": args.gap,
+            "stt_latency": str(args.stt_latency), "llm_latency": str(args.llm_latency),
+            "tts_latency": str(args.tts_latency), "question_rate": args.question_rate,
+        },
+        "wall_seconds": wall,
+        "audio_seconds": audio_seconds,
+        "latency": latency,
+        "redis_ops": {k: v - ops_before.get(k, 0) for k, v in ops_after.items() if v - ops_before.get(k, 0)},
+        "cpu_seconds": (cpu_after.ru_utime + cpu_after.ru_stime) - (cpu_before.ru_utime + cpu_before.ru_stime),
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        "peak_rss_mb": cpu_after.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+    }
+    print_report(report)
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
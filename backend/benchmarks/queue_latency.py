@@ -0,0 +1,169 @@
+"""
+Celery queue topology benchmark.
+
+Queues a backlog of long "batch" jobs (standing in for spec generations),
+then sends short "interactive" jobs (standing in for rolling-summary folds)
+at a steady rate, and reports how long the interactive jobs took from send
+to finish. Jobs only sleep, so the numbers are pure queueing. Two topologies
+with the same number of worker processes are compared:
+
+- shared: one queue, default prefetch (4) and early acks (the old setup)
+- split: the production routing (celery_app) - batch and interactive queues
+  served by separate workers, prefetch 1 and acks_late for batch jobs
+
+Workers run as subprocesses (thread pool) against the given Redis, which is
+flushed first: use a scratch database.
+
+Usage:
+    python -m backend.benchmarks.queue_latency --redis-url redis://localhost:6379/14 \
+        --workers 4 --batch-jobs 24 --batch-seconds 3 --interactive-jobs 40
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from celery import Celery
+from backend.benchmarks.pipeline_replay import percentiles
+from backend.celery_app import BATCH_QUEUE, INTERACTIVE_QUEUE, celery_app as production_app
+
+TOPOLOGIES = ("shared", "split")
+SHARED_QUEUE = "bench_shared"
+
+def make_app(redis_url: str, topology: str) -> Celery:
+    app = Celery("queue_latency_bench", broker=redis_url, backend=redis_url)
+    app.conf.update(
+        task_serializer="json", accept_content=["json"], result_serializer="json",
+        broker_connection_retry_on_startup=True,
+    )
+    if topology == "split":
+        production = production_app.conf
+        app.conf.update(
+            task_routes={"bench.batch": {"queue": BATCH_QUEUE}, "bench.interactive": {"queue": INTERACTIVE_QUEUE}},
+            task_default_priority=production.task_default_priority,
+            broker_transport_options=production.broker_transport_options,
+        )
+    else:
+        app.conf.update(task_default_queue=SHARED_QUEUE)
+
+    # Same per-task options as generate_specification_task / update_rolling_summary_task
+    late = topology == "split"
+
+    @app.task(name="bench.batch", acks_late=late, reject_on_worker_lost=late)
+    def batch(seconds: float):
+        time.sleep(seconds)
+
+    @app.task(name="bench.interactive")
+    def interactive(sent_at: float, seconds: float):
+        time.sleep(seconds)
+        return time.time() - sent_at
+
+    return app
+
+# Module-level app for the worker subprocesses (`celery -A backend.benchmarks.queue_latency`)
+app = make_app(os.getenv("QUEUE_BENCH_REDIS_URL", "redis://localhost:6379/14"), os.getenv("QUEUE_BENCH_TOPOLOGY", "shared"))
+
+def start_workers(redis_url: str, topology: str, workers: int) -> list:
+    env = {**os.environ, "QUEUE_BENCH_REDIS_URL": redis_url, "QUEUE_BENCH_TOPOLOGY": topology}
+    base = [sys.executable, "-m", "celery", "-A", "backend.benchmarks.queue_latency", "worker",
+            "--pool", "threads", "--loglevel", "warning", "--without-gossip", "--without-mingle", "--without-heartbeat"]
+    if topology == "shared":
+        plan = [(SHARED_QUEUE, workers, ["--prefetch-multiplier", "4"])]
+    else:
+        # Same process budget: one for live work, the rest for batch
+        plan = [(INTERACTIVE_QUEUE, 1, []), (BATCH_QUEUE, workers - 1, ["-O", "fair", "--prefetch-multiplier", "1"])]
+    return [
+        subprocess.Popen(base + ["-Q", queue, "--concurrency", str(n), "-n", f"{topology}-{queue}@%h"] + extra, env=env)
+        for queue, n, extra in plan
+    ]
+
+def wait_for_workers(bench_app: Celery, expected: int, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        replies = bench_app.control.ping(timeout=0.5) or []
+        if len(replies) >= expected:
+            return
+    raise RuntimeError(f"Only {len(replies)} of {expected} benchmark workers came up")
+
+def run_topology(args, topology: str) -> dict:
+    import redis
+
+    redis.from_url(args.redis_url).flushdb()
+    bench_app = make_app(args.redis_url, topology)
+    procs = start_workers(args.redis_url, topology, args.workers)
+    try:
+        wait_for_workers(bench_app, len(procs))
+        started = time.time()
+        batch = [bench_app.tasks["bench.batch"].delay(args.batch_seconds) for _ in range(args.batch_jobs)]
+        interactive = []
+        for _ in range(args.interactive_jobs):
+            interactive.append(bench_app.tasks["bench.interactive"].delay(time.time(), args.interactive_seconds))
+            time.sleep(args.interactive_interval)
+        latencies = [r.get(timeout=args.timeout) for r in interactive]
+        for r in batch:
+            r.get(timeout=args.timeout)
+        makespan = time.time() - started
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait(timeout=30)
+    return {"interactive": percentiles(latencies), "batch_makespan": makespan}
+
+def print_report(report: dict):
+    config = report["config"]
+    print("\n📊 Queue topology results")
+    print(f"   workers={config['workers']} batch={config['batch_jobs']}x{config['batch_seconds']}s "
+          f"interactive={config['interactive_jobs']}x{config['interactive_seconds']}s every {config['interactive_interval']}s")
+    print(f"\n   {'topology':<10}{'n':>6}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}{'batch done':>12}")
+    for topology, result in report["topologies"].items():
+        p = result["interactive"]
+        print(f"   {topology:<10}{p['count']:>6}" + "".join(f"{p[k]:>9.2f}" for k in ("p50", "p90", "p95", "p99", "max"))
+              + f"{result['batch_makespan']:>11.1f}s")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Interactive job latency under a batch backlog, per Celery topology.")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes (threads) per topology; at least 2")
+    parser.add_argument("--batch-jobs", type=int, default=24)
+    parser.add_argument("--batch-seconds", type=float, default=3.0)
+    parser.add_argument("--interactive-jobs", type=int, default=40)
+    parser.add_argument("--interactive-seconds", type=float, default=0.05)
+    parser.add_argument("--interactive-interval", type=float, default=0.25, help="Seconds between interactive jobs")
+    parser.add_argument("--topology", choices=TOPOLOGIES, action="append", help="Run only these (default: both)")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--redis-url", default="redis://localhost:6379/14")
+    parser.add_argument("--json", dest="json_path", help="Also write the report as JSON to this path")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.workers < 2:
+        print("❌ --workers must be at least 2 (the split topology keeps one for interactive jobs)")
+        return 1
+
+    import redis
+    try:
+        redis.from_url(args.redis_url).ping()
+    except Exception as e:
+        print(f"❌ Redis not reachable at {args.redis_url}: {e}")
+        return 1
+
+    report = {
+        "config": {k: getattr(args, k) for k in
+                   ("workers", "batch_jobs", "batch_seconds", "interactive_jobs", "interactive_seconds", "interactive_interval")},
+        "topologies": {},
+    }
+    for topology in args.topology or TOPOLOGIES:
+        print(f"⏳ Running {topology} topology ...")
+        report["topologies"][topology] = run_topology(args, topology)
+
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
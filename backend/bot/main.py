@@ -52,7 +52,10 @@ def main():
                     redis_client.delete(stop_key)
                     
                     print(f"\n✅ Bot joined Meeting {meeting_id}. Monitoring audio...")
-                    
+
+                    # Stays unmuted across the sentences of one streamed utterance
+                    speaking = False
+
                     while bot.is_connected:
                         # 1. Check for Manual Stop Signal
                         if redis_client.exists(stop_key):
@@ -76,15 +79,19 @@ def main():
                                     if file_path:
                                         print(f"🗣️ Bot is speaking: {file_path}")
 
-                                        # 1. Unmute before speaking
-                                        if bot:
+                                        # 1. Unmute before the first sentence
+                                        if bot and not speaking:
                                            bot.unmute_microphone()
                                            time.sleep(0.5)
+                                        speaking = True
 
                                         # 2. Play Audio
                                         bot.recorder.play_audio(file_path)
 
-                                        # 3. Mute after speakingß
+                                    if playback_data.get("final", True) and speaking:
+                                        speaking = False
+
+                                        # 3. Mute after the last sentence
                                         if bot:
                                             time.sleep(0.5)
                                             bot.mute_microphone()
@@ -103,8 +110,9 @@ def main():
                         # 3. Perform Bot Maintenance (Move mouse, check kicked status)
                         if bot:
                             bot.perform_maintenance()
-                        
-                        time.sleep(0.5)
+
+                        # Poll faster mid-utterance so the next sentence follows without a gap
+                        time.sleep(0.05 if speaking else 0.5)
                         
                 except Exception as e:
                     print(f"❌ Error during meeting execution: {e}")
@@ -1,7 +1,37 @@
 import os
 from celery import Celery
+from celery.signals import worker_init
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+LLM_USAGE_ROLLUP_SECONDS = float(os.getenv("LLM_USAGE_ROLLUP_SECONDS", "3600"))
+
+# Queues, each served by its own worker (see docker-compose.yml) so a backlog
+# of long spec generations never delays work a live meeting is waiting on.
+# The spec worker runs with --prefetch-multiplier 1: a queued job then waits in
+# Redis, where a free worker (or a higher-priority job) can still get ahead of it.
+INTERACTIVE_QUEUE = "interactive"
+BATCH_QUEUE = "specs"
+MAINTENANCE_QUEUE = "maintenance"
+
+# Within a queue, lower numbers run first (Redis emulates priorities with one list per step)
+PRIORITY_STEPS = list(range(10))
+DEFAULT_PRIORITY = 5
+# Revising the latest version is a short job; a full rebuild of a long meeting is not
+SPEC_REVISION_PRIORITY = 3
+SPEC_FULL_PRIORITY = 7
+
+# Spec jobs mostly wait on the LLM over HTTP, so their worker can run on the gevent
+# pool (`-P gevent -c 50`): one process, one greenlet per job. The LLM clients'
+# HTTP calls yield once gevent has patched sockets; psycopg2 needs psycogreen
+# (set up in _cooperative_database below), and tasks release their DB connection
+# while waiting on the LLM (database.release_connection).
+
+# Seconds. The soft limit raises inside the task so it can clean up; the hard limit kills it.
+# The gevent pool ignores soft limits, so spec jobs enforce theirs themselves (tasks._soft_time_limit).
+SPEC_SOFT_TIME_LIMIT = int(os.getenv("SPEC_SOFT_TIME_LIMIT", "600"))
+SPEC_TIME_LIMIT = int(os.getenv("SPEC_TIME_LIMIT", "660"))
+INTERACTIVE_SOFT_TIME_LIMIT = int(os.getenv("INTERACTIVE_SOFT_TIME_LIMIT", "60"))
+INTERACTIVE_TIME_LIMIT = int(os.getenv("INTERACTIVE_TIME_LIMIT", "90"))
 
 celery_app = Celery(
     "voice_meeting_worker",
@@ -16,4 +46,46 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
-)
\ No newline at end of file
+    # Lets GET /jobs/{id} tell a running job from a queued one
+    task_track_started=True,
+    task_routes={
+        "generate_specification_task": {"queue": BATCH_QUEUE},
+        "update_rolling_summary_task": {"queue": INTERACTIVE_QUEUE},
+        "rollup_llm_usage_task": {"queue": MAINTENANCE_QUEUE},
+    },
+    # Anything unrouted is treated as batch work rather than risk slowing interactive work
+    task_default_queue=BATCH_QUEUE,
+    task_default_priority=DEFAULT_PRIORITY,
+    broker_transport_options={
+        "queue_order_strategy": "priority",
+        "priority_steps": PRIORITY_STEPS,
+        "sep": ":",
+        # Unacknowledged (acks_late) jobs are redelivered after this; it must outlast the hard limit
+        "visibility_timeout": max(3600, 2 * SPEC_TIME_LIMIT),
+    },
+    beat_schedule={
+        "rollup-llm-usage": {"task": "rollup_llm_usage_task", "schedule": LLM_USAGE_ROLLUP_SECONDS},
+    },
+)
+
+def gevent_pool() -> bool:
+    """True inside a worker running the gevent pool (which monkey-patches sockets)."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("socket")
+
+@worker_init.connect
+def _cooperative_database(**kwargs):
+    """Under the gevent pool, makes psycopg2 yield to other greenlets while waiting on Postgres."""
+    if not gevent_pool():
+        # prefork / threads pool
+        return
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        print("⚠️ gevent pool without psycogreen: every database call blocks all running tasks")
+        return
+    patch_psycopg()
+    print("🟢 gevent pool: database calls are cooperative")
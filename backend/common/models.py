@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, Boolean, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -38,18 +38,44 @@ class Meeting(Base):
     transcripts = relationship("Transcript", back_populates="meeting")
     specifications = relationship("Specification", back_populates="meeting")
     audio_files = relationship("AudioFile", back_populates="meeting")
+    rolling_summary = relationship("MeetingSummary", back_populates="meeting", uselist=False)
 
 class Transcript(Base):
     __tablename__ = "transcripts"
 
     id = Column(Integer, primary_key=True, index=True)
-    meeting_id = Column(Integer, ForeignKey("meetings.id"))
+    meeting_id = Column(Integer, ForeignKey("meetings.id"), index=True)
     speaker = Column(String)
     text = Column(Text)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
 
     meeting = relationship("Meeting", back_populates="transcripts")
 
+class MeetingSummary(Base):
+    __tablename__ = "meeting_summaries"
+
+    meeting_id = Column(Integer, ForeignKey("meetings.id"), primary_key=True)
+    content = Column(Text, nullable=False, default="")
+    # Highest transcript id already folded into `content`
+    last_transcript_id = Column(Integer, nullable=False, default=0)
+    # Characters of the meeting's transcript document already folded into `content`
+    document_offset = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    meeting = relationship("Meeting", back_populates="rolling_summary")
+
+class MeetingTranscript(Base):
+    """Whole transcript of a meeting as one text, appended to with every saved line."""
+    __tablename__ = "meeting_transcripts"
+
+    meeting_id = Column(Integer, ForeignKey("meetings.id"), primary_key=True)
+    content = Column(Text, nullable=False, default="")
+    line_count = Column(Integer, nullable=False, default=0)
+    last_transcript_id = Column(Integer, nullable=False, default=0)
+    # sha256 chained over the lines, so it can be extended without reading the text
+    content_hash = Column(String(64), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class Specification(Base):
     __tablename__ = "specifications"
 
@@ -63,6 +89,48 @@ class Specification(Base):
     project = relationship("Project", back_populates="specifications")
     meeting = relationship("Meeting", back_populates="specifications")
     tasks = relationship("Task", back_populates="specification")
+    source = relationship("SpecificationSource", back_populates="specification", uselist=False,
+                          foreign_keys="SpecificationSource.specification_id")
+
+class SpecificationSource(Base):
+    """
+    Lineage of a generated specification: its version, the version it was
+    revised from, and how much of the meeting's transcript it covers.
+    """
+    __tablename__ = "specification_sources"
+    __table_args__ = (UniqueConstraint("meeting_id", "version"),)
+
+    specification_id = Column(Integer, ForeignKey("specifications.id"), primary_key=True)
+    meeting_id = Column(Integer, ForeignKey("meetings.id"), index=True)
+    # Monotonically increasing per meeting; mirrored as a string in Specification.version
+    version = Column(Integer, nullable=False)
+    parent_id = Column(Integer, ForeignKey("specifications.id"), nullable=True)
+    transcript_hash = Column(String(64))
+    last_transcript_id = Column(Integer)
+    # Characters of the meeting's transcript document the specification covers
+    document_offset = Column(Integer, nullable=False, default=0)
+
+    specification = relationship("Specification", back_populates="source", foreign_keys=[specification_id])
+
+class SpecificationRevision(Base):
+    """
+    One step in a meeting's specification history (generations and edits).
+    Every SPEC_SNAPSHOT_EVERY-th revision stores the full text ("snapshot");
+    the others store a text_delta against the revision before ("delta").
+    """
+    __tablename__ = "specification_revisions"
+    __table_args__ = (UniqueConstraint("meeting_id", "revision"),)
+
+    id = Column(Integer, primary_key=True)
+    meeting_id = Column(Integer, ForeignKey("meetings.id"), index=True)
+    revision = Column(Integer, nullable=False)
+    specification_id = Column(Integer, ForeignKey("specifications.id"))
+    kind = Column(String(8), nullable=False)
+    # Full text for snapshots, JSON-encoded delta otherwise
+    payload = Column(Text, nullable=False)
+    # What produced it: "generated", "edit" or "legacy" (a spec from before history was kept)
+    origin = Column(String(16), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class Task(Base):
     __tablename__ = "tasks"
@@ -103,3 +171,38 @@ class AudioFile(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     meeting = relationship("Meeting", back_populates="audio_files")
+
+class LLMCall(Base):
+    """One LLM request (or cache hit). Rolled up into LLMUsageRollup and deleted after an hour."""
+    __tablename__ = "llm_calls"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime(timezone=True), index=True)
+    # No foreign keys: rows are written in bulk off the request path and outlive deleted meetings
+    meeting_id = Column(Integer, index=True, nullable=True)
+    project_id = Column(Integer, index=True, nullable=True)
+    method = Column(String)
+    model = Column(String)
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    latency_ms = Column(Integer, default=0)
+    cache_hit = Column(Boolean, default=False)
+    error = Column(Boolean, default=False)
+
+class LLMUsageRollup(Base):
+    """Hourly LLM usage per (meeting, project, method, model)."""
+    __tablename__ = "llm_usage_rollups"
+
+    id = Column(Integer, primary_key=True)
+    period_start = Column(DateTime(timezone=True), index=True)
+    meeting_id = Column(Integer, index=True, nullable=True)
+    project_id = Column(Integer, index=True, nullable=True)
+    method = Column(String)
+    model = Column(String)
+    calls = Column(Integer, default=0)
+    cache_hits = Column(Integer, default=0)
+    errors = Column(Integer, default=0)
+    prompt_tokens = Column(Integer, default=0)
+    completion_tokens = Column(Integer, default=0)
+    latency_ms_total = Column(Integer, default=0)
+    latency_ms_max = Column(Integer, default=0)
@@ -1,3 +1,4 @@
+import json
 import os
 import redis
 
@@ -5,3 +6,10 @@ REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
 def get_redis_client():
     return redis.from_url(REDIS_URL)
+
+def publish_meeting_update(meeting_id: int, payload: dict):
+    """Sends `payload` to the meeting's live channel; a Redis outage never fails the caller."""
+    try:
+        get_redis_client().publish(f"meeting_{meeting_id}_updates", json.dumps(payload))
+    except Exception as e:
+        print(f"⚠️ Failed to publish update for meeting {meeting_id}: {e}")
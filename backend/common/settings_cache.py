@@ -0,0 +1,104 @@
+import asyncio
+import threading
+import time
+from backend.common import database, models
+from backend.common.redis_client import get_redis_client
+
+SETTINGS_CHANNEL = "settings_updates"
+RESUBSCRIBE_DELAY = 5
+
+class SettingsCache:
+    """
+    Process-wide, in-memory copy of the `settings` table.
+
+    All settings are loaded in one query and served from memory until a
+    message on SETTINGS_CHANNEL (sent by crud.update_setting) invalidates them.
+    Values are only cached while the Redis subscription is live; if Redis is
+    unreachable every read falls back to the database so nothing goes stale.
+    """
+    def __init__(self):
+        self._values = None
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._subscribed = threading.Event()
+        self._listener = None
+
+    def get(self, key: str, default=None):
+        self._ensure_listener()
+        values = self._values
+        if values is None:
+            values = self._load()
+        return values.get(key, default)
+
+    async def aget(self, key: str, default=None):
+        """get() for event-loop callers: a miss is loaded in a worker thread instead of blocking the loop."""
+        self._ensure_listener()
+        values = self._values
+        if values is None:
+            values = await asyncio.to_thread(self._load)
+        return values.get(key, default)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._values = None
+
+    def _load(self) -> dict:
+        # Snapshot before reading so an update that lands mid-query is not cached over
+        generation = self._generation
+        cacheable = self._subscribed.is_set()
+
+        db = database.SessionLocal()
+        try:
+            values = {s.key: s.value for s in db.query(models.Setting).all()}
+        finally:
+            db.close()
+
+        with self._lock:
+            if cacheable and generation == self._generation:
+                self._values = values
+        return values
+
+    def _ensure_listener(self):
+        # Also restarts the thread in forked children (e.g. Celery prefork workers)
+        if self._listener is None or not self._listener.is_alive():
+            with self._lock:
+                if self._listener is None or not self._listener.is_alive():
+                    self._listener = threading.Thread(target=self._listen, daemon=True)
+                    self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = get_redis_client().pubsub()
+                pubsub.subscribe(SETTINGS_CHANNEL)
+                for message in pubsub.listen():
+                    if message["type"] == "subscribe":
+                        self._subscribed.set()
+                    elif message["type"] == "message":
+                        self.invalidate()
+            except Exception as e:
+                print(f"⚠️ Settings cache lost its Redis subscription: {e}")
+            finally:
+                # Updates may be missed while disconnected: stop caching until resubscribed
+                self._subscribed.clear()
+                self.invalidate()
+            time.sleep(RESUBSCRIBE_DELAY)
+
+settings_cache = SettingsCache()
+
+def get_setting_value(key: str, default=None):
+    """Returns the current value of a setting without a database round trip on cache hits."""
+    return settings_cache.get(key, default)
+
+async def aget_setting_value(key: str, default=None):
+    """get_setting_value for async callers; never blocks the event loop on a cache miss."""
+    return await settings_cache.aget(key, default)
+
+def publish_settings_changed(key: str):
+    """Tells every process's SettingsCache to reload on its next read."""
+    settings_cache.invalidate()
+    try:
+        get_redis_client().publish(SETTINGS_CHANNEL, key)
+    except Exception as e:
+        print(f"⚠️ Failed to publish settings invalidation for '{key}': {e}")
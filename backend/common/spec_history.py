@@ -0,0 +1,127 @@
+import difflib
+import json
+import os
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from backend.common import models, text_delta
+
+# A full copy every N revisions bounds how many deltas a read has to replay
+SPEC_SNAPSHOT_EVERY = int(os.getenv("SPEC_SNAPSHOT_EVERY", "20"))
+
+Revision = models.SpecificationRevision
+
+def head(db: Session, meeting_id: int):
+    """The meeting's newest revision row, or None."""
+    return db.query(Revision).filter(Revision.meeting_id == meeting_id).order_by(Revision.revision.desc()).first()
+
+def _last_snapshot(db: Session, meeting_id: int, at_or_before: int = None):
+    query = db.query(func.max(Revision.revision)).filter(Revision.meeting_id == meeting_id, Revision.kind == "snapshot")
+    if at_or_before is not None:
+        query = query.filter(Revision.revision <= at_or_before)
+    return query.scalar()
+
+def record_revision(db: Session, meeting_id: int, specification_id: int, content: str, origin: str,
+                    previous: str = None, delta: list = None) -> models.SpecificationRevision:
+    """
+    Appends `content` to the meeting's history (not committed; the caller commits
+    with the change itself). `previous` is the text of the current head revision;
+    it is looked up when not given. `delta`, when the caller already has the
+    operations turning `previous` into `content`, is stored instead of a diff. Concurrent writers collide on the unique
+    (meeting_id, revision) and the loser's transaction fails.
+    """
+    current = head(db, meeting_id)
+    if current is None:
+        base_id = specification_id
+        if previous is None:
+            latest = db.query(models.Specification)\
+                .filter(models.Specification.meeting_id == meeting_id, models.Specification.id != specification_id)\
+                .order_by(models.Specification.id.desc()).first()
+            if latest is not None:
+                base_id, previous = latest.id, latest.content
+        if previous is None:
+            return _add(db, meeting_id, 1, specification_id, "snapshot", content, origin)
+        # Keep what existed before history was kept as the base of the chain
+        current = _add(db, meeting_id, 1, base_id, "snapshot", previous, "legacy")
+    elif previous is None:
+        previous = db.get(models.Specification, current.specification_id).content
+    if previous == content and current.specification_id == specification_id:
+        return current
+
+    number = current.revision + 1
+    if delta is None:
+        delta = text_delta.diff(previous or "", content)
+    delta = json.dumps(delta, separators=(",", ":"))
+    since_snapshot = number - (_last_snapshot(db, meeting_id) or current.revision)
+    if since_snapshot >= SPEC_SNAPSHOT_EVERY or len(delta) >= len(content):
+        return _add(db, meeting_id, number, specification_id, "snapshot", content, origin)
+    return _add(db, meeting_id, number, specification_id, "delta", delta, origin)
+
+def started_from_legacy(db: Session, meeting_id: int) -> bool:
+    """True when the history's first revision is a specification saved before history was kept."""
+    return db.query(Revision.id).filter(
+        Revision.meeting_id == meeting_id, Revision.revision == 1, Revision.origin == "legacy"
+    ).first() is not None
+
+def ensure_head(db: Session, meeting_id: int):
+    """
+    The head revision, starting the history from the latest specification if
+    the meeting has none yet (specs saved before history was kept). None when
+    there is no specification at all. Commits, so only for write paths: reads
+    use head().
+    """
+    current = head(db, meeting_id)
+    if current is not None:
+        return current
+    latest = db.query(models.Specification).filter(models.Specification.meeting_id == meeting_id)\
+        .order_by(models.Specification.id.desc()).first()
+    if latest is None:
+        return None
+    try:
+        current = _add(db, meeting_id, 1, latest.id, "snapshot", latest.content, "legacy")
+        db.commit()
+    except IntegrityError:
+        # Another request started it first
+        db.rollback()
+        current = head(db, meeting_id)
+    return current
+
+def _add(db, meeting_id, number, specification_id, kind, payload, origin):
+    row = Revision(meeting_id=meeting_id, revision=number, specification_id=specification_id,
+                   kind=kind, payload=payload, origin=origin)
+    db.add(row)
+    db.flush()
+    return row
+
+def revision_contents(db: Session, meeting_id: int, revisions) -> dict:
+    """
+    Text of each requested revision. Each is rebuilt from the nearest snapshot
+    at or before it, loading only the rows between the two; revisions that
+    share a snapshot are rebuilt in one pass. Missing revisions are left out.
+    """
+    wanted = sorted(set(revisions))
+    groups = {}
+    for number in wanted:
+        snapshot = _last_snapshot(db, meeting_id, at_or_before=number)
+        if snapshot is not None:
+            groups.setdefault(snapshot, []).append(number)
+
+    contents = {}
+    for snapshot, numbers in groups.items():
+        rows = db.query(Revision.revision, Revision.kind, Revision.payload)\
+            .filter(Revision.meeting_id == meeting_id, Revision.revision >= snapshot, Revision.revision <= numbers[-1])\
+            .order_by(Revision.revision)
+        text = None
+        for number, kind, payload in rows:
+            text = payload if kind == "snapshot" else text_delta.apply(text, json.loads(payload))
+            if number in numbers:
+                contents[number] = text
+    return contents
+
+def revision_content(db: Session, meeting_id: int, revision: int):
+    return revision_contents(db, meeting_id, [revision]).get(revision)
+
+def unified_diff(old: str, new: str, from_label: str, to_label: str) -> str:
+    return "".join(difflib.unified_diff(
+        old.splitlines(keepends=True), new.splitlines(keepends=True), fromfile=from_label, tofile=to_label
+    ))
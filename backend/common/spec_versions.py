@@ -0,0 +1,53 @@
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from backend.common import models, spec_history
+
+SAVE_ATTEMPTS = 3
+
+def latest_specification(db: Session, meeting_id: int):
+    """The meeting's newest generated specification (ids only grow; created_at is not reliable)."""
+    return db.query(models.Specification)\
+        .filter(models.Specification.meeting_id == meeting_id)\
+        .order_by(models.Specification.id.desc()).first()
+
+def _legacy_version(spec) -> int:
+    # Specifications from before versioning were all "1.0.0"
+    try:
+        return int(str(spec.version).split(".")[0])
+    except (TypeError, ValueError):
+        return 1
+
+def next_version(db: Session, meeting_id: int) -> int:
+    top = db.query(func.max(models.SpecificationSource.version))\
+        .filter(models.SpecificationSource.meeting_id == meeting_id).scalar() or 0
+    latest = latest_specification(db, meeting_id)
+    return max(top, _legacy_version(latest) if latest else 0) + 1
+
+def save_version(db: Session, meeting_id: int, project_id: int, content: str, parent=None,
+                 transcript_hash: str = None, last_transcript_id: int = 0, document_offset: int = 0):
+    """
+    Stores `content` as the meeting's next specification version, linked to `parent`.
+    Versions are unique per meeting; a writer that loses a race for a number takes the next one.
+    """
+    for _ in range(SAVE_ATTEMPTS):
+        version = next_version(db, meeting_id)
+        spec = models.Specification(project_id=project_id, meeting_id=meeting_id, content=content, version=str(version))
+        db.add(spec)
+        db.flush()
+        db.add(models.SpecificationSource(
+            specification_id=spec.id,
+            meeting_id=meeting_id,
+            version=version,
+            parent_id=parent.id if parent else None,
+            transcript_hash=transcript_hash,
+            last_transcript_id=last_transcript_id,
+            document_offset=document_offset
+        ))
+        try:
+            spec_history.record_revision(db, meeting_id, spec.id, content, "generated")
+            db.commit()
+            return spec
+        except IntegrityError:
+            db.rollback()
+    raise RuntimeError(f"Could not allocate a specification version for Meeting {meeting_id}")
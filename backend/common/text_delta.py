@@ -0,0 +1,132 @@
+"""
+Compact text deltas.
+
+A delta is a JSON-friendly list of operations applied left to right over the
+old text: a positive int keeps that many characters, a negative int deletes
+that many, and a string is inserted. Characters after the last operation are
+kept, so an edit near the start of a long document is only a few entries:
+
+    [120, -5, "new words", -2]
+"""
+import difflib
+
+def diff(old: str, new: str) -> list:
+    """Delta turning `old` into `new`, computed line by line (fast on long Markdown documents)."""
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            _push(ops, sum(len(line) for line in old_lines[i1:i2]))
+            continue
+        if i2 > i1:
+            _push(ops, -sum(len(line) for line in old_lines[i1:i2]))
+        if j2 > j1:
+            _push(ops, "".join(new_lines[j1:j2]))
+    # Trailing keeps are implicit
+    while ops and isinstance(ops[-1], int) and ops[-1] > 0:
+        ops.pop()
+    return ops
+
+def _push(ops: list, op):
+    if not op:
+        return
+    last = ops[-1] if ops else None
+    if isinstance(op, str) and isinstance(last, str):
+        ops[-1] = last + op
+    elif isinstance(op, int) and isinstance(last, int) and not isinstance(last, bool) and (op > 0) == (last > 0):
+        ops[-1] = last + op
+    else:
+        ops.append(op)
+
+def validate(ops) -> list:
+    """Raises ValueError unless `ops` is a well-formed delta."""
+    if not isinstance(ops, list):
+        raise ValueError("A delta must be a list of operations")
+    for op in ops:
+        if isinstance(op, bool) or not isinstance(op, (int, str)) or op == 0 or op == "":
+            raise ValueError(f"Invalid delta operation: {op!r}")
+    return ops
+
+def apply(text: str, ops: list) -> str:
+    """Applies a delta; raises ValueError if it keeps or deletes past the end of `text`."""
+    validate(ops)
+    out = []
+    pos = 0
+    for op in ops:
+        if isinstance(op, str):
+            out.append(op)
+        elif op > 0:
+            if pos + op > len(text):
+                raise ValueError(f"Delta keeps {op} characters at {pos}, past the end ({len(text)})")
+            out.append(text[pos:pos + op])
+            pos += op
+        else:
+            if pos - op > len(text):
+                raise ValueError(f"Delta deletes {-op} characters at {pos}, past the end ({len(text)})")
+            pos -= op
+    out.append(text[pos:])
+    return "".join(out)
+
+class Conflict(Exception):
+    """An edit touches text that changed since the revision it was made against."""
+
+def _edits(ops: list) -> list:
+    # (position, deleted characters, inserted text) in old-text coordinates, left to right
+    edits = []
+    pos = 0
+    for op in ops:
+        if isinstance(op, int) and op > 0:
+            pos += op
+            continue
+        if edits and edits[-1][0] + edits[-1][1] == pos:
+            start, deleted, inserted = edits[-1]
+        else:
+            start, deleted, inserted = pos, 0, ""
+            edits.append(None)
+        if isinstance(op, str):
+            inserted += op
+        else:
+            deleted -= op
+            pos -= op
+        edits[-1] = (start, deleted, inserted)
+    return edits
+
+def _overlaps(a, b) -> bool:
+    a_start, a_len, _ = a
+    b_start, b_len, _ = b
+    if max(a_start, b_start) < min(a_start + a_len, b_start + b_len):
+        return True
+    # An insertion strictly inside the other side's deletion
+    return (a_len == 0 and b_start < a_start < b_start + b_len) or \
+           (b_len == 0 and a_start < b_start < a_start + a_len)
+
+def rebase(ops: list, base: str, head: str) -> list:
+    """
+    Moves a delta made against `base` so it applies to `head` (a later version
+    of the same text). Edits outside the regions that changed in between are
+    shifted; an edit touching a changed region raises Conflict. Where both
+    sides insert at the same point, the earlier change goes first.
+    """
+    apply(base, ops)
+    theirs = _edits(diff(base, head))
+    moved = []
+    for edit in _edits(ops):
+        start, deleted, inserted = edit
+        shift = 0
+        for other in theirs:
+            if _overlaps(edit, other):
+                raise Conflict(f"Edit at {start} overlaps a change made since it was based")
+            if other[0] + other[1] <= start:
+                shift += len(other[2]) - other[1]
+        moved.append((start + shift, deleted, inserted))
+
+    rebased = []
+    pos = 0
+    for start, deleted, inserted in moved:
+        _push(rebased, start - pos)
+        _push(rebased, -deleted)
+        _push(rebased, inserted)
+        pos = start + deleted
+    return rebased
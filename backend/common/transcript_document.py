@@ -0,0 +1,114 @@
+import hashlib
+from sqlalchemy import func, inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, defer
+from backend.common import models
+
+def format_line(speaker: str, text: str) -> str:
+    """One transcript line as the LLM sees it; one utterance per line."""
+    return f"{speaker}: {text.replace(chr(10), ' ')}\n"
+
+def chain_hash(previous: str, line: str) -> str:
+    # Running hash: appending a line never needs the text before it
+    return hashlib.sha256(((previous or "") + line).encode("utf-8")).hexdigest()
+
+def _document_for_update(db: Session, meeting_id: int):
+    # The text itself is never read back for an append
+    return db.query(models.MeetingTranscript)\
+        .options(defer(models.MeetingTranscript.content))\
+        .filter(models.MeetingTranscript.meeting_id == meeting_id)\
+        .with_for_update().first()
+
+def _extend(doc, lines: list, last_transcript_id: int):
+    content_hash = doc.content_hash
+    for line in lines:
+        content_hash = chain_hash(content_hash, line)
+    text = "".join(lines)
+    if inspect(doc).persistent:
+        # content = content || :text, evaluated by the database
+        doc.content = models.MeetingTranscript.content + text
+    else:
+        doc.content = text
+    doc.content_hash = content_hash
+    doc.line_count = (doc.line_count or 0) + len(lines)
+    doc.last_transcript_id = max(doc.last_transcript_id or 0, last_transcript_id)
+
+def _missing_lines(db: Session, meeting_id: int, after_id: int):
+    rows = db.query(models.Transcript.id, models.Transcript.speaker, models.Transcript.text)\
+        .filter(models.Transcript.meeting_id == meeting_id, models.Transcript.id > after_id)\
+        .order_by(models.Transcript.id).all()
+    return [format_line(speaker, text) for _, speaker, text in rows], (rows[-1][0] if rows else after_id)
+
+def append_transcript(db: Session, transcript: models.Transcript):
+    """
+    Appends a just-flushed transcript to its meeting's document, in the same
+    transaction, so the document always matches the committed transcripts.
+    The row lock orders concurrent writers for the same meeting.
+    """
+    doc = _document_for_update(db, transcript.meeting_id)
+    if doc is None:
+        # First line (or a meeting recorded before documents existed): start from everything saved so far
+        lines, last_id = _missing_lines(db, transcript.meeting_id, 0)
+        try:
+            with db.begin_nested():
+                doc = models.MeetingTranscript(meeting_id=transcript.meeting_id, content="", line_count=0, last_transcript_id=0)
+                _extend(doc, lines, last_id)
+                db.add(doc)
+            return doc
+        except IntegrityError:
+            # Another writer created it first
+            doc = _document_for_update(db, transcript.meeting_id)
+
+    if transcript.id > doc.last_transcript_id:
+        # Pick up anything written around the document (older rows, direct inserts) on the way
+        lines, last_id = _missing_lines(db, transcript.meeting_id, doc.last_transcript_id)
+        _extend(doc, lines, last_id)
+    else:
+        # A concurrent writer with a higher id committed first
+        _extend(doc, [format_line(transcript.speaker, transcript.text)], transcript.id)
+    return doc
+
+def load_document(db: Session, meeting_id: int):
+    """
+    The meeting's transcript document (one row), or None without transcripts.
+    Brought up to date first if transcripts were saved without going through
+    append_transcript.
+    """
+    doc = db.query(models.MeetingTranscript)\
+        .options(defer(models.MeetingTranscript.content))\
+        .filter(models.MeetingTranscript.meeting_id == meeting_id).first()
+    newest = db.query(func.max(models.Transcript.id)).filter(models.Transcript.meeting_id == meeting_id).scalar()
+    if newest is None:
+        return None
+    if doc is not None and doc.last_transcript_id >= newest:
+        return doc
+
+    try:
+        doc = _document_for_update(db, meeting_id)
+        if doc is None:
+            doc = models.MeetingTranscript(meeting_id=meeting_id, content="", line_count=0, last_transcript_id=0)
+            db.add(doc)
+        lines, last_id = _missing_lines(db, meeting_id, doc.last_transcript_id)
+        _extend(doc, lines, last_id)
+        db.commit()
+    except IntegrityError:
+        # Another reader created it first
+        db.rollback()
+    return db.query(models.MeetingTranscript)\
+        .options(defer(models.MeetingTranscript.content))\
+        .filter(models.MeetingTranscript.meeting_id == meeting_id).first()
+
+def document_state(db: Session, meeting_id: int):
+    """(content_hash, last_transcript_id, length in characters) of the up-to-date document, or None."""
+    if load_document(db, meeting_id) is None:
+        return None
+    Document = models.MeetingTranscript
+    return db.query(Document.content_hash, Document.last_transcript_id, func.length(Document.content))\
+        .filter(Document.meeting_id == meeting_id).one()
+
+def document_slice(db: Session, meeting_id: int, start: int, end: int) -> str:
+    """Characters [start, end) of the document, read without loading the rest of it."""
+    Document = models.MeetingTranscript
+    text = db.query(func.substr(Document.content, start + 1, max(end - start, 0)))\
+        .filter(Document.meeting_id == meeting_id).scalar()
+    return text or ""
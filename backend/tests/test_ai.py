@@ -1,11 +1,11 @@
 import pytest
 from unittest.mock import MagicMock, patch
-from backend.ai.tasks import generate_specification_task
+from backend.ai.tasks import generate_specification_task, update_rolling_summary_task
 from backend.common import models
 
 @pytest.fixture
 def mock_llm_client():
-    with patch("backend.ai.tasks.LLMClient") as mock:
+    with patch("backend.ai.tasks.get_llm_client") as mock:
         yield mock
 
 def test_generate_spec_task(db_session, mock_llm_client):
@@ -18,7 +18,7 @@ def test_generate_spec_task(db_session, mock_llm_client):
     
     # 2. Mock LLM Response
     mock_instance = mock_llm_client.return_value
-    mock_instance.summarize_meeting.return_value = "Summary: effective login page discussion."
+    mock_instance.fold_summary.return_value = "Summary: effective login page discussion."
     mock_instance.generate_specification.return_value = "# Final Spec\n- Login Page\n- Google Auth"
     
     # Run Task (synchronously)
@@ -33,9 +33,349 @@ def test_generate_spec_task(db_session, mock_llm_client):
     assert spec is not None
     assert "Final Spec" in spec.content
     assert spec.project_id == 10
+    mock_instance.generate_specification.assert_called_once_with("Summary: effective login page discussion.", custom_prompt=None)
 
 def test_generate_spec_no_transcripts(db_session, mock_llm_client):
     with patch("backend.ai.tasks.database.SessionLocal", return_value=db_session):
         result = generate_specification_task(meeting_id=999, project_id=10)
     
     assert result == "No transcripts"
+
+
+def test_rolling_summary_leaves_only_final_block(db_session, mock_llm_client):
+    mock_instance = mock_llm_client.return_value
+    mock_instance.fold_summary.side_effect = lambda previous, text: f"{previous}[{text.count(chr(10)) + 1} lines]"
+    mock_instance.generate_specification.return_value = "# Spec"
+
+    db_session.add_all([models.Transcript(meeting_id=60, speaker="A", text=f"Requirement number {i} for billing") for i in range(6)])
+    db_session.commit()
+
+    with patch("backend.ai.tasks.database.SessionLocal", return_value=db_session):
+        # Below the block size nothing is folded yet
+        with patch("backend.ai.tasks.ROLLING_SUMMARY_BLOCK_TOKENS", 10_000):
+            update_rolling_summary_task(meeting_id=60)
+        assert mock_instance.fold_summary.call_count == 0
+
+        # During the meeting: the first six lines are folded in the background
+        with patch("backend.ai.tasks.ROLLING_SUMMARY_BLOCK_TOKENS", 10):
+            assert update_rolling_summary_task(meeting_id=60) == "Success"
+
+        db_session.add_all([models.Transcript(meeting_id=60, speaker="B", text="Final words") for _ in range(2)])
+        db_session.commit()
+
+        # At the end only the two new lines are summarized
+        assert generate_specification_task(meeting_id=60, project_id=10) == "Success"
+
+    assert [c.args[0] for c in mock_instance.fold_summary.call_args_list] == ["", "[6 lines]"]
+    mock_instance.generate_specification.assert_called_once_with("[6 lines][2 lines]", custom_prompt=None)
+    state = db_session.get(models.MeetingSummary, 60)
+    assert state.last_transcript_id == db_session.query(models.Transcript).order_by(models.Transcript.id.desc()).first().id
+
+def test_failed_fold_keeps_block_for_next_time(db_session, mock_llm_client):
+    mock_instance = mock_llm_client.return_value
+    mock_instance.fold_summary.side_effect = RuntimeError("rate limited")
+    db_session.add(models.Transcript(meeting_id=61, speaker="A", text="We need exports"))
+    db_session.commit()
+
+    with patch("backend.ai.tasks.database.SessionLocal", return_value=db_session), \
+         patch("backend.ai.tasks.ROLLING_SUMMARY_BLOCK_TOKENS", 0):
+        assert update_rolling_summary_task(meeting_id=61) == "Failed"
+
+    assert db_session.get(models.MeetingSummary, 61) is None
+
+def test_duplicate_spec_jobs_coalesce_and_identical_input_is_skipped(db_session, mock_llm_client):
+    fakeredis = pytest.importorskip("fakeredis")
+    from backend.ai.spec_jobs import submit_specification_job
+
+    redis_client = fakeredis.FakeRedis()
+    mock_llm_client.return_value.fold_summary.return_value = "Summary"
+    mock_llm_client.return_value.generate_specification.return_value = "# Spec"
+    db_session.add(models.Project(id=10, name="Coalesce", owner_id=1))
+    meeting = models.Meeting(project_id=10, meeting_url="http://test")
+    db_session.add(meeting)
+    db_session.commit()
+    meeting_id = meeting.id
+    db_session.add(models.Transcript(meeting_id=meeting_id, speaker="A", text="We need exports"))
+    db_session.commit()
+
+    task = MagicMock()
+    first = submit_specification_job(redis_client, db_session, meeting, task)
+    second = submit_specification_job(redis_client, db_session, meeting, task)
+    assert first["status"] == "queued"
+    assert second == {"status": "attached", "job_id": first["job_id"]}
+    task.apply_async.assert_called_once()
+
+    # The worker runs the one job and releases its lease
+    job = task.apply_async.call_args
+    generate_specification_task.push_request(id=job.kwargs["task_id"])
+    try:
+        with patch("backend.ai.tasks.database.SessionLocal", return_value=db_session), \
+             patch("backend.ai.tasks.redis.from_url", return_value=redis_client), \
+             patch.object(generate_specification_task, "update_state") as update_state, \
+             patch("backend.ai.spec_jobs.publish_meeting_update") as publish:
+            assert generate_specification_task(*job.kwargs["args"], **job.kwargs["kwargs"]) == "Success"
+            stages = [c.kwargs["meta"]["stage"] for c in update_state.call_args_list]
+            assert stages == ["summarizing", "generating", "saving"]
+            assert [c.args[1]["stage"] for c in publish.call_args_list] == stages + ["done"]
+            assert publish.call_args.args[1]["job_id"] == job.kwargs["task_id"]
+            # Same transcript again: nothing to do, even if a stale job slips through
+            assert generate_specification_task(*job.kwargs["args"], **job.kwargs["kwargs"]) == "Up to date"
+    finally:
+        generate_specification_task.pop_request()
+
+    assert redis_client.keys("spec_job:*") == []
+    assert db_session.query(models.Specification).filter_by(meeting_id=meeting_id).count() == 1
+    meeting = db_session.get(models.Meeting, meeting_id)
+    assert submit_specification_job(redis_client, db_session, meeting, task)["status"] == "up_to_date"
+    # A rebuild is queued anyway (e.g. after the prompt changed), as its own job
+    rebuild = submit_specification_job(redis_client, db_session, meeting, task, full=True)
+    assert rebuild["status"] == "queued"
+    assert submit_specification_job(redis_client, db_session, meeting, task, full=True) == \
+        {"status": "attached", "job_id": rebuild["job_id"]}
+    assert redis_client.keys("spec_job:*")[0].decode().endswith(":full")
+    with patch("backend.ai.tasks.database.SessionLocal", return_value=db_session):
+        assert generate_specification_task(meeting_id, 10, full=True) == "Success"
+    assert db_session.query(models.Specification).filter_by(meeting_id=meeting_id).count() == 2
+    meeting = db_session.get(models.Meeting, meeting_id)
+
+    # New speech means a new transcript hash and a new job
+    db_session.add(models.Transcript(meeting_id=meeting_id, speaker="B", text="And imports"))
+    db_session.commit()
+    assert submit_specification_job(redis_client, db_session, meeting, task)["status"] == "queued"
+    assert task.apply_async.call_count == 3
+
+def test_regeneration_revises_latest_version_with_new_transcript_only(db_session, mock_llm_client):
+    mock_instance = mock_llm_client.return_value
+    mock_instance.fold_summary.return_value = "Summary"
+    mock_instance.generate_specification.return_value = "# Spec v1"
+    mock_instance.revise_specification.return_value = "# Spec v2"
+    db_session.add_all([models.Transcript(meeting_id=70, speaker="A", text=f"Requirement {i}") for i in range(50)])
+    db_session.commit()
+
+    with patch("backend.ai.tasks.database.SessionLocal", return_value=db_session):
+        assert generate_specification_task(meeting_id=70, project_id=10) == "Success"
+        db_session.add(models.Transcript(meeting_id=70, speaker="B", text="Also add SSO"))
+        db_session.commit()
+        assert generate_specification_task(meeting_id=70, project_id=10) == "Success"
+
+        # Only the new line is sent, together with the previous version
+        mock_instance.revise_specification.assert_called_once_with("# Spec v1", "B: Also add SSO", custom_prompt=None)
+        assert mock_instance.generate_specification.call_count == 1
+
+        db_session.add(models.Transcript(meeting_id=70, speaker="C", text="Drop the mobile app"))
+        db_session.commit()
+        assert generate_specification_task(meeting_id=70, project_id=10, full=True) == "Success"
+        assert mock_instance.generate_specification.call_count == 2
+
+    specs = db_session.query(models.Specification).filter_by(meeting_id=70).order_by(models.Specification.id).all()
+    assert [s.version for s in specs] == ["1", "2", "3"]
+    assert [s.source.parent_id for s in specs] == [None, specs[0].id, specs[1].id]
+    assert specs[1].content == "# Spec v2"
+
+def test_failed_revision_keeps_current_version(db_session, mock_llm_client):
+    mock_instance = mock_llm_client.return_value
+    mock_instance.fold_summary.return_value = "Summary"
+    mock_instance.generate_specification.return_value = "# Spec v1"
+    mock_instance.revise_specification.side_effect = RuntimeError("rate limited")
+    db_session.add(models.Transcript(meeting_id=71, speaker="A", text="Build exports"))
+    db_session.commit()
+
+    with patch("backend.ai.tasks.database.SessionLocal", return_value=db_session):
+        generate_specification_task(meeting_id=71, project_id=10)
+        db_session.add(models.Transcript(meeting_id=71, speaker="A", text="And imports"))
+        db_session.commit()
+        # The job fails (reported as such) rather than succeeding with nothing saved
+        generate_specification_task.push_request(id="job-71")
+        try:
+            with patch("backend.ai.tasks.spec_jobs.report_finished") as report_finished, \
+                 patch.object(generate_specification_task, "update_state"), \
+                 pytest.raises(RuntimeError):
+                generate_specification_task(meeting_id=71, project_id=10)
+        finally:
+            generate_specification_task.pop_request()
+    assert report_finished.call_args.kwargs["error"] == "rate limited"
+
+    assert db_session.query(models.Specification).filter_by(meeting_id=71).count() == 1
+
+def test_job_status_endpoint_reports_stage_and_checks_owner(client, db_session, test_user):
+    fakeredis = pytest.importorskip("fakeredis")
+    from backend.ai.spec_jobs import job_key
+
+    redis_client = fakeredis.FakeRedis()
+    project = models.Project(name="Jobs", owner_id=test_user.id)
+    db_session.add(project)
+    db_session.commit()
+    meeting = models.Meeting(project_id=project.id, meeting_url="http://test")
+    db_session.add(meeting)
+    db_session.commit()
+    redis_client.set(job_key("job-1"), meeting.id)
+    redis_client.set(job_key("job-2"), 12345)
+
+    running = MagicMock(id="job-1", state="PROGRESS", info={"stage": "generating", "meeting_id": meeting.id})
+    with patch("backend.api.main.redis.from_url", return_value=redis_client), \
+         patch("backend.api.main.celery_app.AsyncResult", return_value=running):
+        response = client.get("/jobs/job-1")
+        assert response.status_code == 200
+        assert response.json() == {"job_id": "job-1", "meeting_id": meeting.id, "state": "PROGRESS",
+                                   "stage": "generating", "result": None, "error": None}
+
+        running.state, running.result = "SUCCESS", "Success"
+        assert client.get("/jobs/job-1").json()["stage"] == "done"
+        assert client.get("/jobs/job-2").status_code == 403
+        assert client.get("/jobs/unknown").status_code == 404
+
+def test_spec_jobs_are_prioritized_and_rate_limited_per_user(db_session):
+    fakeredis = pytest.importorskip("fakeredis")
+    from backend.ai.spec_jobs import submit_specification_job
+    from backend.celery_app import SPEC_FULL_PRIORITY, SPEC_REVISION_PRIORITY
+
+    redis_client = fakeredis.FakeRedis()
+    db_session.add(models.Project(id=11, name="Limits", owner_id=7))
+    meeting = models.Meeting(project_id=11, meeting_url="http://test")
+    db_session.add(meeting)
+    db_session.commit()
+    db_session.add(models.Transcript(meeting_id=meeting.id, speaker="A", text="We need exports"))
+    db_session.commit()
+
+    task = MagicMock()
+    with patch("backend.ai.spec_jobs.SPEC_JOBS_PER_USER_PER_HOUR", 2):
+        assert submit_specification_job(redis_client, db_session, meeting, task)["status"] == "queued"
+        # Nothing generated yet, so this is a full build
+        assert task.apply_async.call_args.kwargs["priority"] == SPEC_FULL_PRIORITY
+        # Attaching costs nothing
+        assert submit_specification_job(redis_client, db_session, meeting, task)["status"] == "attached"
+
+        with patch("backend.ai.spec_jobs.latest_source_hash", return_value="older"):
+            db_session.add(models.Transcript(meeting_id=meeting.id, speaker="B", text="And imports"))
+            db_session.commit()
+            assert submit_specification_job(redis_client, db_session, meeting, task)["status"] == "queued"
+            assert task.apply_async.call_args.kwargs["priority"] == SPEC_REVISION_PRIORITY
+
+            db_session.add(models.Transcript(meeting_id=meeting.id, speaker="C", text="And audit logs"))
+            db_session.commit()
+            limited = submit_specification_job(redis_client, db_session, meeting, task)
+    assert limited["status"] == "rate_limited" and limited["retry_after"] > 0
+    assert task.apply_async.call_count == 2
+    # The refused job leaves no lease behind to attach to
+    assert len(redis_client.keys("spec_job:*")) == 2
+
+    # Neither does a job the broker never accepted
+    task.apply_async.side_effect = ConnectionError("broker down")
+    with patch("backend.ai.spec_jobs.SPEC_JOBS_PER_USER_PER_HOUR", 0), pytest.raises(ConnectionError):
+        submit_specification_job(redis_client, db_session, meeting, task)
+    assert len(redis_client.keys("spec_job:*")) == 2
+    task.apply_async.side_effect = None
+    assert submit_specification_job(redis_client, db_session, meeting, task)["status"] == "queued"
+
+def test_no_database_transaction_is_held_during_llm_calls(db_session, mock_llm_client):
+    # Under the gevent pool dozens of jobs share one connection pool while they wait on the LLM
+    held = []
+
+    def llm_call(result):
+        def call(*args, **kwargs):
+            held.append(db_session.in_transaction())
+            return result
+        return call
+
+    mock_instance = mock_llm_client.return_value
+    mock_instance.fold_summary.side_effect = llm_call("Summary")
+    mock_instance.generate_specification.side_effect = llm_call("# Spec v1")
+    mock_instance.revise_specification.side_effect = llm_call("# Spec v2")
+    db_session.add(models.Transcript(meeting_id=72, speaker="A", text="Build exports"))
+    db_session.commit()
+
+    with patch("backend.ai.tasks.database.SessionLocal", return_value=db_session):
+        assert generate_specification_task(meeting_id=72, project_id=10) == "Success"
+        db_session.add(models.Transcript(meeting_id=72, speaker="A", text="And imports"))
+        db_session.commit()
+        assert generate_specification_task(meeting_id=72, project_id=10) == "Success"
+
+    assert held == [False, False, False]
+
+def test_legacy_queue_path_saves_a_revisable_version(db_session):
+    from backend.ai.main import process_meeting
+    from backend.common import spec_history
+
+    db_session.add(models.Transcript(meeting_id=73, speaker="A", text="Build exports"))
+    db_session.commit()
+    llm = MagicMock()
+    llm.summarize_meeting.return_value = "Summary"
+    llm.generate_specification.return_value = "# Spec"
+
+    with patch("backend.ai.main.database.SessionLocal", return_value=db_session), \
+         patch("backend.ai.main.get_setting_value", return_value=None):
+        process_meeting(73, 10, llm)
+
+    spec = db_session.query(models.Specification).filter_by(meeting_id=73).one()
+    assert spec.version == "1"
+    assert spec.source.document_offset == len("A: Build exports\n")
+    assert spec.source.transcript_hash is not None
+    assert spec_history.head(db_session, 73).specification_id == spec.id
+
+def test_end_meeting_reports_the_real_job_status(client, db_session, test_user):
+    project = models.Project(name="End", owner_id=test_user.id)
+    db_session.add(project)
+    db_session.commit()
+    meeting = models.Meeting(project_id=project.id, meeting_url="http://test")
+    db_session.add(meeting)
+    db_session.commit()
+    url = f"/meetings/{meeting.id}/end"
+
+    with patch("backend.api.main.redis.from_url"), \
+         patch("backend.api.main.submit_specification_job") as submit:
+        submit.return_value = {"status": "no_transcripts", "job_id": None}
+        body = client.post(url).json()
+        assert body["job_status"] == "no_transcripts"
+        assert body["message"] == "Meeting ended, bot stopped. No transcripts to generate a specification from"
+
+        submit.return_value = {"status": "queued", "job_id": "job-9"}
+        assert client.post(url).json()["message"].endswith("Specification generation started")
+
+        submit.return_value = {"status": "rate_limited", "job_id": None, "retry_after": 120}
+        response = client.post(url)
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "120"
+        assert response.json()["detail"].startswith("Meeting ended, bot stopped.")
+    assert db_session.get(models.Meeting, meeting.id).ended_at is not None
+
+def test_spec_job_time_limits_under_the_gevent_pool(db_session, mock_llm_client):
+    gevent = pytest.importorskip("gevent")
+    from celery.concurrency.gevent import apply_timeout
+    from celery.exceptions import SoftTimeLimitExceeded
+
+    db_session.add(models.Transcript(meeting_id=73, speaker="PM", text="We need exports."))
+    db_session.commit()
+    mock_instance = mock_llm_client.return_value
+    mock_instance.fold_summary.return_value = "Summary"
+    # An LLM call that outlasts both limits, yielding like a patched socket would
+    mock_instance.generate_specification.side_effect = lambda *a, **kw: gevent.sleep(5)
+
+    def run(hard_limit, timeout_callback):
+        # How the gevent pool runs a task: it passes time_limit on, and drops soft_time_limit
+        return apply_timeout(generate_specification_task, (73, 10), callback=MagicMock(),
+                             getpid=lambda: 1, timeout=hard_limit, timeout_callback=timeout_callback)
+
+    generate_specification_task.push_request(id="job-73")
+    try:
+        with patch("backend.ai.tasks.database.SessionLocal", return_value=db_session), \
+             patch.object(generate_specification_task, "update_state"), \
+             patch("backend.ai.tasks.spec_jobs.report_finished") as report_finished:
+            # The task raises its own soft limit and reports the failure
+            with patch("backend.ai.tasks.gevent_pool", return_value=True), \
+                 patch("backend.ai.tasks.SPEC_SOFT_TIME_LIMIT", 0.05):
+                with pytest.raises(SoftTimeLimitExceeded):
+                    run(1, MagicMock())
+            report_finished.assert_called_once()
+            assert "Timed out" in report_finished.call_args.kwargs["error"]
+
+            # The hard limit (gevent.Timeout, a BaseException) is reported too
+            report_finished.reset_mock()
+            timed_out = MagicMock()
+            with patch("backend.ai.tasks.gevent_pool", return_value=False):
+                run(0.05, timed_out)
+            timed_out.assert_called_once()
+            report_finished.assert_called_once()
+            assert "Timeout" in report_finished.call_args.kwargs["error"]
+    finally:
+        generate_specification_task.pop_request()
+    assert db_session.query(models.Specification).filter_by(meeting_id=73).count() == 0
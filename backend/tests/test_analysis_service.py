@@ -0,0 +1,252 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from backend.ai.analysis_service import AnalysisService, SilenceScheduler, SILENCE_THRESHOLD
+
+def streaming(*sentences, gate=None):
+    """Fake LLMClient.astream_clarifying_question yielding `sentences`, optionally after `gate` opens."""
+    async def stream(context, prompt):
+        stream.calls.append(context)
+        if gate:
+            await gate.wait()
+        for sentence in sentences:
+            yield sentence
+    stream.calls = []
+    return stream
+
+def spoken(service):
+    """(meeting_id, text) of every sentence sent to TTS; final markers are skipped."""
+    msgs = [json.loads(c[0][1]) for c in service.redis_client.rpush.call_args_list]
+    return [(m["meeting_id"], m["text"]) for m in msgs if m.get("text")]
+
+def make_service(llm=None, **kwargs):
+    from backend.ai.prefilter import QuestionPrefilter
+
+    llm = llm or MagicMock()
+    # Let everything through unless a test is about the prefilter
+    kwargs.setdefault("prefilter", QuestionPrefilter(threshold=0.0, audit_rate=0.0))
+    return AnalysisService(AsyncMock(), llm, **kwargs)
+
+def test_scheduler_skips_rescheduled_entries():
+    scheduler = SilenceScheduler()
+    scheduler.schedule(1, 10.0)
+    scheduler.schedule(2, 11.0)
+    # Meeting 1 keeps talking: its old deadline must not fire
+    scheduler.schedule(1, 15.0)
+
+    assert scheduler.next_deadline() == 11.0
+    assert scheduler.pop_due(12.0) == [2]
+    assert scheduler.pop_due(14.0) == []
+    assert scheduler.pop_due(15.0) == [1]
+    assert scheduler.next_deadline() is None
+
+@pytest.mark.asyncio
+async def test_sessions_are_isolated_per_meeting():
+    llm = MagicMock()
+    llm.astream_clarifying_question = streaming("Which database should we use?")
+    service = make_service(llm)
+
+    service.handle_message({"meeting_id": 1, "speaker": "A", "text": "We need a login page."}, now=0.0)
+    service.handle_message({"meeting_id": 2, "speaker": "B", "text": "Budget is fixed."}, now=2.0)
+
+    with patch("backend.ai.analysis_service.aget_setting_value", new=AsyncMock(return_value="prompt")):
+        # Meeting 2's speech must not push back meeting 1's silence deadline
+        service.run_due(SILENCE_THRESHOLD + 0.1)
+        await service.drain()
+
+    # Meeting 2 may have started speculating, but only meeting 1 has passed its threshold
+    assert llm.astream_clarifying_question.calls[0] == "A: We need a login page."
+    assert spoken(service) == [(1, "Which database should we use?")]
+    assert json.loads(service.redis_client.rpush.call_args[0][1]) == {"meeting_id": 1, "final": True}
+    assert 2 in service.sessions and 1 not in service.sessions
+    assert service.next_timeout(SILENCE_THRESHOLD + 0.1) > 0
+
+def test_clear_signal_cancels_pending_analysis():
+    service = make_service()
+    service.handle_message({"meeting_id": 1, "speaker": "A", "text": "Hello"}, now=0.0)
+    service.handle_message({"meeting_id": 1, "speaker": "System", "text": "CLEAR_BUFFER_SIGNAL"}, now=0.5)
+
+    service.run_due(10.0)
+
+    assert service.inflight == {}
+    # Nothing scheduled: the queue read can block indefinitely
+    assert service.next_timeout(10.0) == 0
+
+@pytest.mark.asyncio
+async def test_stale_answer_is_dropped_and_calls_are_bounded():
+    release = asyncio.Event()
+    running = 0
+    peak = 0
+
+    async def slow_question(context, prompt):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await release.wait()
+        running -= 1
+        yield "What is the deadline?"
+
+    llm = MagicMock()
+    llm.astream_clarifying_question = slow_question
+    service = make_service(llm, max_concurrency=2)
+
+    with patch("backend.ai.analysis_service.aget_setting_value", new=AsyncMock(return_value="prompt")):
+        for meeting_id in (1, 2, 3):
+            service.handle_message({"meeting_id": meeting_id, "speaker": "A", "text": "Ship it"}, now=0.0)
+        service.run_due(SILENCE_THRESHOLD)
+        await asyncio.sleep(0)
+
+        # Meeting 1 keeps talking while its question is being generated
+        service.handle_message({"meeting_id": 1, "speaker": "A", "text": "Actually, wait"}, now=3.5)
+        release.set()
+        await service.drain()
+
+    assert peak == 2
+    assert sorted(meeting_id for meeting_id, _ in spoken(service)) == [2, 3]
+
+def test_prefilter_scores_questions_without_latin_words():
+    from backend.ai.prefilter import QuestionPrefilter
+
+    prefilter = QuestionPrefilter(threshold=0.4, audit_rate=0.0)
+    for context in ("Speaker 1: ?", "Speaker 2: Что?"):
+        assert 0.0 < prefilter.score(context) < 1.0
+
+@pytest.mark.asyncio
+async def test_prefilter_skips_small_talk():
+    from backend.ai.prefilter import QuestionPrefilter
+
+    llm = MagicMock()
+    llm.astream_clarifying_question = streaming()
+    prefilter = QuestionPrefilter(threshold=0.4, audit_rate=0.0)
+    service = make_service(llm, prefilter=prefilter)
+
+    service.handle_message({"meeting_id": 1, "speaker": "A", "text": "Yeah okay, thanks, bye!"}, now=0.0)
+    service.handle_message({"meeting_id": 2, "speaker": "B", "text": "Maybe we need an API, not sure about the deadline."}, now=0.0)
+    with patch("backend.ai.analysis_service.aget_setting_value", new=AsyncMock(return_value="prompt")):
+        service.run_due(SILENCE_THRESHOLD)
+        await service.drain()
+
+    assert len(llm.astream_clarifying_question.calls) == 1
+    stats = prefilter.stats()
+    assert stats["evaluated"] == 2
+    assert stats["skip_rate"] == 0.5
+    assert stats["llm_calls"] == 1 and stats["hit_rate"] == 0.0
+
+def test_context_window_respects_token_budget():
+    from backend.ai.context_window import ContextWindow
+
+    window = ContextWindow(token_budget=50, summary_budget=20)
+    for i in range(20):
+        window.append(f"Speaker {i % 2}: point number {i} about the login flow")
+
+    assert window._tokens <= 50
+    assert window._summary_tokens <= 20
+    # Incremental counts always match a full recount
+    assert window._tokens == sum(t for _, t in window._lines)
+    rendered = window.render()
+    assert rendered.startswith("[Earlier in the meeting] ")
+    assert rendered.endswith("Speaker 1: point number 19 about the login flow")
+
+    # One huge monologue is trimmed to the budget but keeps its speaker
+    window.append("Speaker 0: " + "blah " * 500 + "final words")
+    assert len(window) == 1
+    assert window._tokens <= 50
+    assert window.render().splitlines()[-1].startswith("Speaker 0: …")
+    assert window.render().endswith("final words")
+
+@pytest.mark.asyncio
+async def test_speculative_answer_released_at_threshold_or_discarded():
+    from backend.ai.analysis_service import SPECULATION_DELAY
+
+    llm = MagicMock()
+    llm.astream_clarifying_question = streaming("Who owns the rollout?")
+    service = make_service(llm)
+
+    with patch("backend.ai.analysis_service.aget_setting_value", new=AsyncMock(return_value="prompt")):
+        # Pause starts: speculation runs, but nothing is spoken before the threshold
+        service.handle_message({"meeting_id": 1, "speaker": "A", "text": "We will roll it out."}, now=0.0)
+        service.run_due(SPECULATION_DELAY)
+        await service.drain()
+        assert len(llm.astream_clarifying_question.calls) == 1
+        service.redis_client.rpush.assert_not_awaited()
+
+        # Threshold passes: the ready answer is released without a second LLM call
+        service.run_due(SILENCE_THRESHOLD)
+        await service.drain()
+        assert len(llm.astream_clarifying_question.calls) == 1
+        assert spoken(service) == [(1, "Who owns the rollout?")]
+
+        # Speech resumes mid-pause: the speculative call is cancelled and never spoken
+        llm.astream_clarifying_question = streaming("Should never be spoken?", gate=asyncio.Event())
+        service.handle_message({"meeting_id": 1, "speaker": "A", "text": "Next topic."}, now=10.0)
+        service.run_due(10.0 + SPECULATION_DELAY)
+        await asyncio.sleep(0)
+        task, _, _ = service.inflight[1]
+        service.handle_message({"meeting_id": 1, "speaker": "B", "text": "Go on."}, now=11.0)
+        await asyncio.sleep(0)
+        assert task.cancelled()
+        assert len(spoken(service)) == 1
+
+def test_sentence_splitter_cuts_streamed_tokens():
+    from backend.ai.sentence_splitter import SentenceSplitter
+
+    splitter = SentenceSplitter()
+    tokens = ["Should", " the", " limit be 3", ".5 GB", "? Or", " is that", " too low", "?", " Ok.", " Thanks"]
+    sentences = [s for token in tokens for s in splitter.feed(token)]
+
+    # Decimal points never split; "Ok." is too short to stand alone and rides with the next sentence
+    assert sentences == ["Should the limit be 3.5 GB?", "Or is that too low?"]
+    assert splitter.flush() == ["Ok. Thanks"]
+    assert splitter.flush() == []
+
+@pytest.mark.asyncio
+async def test_first_sentence_is_spoken_before_generation_finishes():
+    gate = asyncio.Event()
+
+    async def two_sentences(context, prompt):
+        yield "Which region do we deploy to?"
+        await gate.wait()
+        yield "And who approves the budget?"
+
+    llm = MagicMock()
+    llm.astream_clarifying_question = two_sentences
+    service = make_service(llm)
+
+    with patch("backend.ai.analysis_service.aget_setting_value", new=AsyncMock(return_value="prompt")):
+        service.handle_message({"meeting_id": 1, "speaker": "A", "text": "We deploy next week."}, now=0.0)
+        service.run_due(SILENCE_THRESHOLD)
+        for _ in range(5):
+            await asyncio.sleep(0)
+
+        # The LLM is still generating, but the first sentence is already on its way to TTS
+        assert spoken(service) == [(1, "Which region do we deploy to?")]
+
+        gate.set()
+        await service.drain()
+
+    msgs = [json.loads(c[0][1]) for c in service.redis_client.rpush.call_args_list]
+    assert [m.get("text") for m in msgs] == ["Which region do we deploy to?", "And who approves the budget?", None]
+    assert [m["final"] for m in msgs] == [False, False, True]
+
+@pytest.mark.asyncio
+async def test_llm_client_streams_sentences():
+    from types import SimpleNamespace
+    from backend.ai.llm_client import LLMClient
+
+    def chunk(text):
+        return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+    async def completion(pieces):
+        for piece in pieces:
+            yield chunk(piece)
+
+    client = LLMClient()
+    client.async_client = MagicMock()
+
+    client.async_client.chat_completion = AsyncMock(return_value=completion(['What is the "MVP" scope', "? And the", " deadline?"]))
+    assert [s async for s in client.astream_clarifying_question("text")] == ["What is the MVP scope?", "And the deadline?"]
+    assert client.async_client.chat_completion.call_args.kwargs["stream"] is True
+
+    client.async_client.chat_completion = AsyncMock(return_value=completion(["NO_", "QUESTION"]))
+    assert [s async for s in client.astream_clarifying_question("text")] == []
@@ -0,0 +1,95 @@
+import asyncio
+import time
+import pytest
+from backend.ai.batch_scheduler import BatchScheduler, Histogram
+
+async def request(scheduler, deadline, log, hold=None):
+    async with scheduler.slot(deadline):
+        log.append(deadline)
+        if hold:
+            await hold.wait()
+
+def test_histogram_buckets_and_quantiles():
+    hist = Histogram([1, 2, 4])
+    for value in (0.5, 1, 1.5, 3, 10):
+        hist.observe(value)
+
+    assert hist.snapshot()["buckets"] == {"<=1": 2, "<=2": 1, "<=4": 1, ">4": 1}
+    assert hist.quantile(0.5) == 2
+    assert hist.quantile(1.0) == float("inf")
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_admitted_as_one_batch():
+    scheduler = BatchScheduler(max_batch=8, window=0.05)
+    later = time.time() + 60
+    log = []
+
+    tasks = [asyncio.create_task(request(scheduler, later + i, log)) for i in range(3)]
+    await asyncio.sleep(0.01)
+    # Still inside the window: nobody admitted yet
+    assert log == []
+
+    await asyncio.gather(*tasks)
+    assert scheduler.batch_size.snapshot()["buckets"]["<=3"] == 1
+    assert scheduler.queue_wait.total == 3
+    assert scheduler.inflight == 0
+
+@pytest.mark.asyncio
+async def test_freed_slots_go_to_the_earliest_deadline():
+    scheduler = BatchScheduler(max_batch=1, window=0.01)
+    now = time.time()
+    hold = asyncio.Event()
+    log = []
+
+    first = asyncio.create_task(request(scheduler, now + 60, log, hold))
+    await asyncio.sleep(0.05)
+    assert log == [now + 60]
+
+    # Queued while the server is busy, in the "wrong" order
+    waiting = [asyncio.create_task(request(scheduler, now + d, log)) for d in (90, 70, 80)]
+    await asyncio.sleep(0.02)
+    hold.set()
+    await asyncio.gather(first, *waiting)
+
+    assert log == [now + 60, now + 70, now + 80, now + 90]
+
+@pytest.mark.asyncio
+async def test_urgent_request_skips_the_window_and_cancelled_waiters_free_nothing():
+    scheduler = BatchScheduler(max_batch=2, window=10.0)
+    log = []
+
+    # Deadline already passing: admitted without waiting out the 10s window
+    await asyncio.wait_for(request(scheduler, time.time(), log), timeout=1)
+
+    waiter = asyncio.create_task(request(scheduler, time.time() + 60, log))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert scheduler.inflight == 0
+    assert scheduler.stats()["waiting"] == 0
+
+@pytest.mark.asyncio
+async def test_analysis_service_uses_batches_for_local_backend():
+    import json
+    from unittest.mock import AsyncMock, MagicMock, patch
+    from backend.ai.analysis_service import AnalysisService, SILENCE_THRESHOLD
+    from backend.ai.prefilter import QuestionPrefilter
+
+    async def question(context, prompt):
+        yield "Which region should we deploy to?"
+
+    llm = MagicMock()
+    llm.astream_clarifying_question = question
+    scheduler = BatchScheduler(max_batch=4, window=0.01)
+    service = AnalysisService(AsyncMock(), llm, prefilter=QuestionPrefilter(threshold=0.0, audit_rate=0.0), batcher=scheduler)
+
+    with patch("backend.ai.analysis_service.aget_setting_value", new=AsyncMock(return_value="prompt")):
+        for meeting_id in (1, 2, 3):
+            service.handle_message({"meeting_id": meeting_id, "speaker": "A", "text": "We deploy soon."}, now=0.0)
+        service.run_due(SILENCE_THRESHOLD)
+        await service.drain()
+
+    msgs = [json.loads(c[0][1]) for c in service.redis_client.rpush.call_args_list]
+    assert sorted(m["meeting_id"] for m in msgs if m.get("text")) == [1, 2, 3]
+    assert scheduler.batch_size.snapshot()["buckets"]["<=3"] == 1
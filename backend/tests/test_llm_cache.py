@@ -0,0 +1,103 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from backend.ai.llm_cache import LLMResponseCache, LRU_KEY
+from backend.ai.llm_client import LLMClient
+
+fakeredis = pytest.importorskip("fakeredis")
+
+def completion(text):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+def make_client(**cache_kwargs):
+    cache = LLMResponseCache(redis_client=fakeredis.FakeRedis(), **cache_kwargs)
+    client = LLMClient(cache=cache)
+    client.client = MagicMock()
+    client.client.chat_completion.return_value = completion('{"tasks": []}')
+    return client, cache
+
+def test_identical_requests_hit_the_cache():
+    client, cache = make_client()
+
+    assert client.extract_tasks("Spec v1") == '{"tasks": []}'
+    assert client.extract_tasks("Spec v1") == '{"tasks": []}'
+    assert client.client.chat_completion.call_count == 1
+
+    # A different input, or the same input for another method, is a different entry
+    client.extract_tasks("Spec v2")
+    client.summarize_meeting("Spec v1")
+    assert client.client.chat_completion.call_count == 3
+
+    stats = cache.stats()
+    assert stats["extract_tasks"] == {"hits": 1, "misses": 2, "hit_rate": 1 / 3}
+    assert stats["summarize_meeting"]["misses"] == 1
+
+def test_key_covers_model_and_params():
+    messages = [{"role": "user", "content": "hi"}]
+    key = LLMResponseCache.key("model-a", messages, {"max_tokens": 10})
+
+    assert key == LLMResponseCache.key("model-a", [dict(m) for m in messages], {"max_tokens": 10})
+    assert key != LLMResponseCache.key("model-b", messages, {"max_tokens": 10})
+    assert key != LLMResponseCache.key("model-a", messages, {"max_tokens": 20})
+
+def test_cache_evicts_least_recently_used():
+    client, cache = make_client(max_entries=2)
+
+    client.extract_tasks("a")
+    client.extract_tasks("b")
+    client.extract_tasks("a")   # touch: "b" is now the oldest
+    client.extract_tasks("c")   # evicts "b"
+    assert cache.redis.zcard(LRU_KEY) == 2
+
+    calls = client.client.chat_completion.call_count
+    client.extract_tasks("a")
+    assert client.client.chat_completion.call_count == calls
+    client.extract_tasks("b")
+    assert client.client.chat_completion.call_count == calls + 1
+
+def test_refresh_replaces_the_cached_answer():
+    client, cache = make_client()
+    assert client.extract_tasks("Spec") == '{"tasks": []}'
+
+    client.client.chat_completion.return_value = completion('{"tasks": [{"title": "Login"}]}')
+    assert client.extract_tasks("Spec", use_cache=False) == '{"tasks": [{"title": "Login"}]}'
+    assert client.client.chat_completion.call_count == 2
+
+    # The next normal load gets the refreshed answer, from the cache
+    assert client.extract_tasks("Spec") == '{"tasks": [{"title": "Login"}]}'
+    assert client.client.chat_completion.call_count == 2
+    assert cache.redis.zcard(LRU_KEY) == 1
+
+def test_hits_extend_the_entry_ttl():
+    client, cache = make_client(ttl=100)
+    client.extract_tasks("Spec")
+    key = cache.redis.zrange(LRU_KEY, 0, -1)[0]
+
+    cache.redis.expire(key, 5)
+    client.extract_tasks("Spec")
+    assert cache.redis.ttl(key) > 5
+
+def test_errors_and_opt_out_bypass_the_cache():
+    client, _ = make_client()
+
+    # Failed calls return the fallback and are not cached
+    client.client.chat_completion.side_effect = RuntimeError("rate limited")
+    assert client.summarize_meeting("Transcript") == "Error generating summary."
+    client.client.chat_completion.side_effect = None
+    client.client.chat_completion.return_value = completion("- summary")
+    assert client.summarize_meeting("Transcript") == "- summary"
+
+    disabled, _ = make_client(enabled=False)
+    disabled.extract_tasks("Spec")
+    disabled.extract_tasks("Spec")
+    assert disabled.client.chat_completion.call_count == 2
+
+def test_unreachable_redis_is_a_miss():
+    broken = MagicMock()
+    broken.get.side_effect = ConnectionError("down")
+    broken.pipeline.side_effect = ConnectionError("down")
+    client = LLMClient(cache=LLMResponseCache(redis_client=broken))
+    client.client = MagicMock()
+    client.client.chat_completion.return_value = completion("# Spec")
+
+    assert client.generate_specification("summary") == "# Spec"
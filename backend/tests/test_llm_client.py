@@ -0,0 +1,163 @@
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from backend.ai import llm_client as llm_module
+from backend.ai.llm_client import LLMClient, get_llm_client, retry_delay
+from backend.ai.llm_metrics import LLMMetrics
+
+class HTTPError(Exception):
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.response = SimpleNamespace(status_code=status, headers=headers or {})
+
+def completion(text, prompt_tokens=12, completion_tokens=5):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=text))],
+        usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens),
+    )
+
+def make_client():
+    cache = MagicMock()
+    cache.get.return_value = None
+    client = LLMClient(cache=cache, metrics=LLMMetrics())
+    client.client = MagicMock()
+    client.async_client = MagicMock()
+    return client
+
+def test_retry_delay_only_for_rate_limits_and_server_errors():
+    assert retry_delay(HTTPError(400), 0) is None
+    assert retry_delay(ValueError("bad json"), 0) is None
+    assert retry_delay(HTTPError(503), llm_module.LLM_MAX_RETRIES) is None
+    assert retry_delay(HTTPError(429, {"Retry-After": "2"}), 0) == 2.0
+
+    # Full jitter: anywhere between 0 and the exponential cap
+    delays = [retry_delay(HTTPError(502), 2) for _ in range(50)]
+    assert all(0 <= d <= min(llm_module.LLM_BACKOFF_MAX, llm_module.LLM_BACKOFF_BASE * 4) for d in delays)
+    assert len(set(delays)) > 1
+
+def test_transient_errors_are_retried_and_counted():
+    client = make_client()
+    client.client.chat_completion.side_effect = [HTTPError(429), HTTPError(503), completion("# Spec")]
+
+    with patch("backend.ai.llm_client.time.sleep") as sleep:
+        assert client.generate_specification("summary") == "# Spec"
+
+    assert sleep.call_count == 2
+    stats = client.metrics.stats()["generate_specification"]
+    assert stats["calls"] == 1 and stats["errors"] == 0 and stats["retries"] == 2
+    assert stats["prompt_tokens"] == 12 and stats["completion_tokens"] == 5
+
+    # Client errors fail fast, are counted, and still fall back to the old placeholder
+    client.client.chat_completion.side_effect = HTTPError(400)
+    with patch("backend.ai.llm_client.time.sleep") as sleep:
+        assert client.extract_tasks("spec") == '{"tasks": []}'
+    sleep.assert_not_called()
+    assert client.metrics.stats()["extract_tasks"]["errors"] == 1
+
+@pytest.mark.asyncio
+async def test_async_calls_retry_without_blocking():
+    client = make_client()
+    client.async_client.chat_completion = AsyncMock(side_effect=[HTTPError(500), completion("What is the budget?")])
+
+    with patch("backend.ai.llm_client.asyncio.sleep", new=AsyncMock()) as sleep:
+        assert await client.agenerate_clarifying_question("text") == "What is the budget?"
+
+    sleep.assert_awaited_once()
+    assert client.metrics.stats()["generate_clarifying_question"]["retries"] == 1
+
+def test_llm_client_is_shared_per_process():
+    with patch.dict("backend.ai.llm_client._shared_clients", clear=True), \
+         patch("backend.ai.llm_client.make_backend"), \
+         patch("backend.ai.llm_client.LLMClient") as factory:
+        first = get_llm_client()
+        assert get_llm_client() is first
+        assert factory.call_count == 1
+
+        # Each backend has its own instance
+        get_llm_client("local")
+        assert factory.call_count == 2
+
+        # A forked worker gets its own instances
+        with patch("backend.ai.llm_client.os.getpid", return_value=-1):
+            get_llm_client()
+        assert factory.call_count == 3
+
+@pytest.fixture
+def local_client():
+    from backend.ai.llm_client import LocalOpenAIBackend
+    from backend.ai.stub_llm_server import start_stub_server
+
+    server = start_stub_server()
+    backend = LocalOpenAIBackend(base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", model="stub-llm")
+    cache = MagicMock()
+    cache.get.return_value = None
+    yield LLMClient(cache=cache, metrics=LLMMetrics(), backend=backend)
+    server.shutdown()
+    server.server_close()
+
+@pytest.mark.asyncio
+async def test_local_backend_against_stub_server(local_client):
+    import json
+
+    tasks = json.loads(local_client.extract_tasks("# Spec\n- Build login\n- Add billing"))["tasks"]
+    assert [t["title"] for t in tasks] == ["Spec", "Build login", "Add billing"]
+    assert local_client.summarize_meeting("A: we ship on friday") == "- A: we ship on friday"
+
+    # The stub is deterministic: undecided talk gets a question, settled talk gets none
+    assert local_client.generate_clarifying_question("A: maybe postgres, not sure") != ""
+    assert local_client.generate_clarifying_question("A: we use postgres") == ""
+    assert [s async for s in local_client.astream_clarifying_question("A: maybe later")] == [
+        "Could you clarify what was decided there?", "Who owns the next step?"
+    ]
+
+    stats = local_client.metrics.stats()
+    assert stats["extract_tasks"]["prompt_tokens"] > 0
+    assert stats["stream_clarifying_question"]["completion_tokens"] > 0
+
+def test_task_stream_parser_yields_objects_as_they_close():
+    from backend.ai.json_stream import TaskStreamParser, parse_tasks
+
+    parser = TaskStreamParser()
+    text = '```json\n{"tasks": [{"title": "Login", "description": "Use {braces} and \\"quotes\\""}, {"title": 5 6}, {"title": "Billing"'
+    seen = [parser.feed(text[i:i + 7]) for i in range(0, len(text), 7)]
+    # The first task arrives mid-stream, before the rest of the output
+    first = next(i for i, tasks in enumerate(seen) if tasks)
+    assert first < len(seen) - 1
+    assert [t for tasks in seen for t in tasks] == [{"title": "Login", "description": 'Use {braces} and "quotes"'}]
+    assert parser.skipped == 1
+
+    # Truncated tail is dropped, prose around the JSON is ignored
+    assert parse_tasks('Sure! [{"title": "A"}, {"title": "B", "desc') == [{"title": "A", "description": ""}]
+
+def test_stream_tasks_against_stub_server_shares_the_extract_cache(local_client):
+    spec = "# Spec\n- Build login\n- Add billing"
+    tasks = list(local_client.stream_tasks(spec))
+    assert [t["title"] for t in tasks] == ["Spec", "Build login", "Add billing"]
+
+    # The complete stream is cached under the same key extract_tasks uses
+    key, text = local_client.cache.set.call_args[0]
+    local_client.extract_tasks(spec)
+    assert local_client.cache.key.call_args_list[0] == local_client.cache.key.call_args_list[1]
+
+    # A cache hit is replayed without calling the model
+    local_client.cache.get.return_value = text
+    assert len(list(local_client.stream_tasks(spec))) == 3
+    assert local_client.metrics.stats()["stream_tasks"]["calls"] == 1
+
+def test_stream_that_fails_to_open_is_recorded_once():
+    client = make_client()
+    client.usage = MagicMock()
+    client.client.chat_completion.side_effect = HTTPError(400)
+
+    with pytest.raises(HTTPError):
+        list(client.stream_tasks("spec"))
+
+    stats = client.metrics.stats()["stream_tasks"]
+    assert stats["calls"] == 1 and stats["errors"] == 1
+    client.usage.record.assert_called_once()
+
+def test_unknown_backend_is_rejected():
+    from backend.ai.llm_client import make_backend
+
+    with pytest.raises(ValueError):
+        make_backend("gpt-on-a-toaster")
@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+import pytest
+from sqlalchemy.orm import sessionmaker
+from backend.ai import llm_usage as usage_module
+from backend.ai.llm_client import LLMClient
+from backend.ai.llm_metrics import LLMMetrics
+from backend.ai.llm_usage import LLMUsageRecorder, attribute, rollup_llm_usage, usage_report
+from backend.ai.summarizer import MapReduceSummarizer
+from backend.common import models
+
+def make_recorder(db_session):
+    return LLMUsageRecorder(session_factory=sessionmaker(bind=db_session.get_bind()), flush_interval=60, enabled=True)
+
+def test_calls_are_attributed_buffered_and_bulk_written(db_session):
+    recorder = make_recorder(db_session)
+    cache = MagicMock()
+    cache.get.side_effect = [None, "cached summary"]
+    llm = LLMClient(cache=cache, metrics=LLMMetrics(), usage=recorder)
+    llm.client = MagicMock()
+    llm.client.chat_completion.return_value.choices = [MagicMock(message=MagicMock(content="summary"))]
+    llm.client.chat_completion.return_value.usage = MagicMock(prompt_tokens=100, completion_tokens=20)
+
+    with attribute(meeting_id=7, project_id=3):
+        llm.summarize_meeting("A: hello")
+        llm.summarize_meeting("A: hello")
+    llm.summarize_meeting("A: unattributed", use_cache=False)
+
+    # Nothing touches the database until the flush
+    assert db_session.query(models.LLMCall).count() == 0
+    assert recorder.flush() == 3
+
+    calls = db_session.query(models.LLMCall).order_by(models.LLMCall.id).all()
+    assert [(c.meeting_id, c.project_id, c.cache_hit) for c in calls] == [(7, 3, False), (7, 3, True), (None, None, False)]
+    assert (calls[0].prompt_tokens, calls[0].completion_tokens) == (100, 20)
+    # Cache hits are logged for cost accounting but don't count as LLM calls in the metrics
+    assert llm.metrics.stats()["summarize_meeting"]["calls"] == 2
+
+@pytest.mark.asyncio
+async def test_attribution_follows_asyncio_tasks_and_summarizer_threads():
+    seen = []
+
+    def complete(prompt, text, max_tokens):
+        seen.append(usage_module.current_attribution().get("meeting_id"))
+        return "partial"
+
+    async def run(meeting_id):
+        with attribute(meeting_id=meeting_id):
+            await asyncio.sleep(0)
+            MapReduceSummarizer(complete, chunk_tokens=5, max_concurrency=2).summarize(
+                "A: one two three four five six\nB: seven eight nine ten eleven twelve", "prompt"
+            )
+
+    await asyncio.gather(run(1), run(2))
+    assert len(seen) > 2
+    assert set(seen) == {1, 2}
+    assert usage_module.current_attribution() == {}
+
+def test_rollup_and_usage_endpoints(client, db_session, test_user, monkeypatch):
+    monkeypatch.setattr(usage_module, "LLM_PRICES", {"m": [1.0, 2.0]})
+    project = models.Project(name="Costs", owner_id=test_user.id)
+    db_session.add(project)
+    db_session.commit()
+    meetings = [models.Meeting(project_id=project.id, meeting_url="http://test") for _ in range(2)]
+    db_session.add_all(meetings)
+    db_session.commit()
+
+    old = datetime.now(timezone.utc) - timedelta(hours=3)
+    now = datetime.now(timezone.utc)
+    def call(meeting, created_at, latency, cache_hit=False):
+        return models.LLMCall(created_at=created_at, meeting_id=meeting.id, project_id=project.id, method="generate_specification",
+                              model="m", prompt_tokens=0 if cache_hit else 1000, completion_tokens=0 if cache_hit else 500,
+                              latency_ms=latency, cache_hit=cache_hit, error=False)
+    db_session.add_all([call(meetings[0], old, 400), call(meetings[0], old, 0, cache_hit=True), call(meetings[0], now, 800),
+                        call(meetings[1], now, 200)])
+    db_session.commit()
+
+    assert rollup_llm_usage(db_session) == 2
+    assert db_session.query(models.LLMCall).count() == 2
+    rollup = db_session.query(models.LLMUsageRollup).one()
+    assert (rollup.calls, rollup.cache_hits, rollup.latency_ms_max) == (2, 1, 400)
+
+    # Rolled-up and raw rows are reported together
+    report = client.get(f"/meetings/{meetings[0].id}/llm-usage").json()
+    assert (report["calls"], report["cache_hits"], report["prompt_tokens"]) == (3, 1, 2000)
+    assert report["latency_ms_max"] == 800
+    assert report["cost_usd"] == pytest.approx(2 * (1000 * 1.0 + 500 * 2.0) / 1_000_000)
+    assert report["by_method"]["generate_specification"]["calls"] == 3
+
+    report = client.get(f"/projects/{project.id}/llm-usage").json()
+    assert report["calls"] == 4
+    assert set(report["by_meeting"]) == {str(meetings[0].id), str(meetings[1].id)}
+    assert usage_report(db_session, [meetings[1].id])["calls"] == 1
@@ -0,0 +1,66 @@
+import threading
+import pytest
+from unittest.mock import patch
+from backend.common import models
+from backend.common.settings_cache import SettingsCache
+
+def make_cache():
+    cache = SettingsCache()
+    cache._ensure_listener = lambda: None
+    return cache
+
+def test_settings_served_from_memory_until_invalidated(db_session):
+    db_session.add(models.Setting(key="spec_prompt", value="v1"))
+    db_session.commit()
+    cache = make_cache()
+    cache._subscribed.set()
+
+    with patch("backend.common.settings_cache.database.SessionLocal", return_value=db_session) as session_factory:
+        assert cache.get("spec_prompt") == "v1"
+        assert cache.get("question_prompt", "default") == "default"
+        assert session_factory.call_count == 1
+
+        db_session.query(models.Setting).filter(models.Setting.key == "spec_prompt").first().value = "v2"
+        db_session.commit()
+        assert cache.get("spec_prompt") == "v1"
+
+        # A pub/sub invalidation triggers exactly one reload
+        cache.invalidate()
+        assert cache.get("spec_prompt") == "v2"
+        assert session_factory.call_count == 2
+
+def test_settings_not_cached_without_subscription(db_session):
+    db_session.add(models.Setting(key="spec_prompt", value="v1"))
+    db_session.commit()
+    cache = make_cache()
+
+    with patch("backend.common.settings_cache.database.SessionLocal", return_value=db_session) as session_factory:
+        cache.get("spec_prompt")
+        cache.get("spec_prompt")
+        assert session_factory.call_count == 2
+
+@pytest.mark.asyncio
+async def test_async_miss_loads_off_the_event_loop():
+    cache = make_cache()
+    cache._subscribed.set()
+    loaded_on = []
+
+    def load():
+        loaded_on.append(threading.current_thread())
+        cache._values = {"question_prompt": "Ask"}
+        return cache._values
+
+    cache._load = load
+    assert await cache.aget("question_prompt") == "Ask"
+    assert len(loaded_on) == 1 and loaded_on[0] is not threading.current_thread()
+
+    # Hits are served from memory
+    assert await cache.aget("spec_prompt", "default") == "default"
+    assert len(loaded_on) == 1
+
+def test_update_setting_publishes_invalidation(client):
+    with patch("backend.api.crud.publish_settings_changed") as publish:
+        response = client.put("/settings/spec_prompt", json={"key": "spec_prompt", "value": "New prompt"})
+
+    assert response.status_code == 200
+    publish.assert_called_once_with("spec_prompt")
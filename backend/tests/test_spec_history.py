@@ -0,0 +1,74 @@
+import json
+from unittest.mock import patch
+import pytest
+from backend.api import crud
+from backend.common import models, spec_history, text_delta
+from backend.common.spec_versions import save_version
+
+def make_meeting(db_session, test_user):
+    project = models.Project(name="History", owner_id=test_user.id)
+    db_session.add(project)
+    db_session.commit()
+    meeting = models.Meeting(project_id=project.id, meeting_url="http://test")
+    db_session.add(meeting)
+    db_session.commit()
+    return meeting
+
+def test_text_delta_round_trip_and_validation():
+    old = "# Spec\n## Overview\nA tool\n## Requirements\n- Login\n- Export\n"
+    new = "# Spec\n## Overview\nA web tool\n## Requirements\n- Login\n- Export\n- SSO\n"
+    ops = text_delta.diff(old, new)
+    assert text_delta.apply(old, ops) == new
+    assert len(json.dumps(ops)) < len(new)
+    assert text_delta.diff(old, old) == []
+    assert text_delta.apply("hello world", [6, -5, "there"]) == "hello there"
+    for bad in ([100], [-100], [0], [True], [None], "abc"):
+        with pytest.raises(ValueError):
+            text_delta.apply("short", bad)
+
+def test_history_is_snapshots_plus_deltas_and_rebuilds_every_revision(db_session, test_user):
+    meeting = make_meeting(db_session, test_user)
+    texts = ["# Spec\n- Login\n"]
+    save_version(db_session, meeting.id, meeting.project_id, texts[0])
+
+    with patch("backend.common.spec_history.SPEC_SNAPSHOT_EVERY", 3):
+        for i in range(6):
+            texts.append(texts[-1] + f"- Requirement {i}\n")
+            crud.update_specification(db_session, meeting.id, texts[-1])
+        # An edit that changes nothing adds no revision
+        crud.update_specification(db_session, meeting.id, texts[-1])
+
+    rows = db_session.query(models.SpecificationRevision).order_by(models.SpecificationRevision.revision).all()
+    assert [r.kind for r in rows] == ["snapshot", "delta", "delta", "snapshot", "delta", "delta", "snapshot"]
+    assert [r.origin for r in rows] == ["generated"] + ["edit"] * 6
+    contents = spec_history.revision_contents(db_session, meeting.id, range(1, 9))
+    assert [contents[n] for n in range(1, 8)] == texts
+    assert 8 not in contents
+
+    # A new generated version continues the same chain
+    save_version(db_session, meeting.id, meeting.project_id, texts[-1] + "- From the follow-up\n")
+    assert spec_history.head(db_session, meeting.id).revision == 8
+
+def test_legacy_spec_becomes_the_base_of_its_history(db_session, test_user):
+    meeting = make_meeting(db_session, test_user)
+    db_session.add(models.Specification(meeting_id=meeting.id, project_id=meeting.project_id, content="# Old", version="1.0.0"))
+    db_session.commit()
+
+    crud.update_specification(db_session, meeting.id, "# Old\n- edited")
+    assert spec_history.revision_content(db_session, meeting.id, 1) == "# Old"
+    assert spec_history.revision_content(db_session, meeting.id, 2) == "# Old\n- edited"
+
+def test_revision_and_diff_endpoints(client, db_session, test_user):
+    meeting = make_meeting(db_session, test_user)
+    save_version(db_session, meeting.id, meeting.project_id, "# Spec\n- Login\n")
+    response = client.put(f"/meetings/{meeting.id}/specification", json={"content": "# Spec\n- Login\n- SSO\n"})
+    assert response.status_code == 200
+
+    revisions = client.get(f"/meetings/{meeting.id}/specification/revisions").json()
+    assert [(r["revision"], r["origin"]) for r in revisions] == [(1, "generated"), (2, "edit")]
+    assert client.get(f"/meetings/{meeting.id}/specification/revisions/1").json()["content"] == "# Spec\n- Login\n"
+    assert client.get(f"/meetings/{meeting.id}/specification/revisions/9").status_code == 404
+
+    diff = client.get(f"/meetings/{meeting.id}/specification/diff", params={"from_revision": 1, "to_revision": 2}).json()["diff"]
+    assert "+- SSO" in diff
+    assert "-- Login" not in diff
@@ -0,0 +1,125 @@
+from unittest.mock import patch
+import pytest
+from backend.common import models, spec_history, text_delta
+from backend.common.spec_versions import save_version
+
+BASE = "# Spec\n## Overview\nA tool\n## Requirements\n- Login\n"
+
+def make_spec(db_session, test_user, content=BASE):
+    project = models.Project(name="Patch", owner_id=test_user.id)
+    db_session.add(project)
+    db_session.commit()
+    meeting = models.Meeting(project_id=project.id, meeting_url="http://test")
+    db_session.add(meeting)
+    db_session.commit()
+    save_version(db_session, meeting.id, project.id, content)
+    return meeting.id
+
+def test_rebase_moves_edits_past_earlier_changes_and_rejects_overlaps():
+    base = "a\nb\nc\n"
+    head = "a\nB!\nc\nd\n"
+    assert text_delta.apply(head, text_delta.rebase([4, "X"], base, head)) == "a\nB!\nXc\nd\n"
+    assert text_delta.rebase(["top\n"], base, head) == ["top\n"]
+    assert text_delta.apply(head, text_delta.rebase([6, "e\n"], base, head)) == "a\nB!\nc\nd\ne\n"
+    with pytest.raises(text_delta.Conflict):
+        text_delta.rebase([2, -1, "x"], base, head)
+    with pytest.raises(text_delta.Conflict):
+        text_delta.rebase([3, "inside"], base, head)
+
+def test_patch_applies_ops_and_publishes_them(client, db_session, test_user):
+    meeting_id = make_spec(db_session, test_user)
+    spec = client.get(f"/meetings/{meeting_id}/specification").json()
+    assert spec["revision"] == 1
+
+    ops = [len("# Spec\n## Overview\nA "), "web ", 4, -1, "!"]
+    with patch("backend.api.main.publish_meeting_update") as publish:
+        res = client.patch(f"/meetings/{meeting_id}/specification", json={"base_revision": 1, "ops": ops})
+    assert res.status_code == 200
+    assert res.json() == {"revision": 2, "base_revision": 1, "specification_id": spec["id"], "ops": ops}
+    publish.assert_called_once_with(meeting_id, {"type": "spec_patch", "meeting_id": meeting_id, **res.json()})
+
+    expected = BASE.replace("A tool\n", "A web tool!")
+    assert client.get(f"/meetings/{meeting_id}/specification").json()["content"] == expected
+    # The edit is stored as sent, not re-diffed from the whole document
+    row = spec_history.head(db_session, meeting_id)
+    assert (row.kind, row.origin) == ("delta", "edit")
+    assert spec_history.revision_content(db_session, meeting_id, 2) == expected
+
+def test_concurrent_patches_merge_or_conflict(client, db_session, test_user):
+    meeting_id = make_spec(db_session, test_user)
+    url = f"/meetings/{meeting_id}/specification"
+    with patch("backend.api.main.publish_meeting_update"):
+        login = len(BASE) - len("- Login\n")
+        assert client.patch(url, json={"base_revision": 1, "ops": [login, -8, "- Login (SSO)\n"]}).status_code == 200
+        # A second editor still on revision 1 changes another line: merged
+        second = client.patch(url, json={"base_revision": 1, "ops": [len("# Spec\n"), "Draft\n"]})
+        assert second.status_code == 200
+        assert second.json()["base_revision"] == 2
+        # A third editor on revision 1 deletes the line the first one rewrote: rejected
+        third = client.patch(url, json={"base_revision": 1, "ops": [login, -8]})
+        assert third.status_code == 409
+        assert third.json()["detail"]["revision"] == 3
+
+    assert client.get(url).json()["content"] == "# Spec\nDraft\n## Overview\nA tool\n## Requirements\n- Login (SSO)\n"
+
+def test_reading_a_legacy_spec_writes_nothing_and_it_can_still_be_patched(client, db_session, test_user):
+    meeting_id = make_spec(db_session, test_user)
+    # A spec saved before history was kept
+    db_session.query(models.SpecificationRevision).delete()
+    db_session.commit()
+
+    spec = client.get(f"/meetings/{meeting_id}/specification").json()
+    assert spec["revision"] == 0
+    assert db_session.query(models.SpecificationRevision).count() == 0
+
+    with patch("backend.api.main.publish_meeting_update"):
+        res = client.patch(f"/meetings/{meeting_id}/specification", json={"base_revision": 0, "ops": ["Draft\n"]})
+    assert res.status_code == 200
+    assert (res.json()["revision"], res.json()["base_revision"]) == (2, 1)
+    assert spec_history.revision_content(db_session, meeting_id, 1) == BASE
+    assert spec_history.revision_content(db_session, meeting_id, 2) == "Draft\n" + BASE
+
+def test_patch_rejects_bad_ops_and_revisions(client, db_session, test_user):
+    meeting_id = make_spec(db_session, test_user)
+    url = f"/meetings/{meeting_id}/specification"
+    assert client.patch(url, json={"base_revision": 1, "ops": [10_000]}).status_code == 422
+    assert client.patch(url, json={"base_revision": 1, "ops": [0]}).status_code == 422
+    assert client.patch(url, json={"base_revision": 1, "ops": [1.5]}).status_code == 422
+    assert client.patch(url, json={"base_revision": 7, "ops": ["x"]}).status_code == 422
+    # Revision 0 only exists for specs from before history was kept
+    assert client.patch(url, json={"base_revision": 0, "ops": ["x"]}).status_code == 422
+    assert client.get(url).json()["content"] == BASE
+
+def test_patch_offsets_count_code_points(client, db_session, test_user):
+    # Offsets are code points: "🚀" is one, as the editor sends them
+    meeting_id = make_spec(db_session, test_user, content="🚀 A\nrest")
+    url = f"/meetings/{meeting_id}/specification"
+    with patch("backend.api.main.publish_meeting_update"):
+        assert client.patch(url, json={"base_revision": 1, "ops": [3, "B"]}).status_code == 200
+        assert client.patch(url, json={"base_revision": 2, "ops": [9, "!"]}).status_code == 200
+    assert client.get(url).json()["content"] == "🚀 AB\nrest!"
+
+def test_patch_follows_a_version_saved_while_it_waited_for_the_lock(client, db_session, test_user):
+    meeting_id = make_spec(db_session, test_user)
+    project_id = db_session.get(models.Meeting, meeting_id).project_id
+    real_ensure_head = spec_history.ensure_head
+    generated = BASE + "- Export\n"
+
+    def ensure_head_then_generate(db, mid):
+        stale = real_ensure_head(db, mid)
+        if stale.revision == 1:
+            # A generation job saves the next version between our head read and the lock
+            save_version(db, mid, project_id, generated)
+        return stale
+
+    with patch("backend.api.crud.spec_history.ensure_head", side_effect=ensure_head_then_generate), \
+         patch("backend.api.main.publish_meeting_update"):
+        res = client.patch(f"/meetings/{meeting_id}/specification", json={"base_revision": 1, "ops": ["Draft\n"]})
+    assert res.status_code == 200
+    assert res.json()["base_revision"] == 2
+
+    specs = db_session.query(models.Specification).filter_by(meeting_id=meeting_id).order_by(models.Specification.id).all()
+    assert [s.content for s in specs] == [BASE, "Draft\n" + generated]
+    head = spec_history.head(db_session, meeting_id)
+    assert head.specification_id == specs[1].id
+    assert spec_history.revision_content(db_session, meeting_id, head.revision) == "Draft\n" + generated
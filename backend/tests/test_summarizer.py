@@ -0,0 +1,57 @@
+import threading
+import time
+from backend.ai.context_window import estimate_tokens
+from backend.ai.summarizer import CHUNK_PROMPT, MERGE_PROMPT, MapReduceSummarizer, pack, split_turns
+
+def transcript(turns: int) -> str:
+    return "\n".join(f"Speaker {i % 3}: point {i} about the billing service and its deadline" for i in range(turns))
+
+def test_pack_splits_at_turn_boundaries():
+    turns = split_turns(transcript(40) + "\ncontinued without a speaker")
+    assert len(turns) == 40
+    assert turns[-1].endswith("\ncontinued without a speaker")
+
+    chunks = pack(turns, budget=100)
+    assert all(estimate_tokens(c) <= 100 for c in chunks)
+    # Nothing lost or reordered, and every chunk starts on a turn
+    assert "\n".join(chunks) == "\n".join(turns)
+    assert all(c.startswith("Speaker ") for c in chunks)
+
+    # A monologue longer than the budget is cut between words, keeping its speaker
+    pieces = pack(["Speaker 0: " + "word " * 300], budget=50)
+    assert len(pieces) > 1
+    assert all(p.startswith("Speaker 0: ") and estimate_tokens(p) <= 50 for p in pieces)
+
+def test_short_transcript_is_one_request():
+    calls = []
+    summarizer = MapReduceSummarizer(lambda prompt, text, max_tokens: calls.append(prompt) or "- summary")
+
+    assert summarizer.summarize(transcript(3), "SYSTEM") == "- summary"
+    assert calls == ["SYSTEM"]
+
+def test_long_transcript_is_reduced_hierarchically_with_bounded_concurrency():
+    lock = threading.Lock()
+    running = peak = 0
+    calls = []
+
+    def complete(prompt, text, max_tokens):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+            calls.append(prompt)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        # Partial summaries are roughly a third of their input
+        return "- " + text[: len(text) // 3]
+
+    summarizer = MapReduceSummarizer(complete, chunk_tokens=200, max_concurrency=3)
+    result = summarizer.summarize(transcript(200), "SYSTEM")
+
+    assert result.startswith("- Part 1:")
+    assert peak <= 3
+    # Map over chunks, at least one merge level, then a single final request with the real prompt
+    assert calls.count(CHUNK_PROMPT) > 10
+    assert calls.count(MERGE_PROMPT) >= 2
+    assert calls[-1] == "SYSTEM" and calls.count("SYSTEM") == 1
@@ -30,7 +30,7 @@ def test_preview_tasks_json_parsing(client, db_session, test_user):
         ]
     })
 
-    with patch("backend.api.main.LLMClient") as MockLLM:
+    with patch("backend.api.main.get_llm_client") as MockLLM:
         mock_instance = MockLLM.return_value
         mock_instance.extract_tasks.return_value = fake_json_response
 
@@ -42,6 +42,30 @@ def test_preview_tasks_json_parsing(client, db_session, test_user):
         assert len(data) == 1
         assert data[0]["title"] == "Fix Login"
 
+def test_preview_tasks_stream_is_ndjson(client, db_session, test_user):
+    project = models.Project(name="Stream Proj", owner_id=test_user.id)
+    db_session.add(project)
+    db_session.commit()
+    meeting = models.Meeting(project_id=project.id, meeting_url="http://test")
+    db_session.add(meeting)
+    db_session.commit()
+    db_session.add(models.Specification(meeting_id=meeting.id, project_id=project.id, content="Spec Content"))
+    db_session.commit()
+
+    def tasks(spec_content, use_cache=True):
+        yield {"title": "Fix Login", "description": "Login is broken"}
+        raise RuntimeError("stream dropped")
+
+    with patch("backend.api.main.get_llm_client") as MockLLM:
+        MockLLM.return_value.stream_tasks = tasks
+        response = client.get(f"/meetings/{meeting.id}/tasks/preview/stream")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0]["title"] == "Fix Login"
+    assert "stream dropped" in lines[1]["error"]
+
 @pytest.mark.asyncio
 async def test_sync_tasks_to_github(client, db_session, test_user):
     """Test syncing tasks creates Issues via GitHub API."""
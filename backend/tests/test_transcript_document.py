@@ -0,0 +1,53 @@
+from unittest.mock import MagicMock, patch
+from backend.common import models
+from backend.common.transcript_document import append_transcript, chain_hash, format_line, load_document
+from backend.transcription.main import save_and_publish
+
+def test_save_and_publish_appends_to_the_meeting_document(db_session):
+    redis_client = MagicMock()
+    with patch("backend.transcription.main.queue_rolling_summary"):
+        save_and_publish(db_session, redis_client, 5, "speaker_a", "We need exports.")
+        save_and_publish(db_session, redis_client, 5, "speaker_b", "CSV first,\nthen Excel.")
+
+    doc = db_session.get(models.MeetingTranscript, 5)
+    assert doc.content == "Speaker A: We need exports.\nSpeaker B: CSV first, then Excel.\n"
+    assert doc.line_count == 2
+    assert doc.last_transcript_id == db_session.query(models.Transcript).order_by(models.Transcript.id.desc()).first().id
+    # The running hash is what hashing the whole text line by line gives
+    expected = None
+    for line in doc.content.splitlines(keepends=True):
+        expected = chain_hash(expected, line)
+    assert doc.content_hash == expected
+
+def test_out_of_order_commits_are_appended_not_dropped(db_session):
+    first = models.Transcript(meeting_id=6, speaker="A", text="one")
+    second = models.Transcript(meeting_id=6, speaker="B", text="two")
+    db_session.add_all([first, second])
+    db_session.flush()
+
+    # The writer holding the higher id locks the document first
+    db_session.add(models.MeetingTranscript(meeting_id=6, content=format_line("B", "two"), line_count=1,
+                                            last_transcript_id=second.id, content_hash=chain_hash(None, format_line("B", "two"))))
+    db_session.flush()
+    append_transcript(db_session, first)
+    db_session.commit()
+
+    doc = load_document(db_session, 6)
+    assert doc.content == "B: two\nA: one\n"
+    assert (doc.line_count, doc.last_transcript_id) == (2, second.id)
+
+def test_load_document_catches_up_with_transcripts_saved_around_it(db_session):
+    assert load_document(db_session, 7) is None
+
+    # A meeting recorded before documents existed
+    db_session.add_all([models.Transcript(meeting_id=7, speaker="A", text=f"line {i}") for i in range(3)])
+    db_session.commit()
+    doc = load_document(db_session, 7)
+    assert doc.line_count == 3
+    first_hash = doc.content_hash
+
+    db_session.add(models.Transcript(meeting_id=7, speaker="B", text="late line"))
+    db_session.commit()
+    doc = load_document(db_session, 7)
+    assert doc.content.endswith("line 2\nB: late line\n")
+    assert doc.content_hash == chain_hash(first_hash, "B: late line\n")
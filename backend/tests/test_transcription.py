@@ -53,3 +53,48 @@ def test_process_fallback_text(db_session, mock_redis):
     assert len(transcripts) == 1
     assert transcripts[0].text == "Fallback text"
     assert transcripts[0].speaker == "Unknown"
+
+def test_wav_stream_matches_wave_module():
+    import io
+    import wave
+    from backend.transcription.elevenlabs_client import WavStream
+
+    pcm = bytearray(range(256)) * 40
+
+    expected = io.BytesIO()
+    with wave.open(expected, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(44100)
+        wf.writeframes(bytes(pcm))
+
+    with WavStream(memoryview(pcm)) as stream:
+        assert stream.seek(0, io.SEEK_END) == len(expected.getvalue())
+        stream.seek(0)
+        # Small reads force chunks that straddle the header/PCM boundary
+        chunks = iter(lambda: stream.read(30), b"")
+        assert b"".join(chunks) == expected.getvalue()
+
+    # The stream released its view, so the owner can resize again
+    pcm.extend(b"\x00")
+
+def test_pcm_buffer_reuses_storage():
+    from backend.transcription.pcm_buffer import PCMBuffer
+
+    buf = PCMBuffer(8, headroom=0)
+    buf.extend_b64(base64.b64encode(b"abcd"))
+    buf.extend(b"efgh")
+    with buf.view() as pcm:
+        assert bytes(pcm) == b"abcdefgh"
+
+    capacity = buf.capacity
+    buf.clear()
+    assert len(buf) == 0
+    buf.extend(b"xy")
+    assert buf.capacity == capacity
+    with buf.view() as pcm:
+        assert bytes(pcm) == b"xy"
+
+    # Overflow grows instead of failing
+    buf.extend(b"0123456789")
+    assert len(buf) == 12
@@ -1,8 +1,76 @@
 import os
 import io
-import wave
+import struct
 from elevenlabs.client import ElevenLabs
 
+WAV_HEADER_SIZE = 44
+
+def wav_header(data_size: int, sample_rate=44100, channels=1, sampwidth=2) -> bytes:
+    """Builds the canonical 44-byte RIFF/PCM header for `data_size` bytes of audio."""
+    byte_rate = sample_rate * channels * sampwidth
+    block_align = channels * sampwidth
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, byte_rate, block_align, sampwidth * 8,
+        b"data", data_size,
+    )
+
+class WavStream(io.RawIOBase):
+    """
+    Read-only file object presenting a WAV file as a 44-byte header followed
+    by a memoryview over the caller's PCM buffer. Nothing is copied up front;
+    the HTTP client pulls the body through readinto() in small chunks.
+    """
+    def __init__(self, pcm, sample_rate=44100, channels=1, sampwidth=2):
+        self._pcm = memoryview(pcm).cast("B")
+        self._header = wav_header(len(self._pcm), sample_rate, channels, sampwidth)
+        self._size = WAV_HEADER_SIZE + len(self._pcm)
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = self._size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if pos < 0:
+            raise ValueError("Negative seek position")
+        self._pos = pos
+        return self._pos
+
+    def readinto(self, buffer):
+        out = memoryview(buffer).cast("B")
+        written = 0
+        while written < len(out) and self._pos < self._size:
+            if self._pos < WAV_HEADER_SIZE:
+                src = memoryview(self._header)[self._pos:]
+            else:
+                src = self._pcm[self._pos - WAV_HEADER_SIZE:]
+            n = min(len(src), len(out) - written)
+            out[written:written + n] = src[:n]
+            written += n
+            self._pos += n
+        return written
+
+    def close(self):
+        # Drop our export so the owner can reuse/resize its buffer.
+        if not self.closed:
+            self._pcm.release()
+        super().close()
+
 class ElevenLabsClient:
     def __init__(self):
         api_key = os.getenv("ELEVENLABS_API_KEY")
@@ -10,40 +78,27 @@ class ElevenLabsClient:
             print("⚠️ WARNING: ELEVENLABS_API_KEY is not set.")
         self.client = ElevenLabs(api_key=api_key)
 
-    def _add_wav_header(self, pcm_data: bytes, sample_rate=44100, channels=1, sampwidth=2) -> io.BytesIO:
-        """
-        Wraps raw PCM audio bytes into a valid in-memory WAV file.
-        Required because Scribe expects a file format, not raw bytes.
-        """
-        io_bytes = io.BytesIO()
-        with wave.open(io_bytes, 'wb') as wav_file:
-            wav_file.setnchannels(channels)
-            wav_file.setsampwidth(sampwidth)
-            wav_file.setframerate(sample_rate)
-            wav_file.writeframes(pcm_data)
-        io_bytes.seek(0)
-        return io_bytes
-
-    def transcribe_stream(self, audio_bytes: bytes):
+    def transcribe_stream(self, audio_bytes):
         """
         Sends audio to ElevenLabs Scribe API with Diarization enabled.
+        Accepts any bytes-like PCM (bytes, bytearray, memoryview); the upload
+        body streams straight out of it.
         Returns the full transcription object containing words/speakers.
         """
         try:
-            # 1. Convert raw PCM to WAV container
-            audio_file = self._add_wav_header(audio_bytes)
-            
-            # 2. Call ElevenLabs Scribe
-            transcription = self.client.speech_to_text.convert(
-                file=audio_file,
-                model_id="scribe_v1",
-                tag_audio_events=False,
-                language_code="eng",
-                diarize=True
-            )
-            
+            # 1. Wrap raw PCM in a streaming WAV container (Scribe expects a file format)
+            with WavStream(audio_bytes) as audio_file:
+                # 2. Call ElevenLabs Scribe
+                transcription = self.client.speech_to_text.convert(
+                    file=("audio.wav", audio_file, "audio/wav"),
+                    model_id="scribe_v1",
+                    tag_audio_events=False,
+                    language_code="eng",
+                    diarize=True
+                )
+
             return transcription
-            
+
         except Exception as e:
             print(f"❌ ElevenLabs STT Error: {e}")
-            return None
\ No newline at end of file
+            return None
@@ -1,7 +1,6 @@
 import time
 import json
 import sys
-import base64
 import os
 
 # Fallback if MPS is not availableß
@@ -9,12 +8,20 @@ os.environ["PYTORCH_ENABLE_MPS_FALLBACK"] = "1"
 
 import redis
 from backend.transcription.elevenlabs_client import ElevenLabsClient
+from backend.transcription.pcm_buffer import PCMBuffer
 from backend.common import database, models
+from backend.common.transcript_document import append_transcript
+from backend.celery_app import celery_app
+from backend.ai.context_window import estimate_tokens
+from backend.ai.rolling_summary import ROLLING_SUMMARY_BLOCK_TOKENS
 from sqlalchemy.orm import Session
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 TRANSCRIPTION_PROVIDER = os.getenv("TRANSCRIPTION_PROVIDER", "elevenlabs").lower()
 
+# Approximate tokens of transcript saved per meeting since its last rolling-summary fold was queued
+pending_summary_tokens = {}
+
 def main():
     print(f"🎧 Starting Transcription Service...")
     print(f"🔧 Configured Provider: {TRANSCRIPTION_PROVIDER.upper()}")
@@ -42,7 +49,8 @@ def main():
     
     # Buffer size
     BUFFER_SIZE_BYTES = 500 * 1024 
-    audio_buffer = bytearray()
+    # Preallocated once and reused for every segment (no per-flush allocations)
+    audio_buffer = PCMBuffer(BUFFER_SIZE_BYTES)
     
     while True:
         try:
@@ -57,27 +65,28 @@ def main():
                 audio_b64 = data.get("audio_data")
                 
                 if audio_b64:
-                    audio_bytes = base64.b64decode(audio_b64)
-                    audio_buffer.extend(audio_bytes)
+                    audio_buffer.extend_b64(audio_b64)
                     
                     # Process if buffer is full
                     if len(audio_buffer) >= BUFFER_SIZE_BYTES:
                         print(f"🔄 Processing buffer of size {len(audio_buffer)} bytes...")
-                        result = stt_client.transcribe_stream(bytes(audio_buffer))
+                        with audio_buffer.view() as pcm:
+                            result = stt_client.transcribe_stream(pcm)
                         if result:
                             process_and_save_diarized(db, redis_client, meeting_id, result)
-                        audio_buffer = bytearray()
+                        audio_buffer.clear()
             
             else:
                 # --- TIMEOUT (Silence/End of Stream) ---
                 if len(audio_buffer) > 0:
                     print(f"🧹 Flushing remaining buffer of size {len(audio_buffer)} bytes...")
                     
-                    result = stt_client.transcribe_stream(bytes(audio_buffer))
+                    with audio_buffer.view() as pcm:
+                        result = stt_client.transcribe_stream(pcm)
                     if result:
                          process_and_save_diarized(db, redis_client, meeting_id, result)
                     
-                    audio_buffer = bytearray()
+                    audio_buffer.clear()
 
         except KeyboardInterrupt:
             print("\n🛑 Stopping Transcription Service...")
@@ -138,6 +147,9 @@ def save_and_publish(db: Session, redis_client: redis.Redis, meeting_id: int, sp
             text=text
         )
         db.add(transcript)
+        db.flush()
+        # Same transaction: the meeting's document always matches its saved lines
+        append_transcript(db, transcript)
         db.commit()
         db.refresh(transcript)
 
@@ -159,9 +171,23 @@ def save_and_publish(db: Session, redis_client: redis.Redis, meeting_id: int, sp
         
         print(f"   Pb Published update for meeting {meeting_id}")
 
+        # 4. Keep the rolling summary current while the meeting runs
+        queue_rolling_summary(meeting_id, f"{formatted_speaker}: {text}")
+
     except Exception as e:
         print(f"❌ DB/Redis Error: {e}")
         db.rollback()
 
+def queue_rolling_summary(meeting_id: int, line: str):
+    """Queues a rolling-summary fold every ROLLING_SUMMARY_BLOCK_TOKENS of new transcript."""
+    pending = pending_summary_tokens.get(meeting_id, 0) + estimate_tokens(line)
+    if pending >= ROLLING_SUMMARY_BLOCK_TOKENS:
+        try:
+            celery_app.send_task("update_rolling_summary_task", args=[meeting_id])
+            pending = 0
+        except Exception as e:
+            print(f"⚠️ Could not queue rolling summary for meeting {meeting_id}: {e}")
+    pending_summary_tokens[meeting_id] = pending
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,49 @@
+import binascii
+
+
+class PCMBuffer:
+    """
+    Preallocated, reusable buffer for incoming PCM audio.
+    Each chunk is copied into a fixed bytearray and the segment is flushed as
+    a memoryview, so the accumulated segment is held in memory once (rather
+    than rebuilt by concatenation on every chunk).
+    """
+    def __init__(self, capacity: int, headroom: int = 64 * 1024):
+        self._buf = bytearray(capacity + headroom)
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buf)
+
+    def extend(self, chunk) -> None:
+        """Copies a bytes-like chunk into the free tail of the buffer."""
+        size = len(chunk)
+        end = self._len + size
+        if end > len(self._buf):
+            # Rare: a single oversized flush window. Grow once, geometrically.
+            self._buf.extend(bytes(max(end, 2 * len(self._buf)) - len(self._buf)))
+        self._buf[self._len:end] = chunk
+        self._len = end
+
+    def extend_b64(self, b64_data) -> None:
+        """
+        Decodes a base64 chunk (as sent by the bot) and appends it. The decoded
+        chunk is a short-lived temporary (the stdlib has no decode-into), so
+        each chunk is copied twice; only the segment itself is kept.
+        """
+        self.extend(binascii.a2b_base64(b64_data))
+
+    def view(self) -> memoryview:
+        """
+        Zero-copy view over the filled part of the buffer.
+        Release it (or use it as a context manager) before the next extend().
+        """
+        return memoryview(self._buf)[:self._len]
+
+    def clear(self) -> None:
+        """Marks the buffer empty without releasing its memory."""
+        self._len = 0
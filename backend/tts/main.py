@@ -36,8 +36,13 @@ def main():
                 data = json.loads(data_str)
                 text = data.get("text")
                 meeting_id = data.get("meeting_id")
-                
-                if text:
+                # Streamed questions arrive one sentence at a time, followed by a text-less
+                # final marker; a whole-text request (e.g. consent) is final on its own.
+                final = data.get("final", True)
+
+                if not text and final:
+                    redis_client.rpush("audio_playback_queue", json.dumps({"meeting_id": meeting_id, "final": True}))
+                elif text:
                     # Check if this is the standard consent announcement
                     CONSENT_TEXT_PART = "Hello everyone, I am the AI Meeting Assistant"
                     is_consent = CONSENT_TEXT_PART in text
@@ -56,7 +61,7 @@ def main():
                             output_path = tts_client.synthesize_speech(text, output_file=file_path)
                     else:
                         # Dynamic/Question audio - always new
-                        filename = f"question_{meeting_id}_{int(time.time())}.mp3"
+                        filename = f"question_{meeting_id}_{time.time_ns()}.mp3"
                         file_path = os.path.join(AUDIO_DIR, filename)
                         output_path = tts_client.synthesize_speech(text, output_file=file_path)
                     
@@ -64,7 +69,8 @@ def main():
                         # 2. Notify Bot to Play
                         playback_msg = {
                             "meeting_id": meeting_id,
-                            "file_path": output_path
+                            "file_path": output_path,
+                            "final": final
                         }
                         redis_client.rpush("audio_playback_queue", json.dumps(playback_msg))
                         print(f"✅ Sent playback request for: {filename}")
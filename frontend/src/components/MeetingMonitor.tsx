@@ -50,6 +50,8 @@ const MeetingMonitor: React.FC<Props> = ({ meetingId, onMeetingEnd }) => {
     ws.onmessage = (event) => {
       try {
         const data = JSON.parse(event.data);
+        // Typed messages (spec edits, job progress) are not transcript lines
+        if (data.type) return;
         const newTranscript: Transcript = {
           speaker: data.speaker,
           text: data.text,
@@ -121,10 +123,14 @@ const MeetingMonitor: React.FC<Props> = ({ meetingId, onMeetingEnd }) => {
         }
       );
 
-      if (res.ok) {
+      if (res.ok || res.status === 429) {
+        // 429: the meeting ended, but no spec job could be started yet
+        const data = await res.json();
         setStatus("Ended");
-        alert("Meeting Ended. Specification generation has started.");
-        if (onMeetingEnd) onMeetingEnd();
+        alert(data.message || data.detail);
+        // Only a running job will produce a new spec to wait for
+        const generating = data.job_status === "queued" || data.job_status === "attached";
+        if (generating && onMeetingEnd) onMeetingEnd();
       } else {
         alert("Failed to end meeting");
       }
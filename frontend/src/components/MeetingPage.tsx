@@ -23,21 +23,48 @@ const MeetingPage: React.FC = () => {
 
   const handlePreviewTasks = async () => {
     setIsPreviewingTasks(true);
+    setTasks([]);
     try {
+      // NDJSON stream: each task is shown as soon as the model finishes it
       const res = await fetch(
-        `http://localhost:8000/meetings/${id}/tasks/preview`,
+        `http://localhost:8000/meetings/${id}/tasks/preview/stream`,
         {
           headers: {
-            "Content-Type": "application/json",
             "Authorization": `Bearer ${token}`
           }
         }
       );
-      if (res.ok) {
-        const data = await res.json();
-        setTasks(data);
-      } else {
+      if (!res.ok || !res.body) {
         alert("Failed to load task preview");
+        return;
+      }
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let failed = false;
+      const handleLine = (line: string) => {
+        if (!line.trim()) return;
+        const item = JSON.parse(line);
+        if (item.error) {
+          console.error(item.error);
+          failed = true;
+        } else {
+          setTasks((prev) => [...prev, item]);
+        }
+      };
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop() || "";
+        lines.forEach(handleLine);
+      }
+      handleLine(buffer + decoder.decode());
+      if (failed) {
+        alert("Task extraction stopped early; showing the tasks received so far");
       }
     } catch (e) {
       console.error(e);
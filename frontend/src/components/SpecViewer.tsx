@@ -3,12 +3,14 @@ import ReactMarkdown from "react-markdown";
 import remarkGfm from "remark-gfm";
 import { Card, Button, Form, Badge, Spinner } from "react-bootstrap";
 import rehypeSanitize from "rehype-sanitize";
+import { textOps } from "../textOps";
 
 interface Specification {
   id: number;
   content: string;
   version: string;
   created_at: string;
+  revision?: number;
 }
 
 interface Props {
@@ -38,6 +40,10 @@ const SpecViewer: React.FC<Props> = ({
   const [editContent, setEditContent] = useState("");
   const [isSaving, setIsSaving] = useState(false);
 
+  // Generation job being followed, and the stage it last reported
+  const [jobId, setJobId] = useState<string | null>(null);
+  const [stage, setStage] = useState<string | null>(null);
+
   const token = localStorage.getItem("auth_token");
 
   // Fetch Spec (Wrapped in useCallback as per your code)
@@ -91,18 +97,62 @@ const SpecViewer: React.FC<Props> = ({
     }
   }, [autoGenerateTrigger, spec]);
 
-  // Polling effect
+  const finishGeneration = React.useCallback(
+    async (job: { state: string; result?: string | null }) => {
+      if (job.state === "FAILURE" || job.result === "Failed") {
+        setError("Specification generation failed.");
+      } else {
+        lastVersionRef.current = null;
+        await fetchSpec();
+      }
+      setIsLoading(false);
+      setJobId(null);
+      setStage(null);
+      if (onGenerationComplete) onGenerationComplete();
+    },
+    [fetchSpec, onGenerationComplete]
+  );
+
+  // Job progress is pushed on the meeting's WebSocket; a slow poll covers a dropped connection
   useEffect(() => {
     if (!isLoading || isEditing) return;
+    const ws = new WebSocket(`ws://localhost:8000/ws/meetings/${meetingId}?token=${token}`);
+    ws.onopen = async () => {
+      // The job may have finished before we subscribed
+      if (!jobId) return;
+      const res = await fetch(`http://localhost:8000/jobs/${jobId}`, {
+        headers: { "Authorization": `Bearer ${token}` },
+      });
+      if (res.ok) {
+        const job = await res.json();
+        if (job.state === "SUCCESS" || job.state === "FAILURE") finishGeneration(job);
+        else setStage(job.stage);
+      }
+    };
+    ws.onmessage = (event) => {
+      try {
+        const data = JSON.parse(event.data);
+        if (data.type !== "spec_job" || (jobId && data.job_id !== jobId)) return;
+        if (data.state === "SUCCESS" || data.state === "FAILURE") finishGeneration(data);
+        else setStage(data.stage);
+      } catch (e) {
+        console.error("WS Parse Error", e);
+      }
+    };
     const interval = setInterval(async () => {
       const found = await fetchSpec();
       if (found) {
         clearInterval(interval);
+        setJobId(null);
+        setStage(null);
         if (onGenerationComplete) onGenerationComplete();
       }
-    }, 3000);
-    return () => clearInterval(interval);
-  }, [isLoading, isEditing, fetchSpec, onGenerationComplete]);
+    }, 15000);
+    return () => {
+      clearInterval(interval);
+      ws.close();
+    };
+  }, [isLoading, isEditing, meetingId, token, jobId, fetchSpec, finishGeneration, onGenerationComplete]);
 
   const handleGenerate = async () => {
     if (spec) lastVersionRef.current = spec.created_at;
@@ -119,6 +169,16 @@ const SpecViewer: React.FC<Props> = ({
         }
       );
       if (!res.ok) throw new Error("Failed to trigger generation");
+      const job = await res.json();
+      // No new job will produce a spec to wait for
+      if (job.status === "queued" || job.status === "attached") {
+        setJobId(job.job_id);
+      } else if (job.status === "up_to_date") {
+        setIsLoading(false);
+      } else if (job.status === "no_transcripts") {
+        setError("No transcripts to generate a specification from yet.");
+        setIsLoading(false);
+      }
     } catch {
       setError("Failed to start generation. Ensure backend is running.");
       setIsLoading(false);
@@ -145,19 +205,29 @@ const SpecViewer: React.FC<Props> = ({
       const res = await fetch(
         `http://localhost:8000/meetings/${meetingId}/specification`,
         {
-          method: "PUT",
+          method: "PATCH",
           headers: {
             "Content-Type": "application/json",
             "Authorization": `Bearer ${token}`
           },
-          body: JSON.stringify({ content: editContent }),
+          body: JSON.stringify({
+            base_revision: spec.revision,
+            ops: textOps(spec.content, editContent),
+          }),
         }
       );
 
       if (res.ok) {
-        const updatedSpec = await res.json();
-        setSpec(updatedSpec);
+        const result = await res.json();
+        // The server merged any concurrent edits elsewhere in the document; re-read only then
+        if (result.base_revision === spec.revision) {
+          setSpec({ ...spec, content: editContent, revision: result.revision });
+        } else {
+          await fetchSpec();
+        }
         setIsEditing(false);
+      } else if (res.status === 409) {
+        alert("Someone else changed this part of the specification. Reload to see their edits.");
       } else {
         alert("Failed to save changes.");
       }
@@ -212,6 +282,7 @@ const SpecViewer: React.FC<Props> = ({
             <div className="h-100 d-flex flex-column align-items-center justify-content-center text-primary gap-3">
               <Spinner animation="border" />
               <span className="fw-bold">Generating Specification...</span>
+              {stage && <small className="text-muted text-capitalize">{stage}</small>}
             </div>
           ) : error ? (
             <div className="h-100 d-flex align-items-center justify-content-center text-danger">
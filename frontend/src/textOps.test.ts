@@ -0,0 +1,16 @@
+import { describe, it, expect } from 'vitest';
+import { textOps } from './textOps';
+
+describe('textOps', () => {
+    it('describes a single edited region', () => {
+        expect(textOps("hello world", "hello there")).toEqual([6, -5, "there"]);
+        expect(textOps("same", "same")).toEqual([4]);
+    });
+
+    it('counts code points, not UTF-16 units', () => {
+        // "🚀" is one code point but two UTF-16 units
+        expect(textOps("🚀 A\nrest", "🚀 AB\nrest")).toEqual([3, "B"]);
+        expect(textOps("a🚀b", "a🚀")).toEqual([2, -1]);
+        expect(textOps("x", "x😀")).toEqual([1, "😀"]);
+    });
+});
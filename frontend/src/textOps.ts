@@ -0,0 +1,23 @@
+// Text operations turning `before` into `after`: keep n, delete -n, insert "text".
+// One edited region per save keeps the request the size of the edit.
+// Offsets count code points (as the server's Python strings do), not UTF-16
+// units, so emoji and other non-BMP characters don't shift the edit.
+export const textOps = (before: string, after: string): (number | string)[] => {
+  const a = Array.from(before);
+  const b = Array.from(after);
+  let prefix = 0;
+  while (prefix < a.length && prefix < b.length && a[prefix] === b[prefix]) prefix++;
+  let suffix = 0;
+  while (
+    suffix < a.length - prefix &&
+    suffix < b.length - prefix &&
+    a[a.length - 1 - suffix] === b[b.length - 1 - suffix]
+  ) suffix++;
+  const ops: (number | string)[] = [];
+  if (prefix) ops.push(prefix);
+  const deleted = a.length - prefix - suffix;
+  if (deleted) ops.push(-deleted);
+  const inserted = b.slice(prefix, b.length - suffix).join("");
+  if (inserted) ops.push(inserted);
+  return ops;
+};